@@ -1,18 +1,72 @@
-import os
 import streamlit as st
-import io
-import json
-import zipfile
-from dotenv import load_dotenv
-from app_utilities import clear_session_state, initialize_session_state
+from config import load_config, get_setting
+from app_utilities import (
+    clear_session_state, initialize_session_state, add_message, add_version, set_current_version_index,
+    session_memory_report, version_metadata
+)
+from autosave import get_autosave
 import random
 import time
+import sqlite3
+from collections import OrderedDict
 from image_handler import get_images_from_pexels
+from image_picker import load_images, prompt_images
 from website_version import WebsiteVersion
 from ui_components import load_custom_css, create_custom_header, format_chat_message, create_version_card
-from llm_handler import generate_response, extract_code_from_response, clean_response_for_display, get_system_prompt
-from file_handler import create_download_zip
+from llm_handler import generate_response, get_system_prompt, get_image_context
+from section_editor import SectionMap, SECTION_SYSTEM_PROMPT
+from live_preview import LivePreview
+from stream_adapter import StreamFanout, last_stream_stats
+from output_validator import repair_response, fenced_blocks
+from token_planner import get_planner
+from variant_generator import MAX_VARIANTS, generate_variants
+from template_index import get_template_index
+from preview_server import get_preview_server
+from job_queue import (
+    DEFAULT_LEASE, DONE, GENERATION_HANDLER, generation_payload, get_job_queue, job_result_version
+)
+from version_diff import KINDS as DIFF_KINDS, diff_versions
+from profiling import profile, enabled_by_env, recent_captures
+from code_extractor import extract_code_from_response, clean_response_for_display
+from file_handler import create_download_zip, create_all_versions_zip, create_preview_html
+from version_index import VersionIndex, format_retrieved_sections
+
+
+# Waiting longer than a worker's lease would outlive the job's own recovery
+GENERATION_JOB_TIMEOUT = DEFAULT_LEASE
+MAX_DIFF_LINES = 2000
+CHAT_WINDOW = 30
+# Built ZIPs kept per session so reruns can re-offer them without rebuilding
+PREPARED_DOWNLOADS = 4
+
+# Sentinel for "reference any version" in the version selector
+ALL_VERSIONS = "all"
+
+GUIDE_MESSAGE = """***🎉 Website Generated Successfully!***
 
+<strong>📱 To see your website:</strong>
+
+- Click the "Website Preview" tab above
+- Use the preview panel to interact with your site
+- Check the HTML, CSS, and JS tabs for the code
+
+<strong>💡 You can:</strong>
+
+- Continue chatting to refine the website
+- Use version history to track changes
+- Download your website using the buttons below the preview
+
+<strong>🔄 Want to make changes?</strong>
+
+- Simply describe what you'd like to modify
+- Reference previous versions if needed
+- Add images by using the image search feature
+"""
+
+TEMPLATE_REUSE_MESSAGE = """⚡ This request is close to an earlier site ("{prompt}"), so I started from it.
+
+Check the **Website Preview** tab, then describe what to change (name, colours, sections) and I'll update it.
+To generate from scratch instead, reset and untick *Start new sites from a similar earlier site*."""
 
 LOADING_GIFS = [
     "https://media0.giphy.com/media/XfDiixCqdH7OrEBg5z/giphy.gif",
@@ -41,8 +95,8 @@ LOADING_MESSAGES = [
     "Creating something delicious... 🍪"
 ]
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (cached, so reruns don't re-read .env)
+load_config()
 
 def get_conversation_history_for_llm():
     """Convert the session history to a format suitable for the LLM."""
@@ -79,6 +133,51 @@ def get_conversation_history_for_llm():
     
     return history
 
+def get_reference_context(query, referenced_version):
+    """Retrieve the parts of earlier versions relevant to the request.
+
+    `referenced_version` is a version index, or ALL_VERSIONS to search every
+    version. Returns prompt text, or None when nothing matches.
+    """
+    if "version_index" not in st.session_state:
+        # Section text counts against the session's memory budget; dropped
+        # text is re-read from the version history when a search needs it
+        st.session_state.version_index = VersionIndex(
+            budget=st.session_state.get("memory_budget"),
+            load_version=lambda number: st.session_state.website_versions[number - 1]
+        )
+    index = st.session_state.version_index
+    index.sync(st.session_state.website_versions)
+
+    version_ids = None
+    if referenced_version != ALL_VERSIONS:
+        version_ids = {st.session_state.website_versions[referenced_version].id}
+    entries = index.search(query, version_ids=version_ids)
+    if not entries:
+        return None
+    return (
+        "Relevant code from earlier versions that the user is referring to:\n\n"
+        + format_retrieved_sections(entries)
+    )
+
+def run_queued_generation(job_queue, prompt, history, system_prompt, model_choice, max_tokens=None):
+    """Hand a generation to the worker processes and wait for its result.
+
+    Returns the job result ("response" plus the version record), or None. A
+    job that doesn't finish in time is cancelled so it doesn't hold a worker.
+    """
+    job_id = job_queue.submit(
+        GENERATION_HANDLER,
+        generation_payload(prompt, history, system_prompt, model_choice, max_tokens)
+    )
+    with st.spinner("Waiting for a generation worker..."):
+        job = job_queue.wait(job_id, timeout=GENERATION_JOB_TIMEOUT)
+    if job.status == DONE:
+        return job.result
+    job_queue.cancel(job_id)
+    st.error(f"Generation job {job.status}: {job.error or 'no worker picked it up in time'}")
+    return None
+
 def render_chat_interface():
     """Display chat history with proper scrolling."""
     # Use stronger CSS-forced scrolling container with increased height
@@ -88,15 +187,50 @@ def render_chat_interface():
     margin-bottom: 15px !important;">
     ''', unsafe_allow_html=True)
     
-    for message in st.session_state.messages:
+    # Older messages stay on disk unless asked for
+    messages = st.session_state.messages
+    start = 0 if st.session_state.get("show_all_messages") else max(0, len(messages) - CHAT_WINDOW)
+    if start and st.button(f"Show {start} earlier message(s)"):
+        st.session_state.show_all_messages = True
+        st.rerun()
+
+    for message in messages[start:]:
         role = "user" if message["role"] == "user" else "assistant"
         content = message["content"]
-        if role == "assistant":
+        if role == "assistant" and "version_id" not in message:
+            # Replies saved before messages referenced versions still carry the code
             content = clean_response_for_display(content)
+        if message.get("guide"):
+            content = f"{content}\n\n{GUIDE_MESSAGE}"
         st.markdown(format_chat_message(content, role), unsafe_allow_html=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+def get_preview_url(version):
+    """URL of the version on the preview server, or None to inline the preview.
+
+    GHATA_PREVIEW_SERVER is "auto" (default: only when the browser reached
+    the app on this machine), "1" or "0". GHATA_PREVIEW_URL sets the public
+    base URL when the preview server sits behind a proxy.
+    """
+    mode = get_setting("GHATA_PREVIEW_SERVER", "auto").lower()
+    base_url = get_setting("GHATA_PREVIEW_URL")
+    if mode in ("0", "false", "off"):
+        return None
+    if mode == "auto" and not base_url and not browser_is_local():
+        return None
+    server = get_preview_server()
+    return server.url(version, base_url) if server else None
+
+def browser_is_local():
+    """True when the browser talks to the app through localhost."""
+    try:
+        host = st.context.headers.get("Host", "")
+    except Exception:
+        return False
+    hostname = host.rsplit(":", 1)[0] if not host.startswith("[") else host.split("]")[0] + "]"
+    return hostname in ("localhost", "127.0.0.1", "[::1]")
+
 def render_website_preview():
     """Render the website preview with scrollable sections for HTML, CSS, JS"""
     st.markdown("<h3>Website Preview</h3>", unsafe_allow_html=True)
@@ -113,21 +247,26 @@ def render_website_preview():
     tab1, tab2, tab3, tab4 = st.tabs(["Preview", "HTML", "CSS", "JavaScript"])
 
     with tab1:
-        combined_code = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>{current_version.css}</style>
-        </head>
-        <body>
-            {current_version.html}
-            <script>{current_version.js}</script>
-        </body>
-        </html>
-        """
-        st.components.v1.html(combined_code, height=600, scrolling=True)
+        preview_url = get_preview_url(current_version)
+        if preview_url:
+            # Served once per version at a content-hashed URL; reruns reuse the browser cache
+            st.components.v1.iframe(preview_url, height=600, scrolling=True)
+        else:
+            combined_code = f"""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <style>{current_version.css}</style>
+            </head>
+            <body>
+                {current_version.html}
+                <script>{current_version.js}</script>
+            </body>
+            </html>
+            """
+            st.components.v1.html(combined_code, height=600, scrolling=True)
 
     with tab2:
         # Use scrollable-code-container for proper scrolling with more height
@@ -148,51 +287,204 @@ def render_website_preview():
     # Simplified download section with better styling
     st.markdown("### Download Options")
     
-    # Create simple buttons with improved layout
+    optimize_export = st.checkbox(
+        "Optimize for production (minify, inline critical CSS, add .gz files)",
+        key="optimize_export"
+    )
+    mirror_export = st.checkbox(
+        "Bundle images locally (download once, add responsive sizes)",
+        key="mirror_export"
+    )
+    deploy_export = st.checkbox(
+        "Static-host deploy bundle (content-hashed asset names, cache manifest, .gz/.br files)",
+        key="deploy_export"
+    )
+
+    # Create simple buttons with improved layout; ZIPs are built when asked for,
+    # since mirroring and compression are too slow to repeat on every rerun
     col1, col2 = st.columns(2)
-    
+    options = (optimize_export, mirror_export, deploy_export)
+
     with col1:
-        st.download_button(
-            label="Download Current Version",
-            data=create_download_zip(current_version),
-            file_name=f"website_v{st.session_state.current_version_index+1}_{current_version.id}.zip",
-            mime="application/zip",
-            key="download_current",
-            use_container_width=True  # Make button fill container for better UI
+        render_zip_download(
+            "Download Current Version", "current",
+            f"website_v{st.session_state.current_version_index+1}_{current_version.id}.zip",
+            request=(current_version.id, options),
+            build=lambda: create_download_zip(
+                current_version, optimize=optimize_export, mirror_images=mirror_export, deploy=deploy_export
+            )
         )
-    
+
     # Second button (shown conditionally)
     if len(st.session_state.website_versions) > 1:
         with col2:
-            all_versions_zip = io.BytesIO()
-            with zipfile.ZipFile(all_versions_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
-                for i, version in enumerate(st.session_state.website_versions):
-                    folder = f"version_{i+1}_{version.id}"
-                    zipf.writestr(f"{folder}/index.html", f"""<!DOCTYPE html>
-                    <html><head><meta charset="UTF-8">
-                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                    <title>Generated Website - Version {i+1}</title>
-                    <link rel="stylesheet" href="styles.css">
-                    </head><body>{version.html}<script src="script.js"></script></body></html>""")
-                    zipf.writestr(f"{folder}/styles.css", version.css)
-                    zipf.writestr(f"{folder}/script.js", version.js)
-                    zipf.writestr(f"{folder}/metadata.json", json.dumps({
-                        "version": i+1,
-                        "id": version.id,
-                        "description": version.description,
-                        "timestamp": version.timestamp
-                    }, indent=2))
-            all_versions_zip.seek(0)
-            
-            st.download_button(
-                label="Download All Versions",
-                data=all_versions_zip.getvalue(),
-                file_name="all_website_versions.zip",
-                mime="application/zip",
-                key="download_all",
-                use_container_width=True  # Make button fill container for better UI
+            version_ids = tuple(meta["id"] for meta in version_metadata() if meta is not None)
+            render_zip_download(
+                "Download All Versions", "all", "all_website_versions.zip",
+                request=(version_ids, options),
+                build=lambda: create_all_versions_zip(
+                    st.session_state.website_versions, optimize=optimize_export,
+                    mirror_images=mirror_export, deploy=deploy_export
+                )
             )
 
+def render_zip_download(label, key, file_name, request, build):
+    """Offer a ZIP that is only built once the user asks for it.
+
+    `request` identifies the content and export options; the last few built
+    ZIPs are kept for the session so later reruns don't rebuild them.
+    """
+    prepared = st.session_state.setdefault("prepared_downloads", OrderedDict())
+    data = prepared.get(request)
+    if data is None:
+        if not st.button(f"Prepare {label}", key=f"prepare_{key}", use_container_width=True):
+            return
+        with st.spinner("Building ZIP..."):
+            data = build()
+        prepared[request] = data
+        while len(prepared) > PREPARED_DOWNLOADS:
+            prepared.popitem(last=False)
+    else:
+        prepared.move_to_end(request)
+    st.download_button(
+        label=label,
+        data=data,
+        file_name=file_name,
+        mime="application/zip",
+        key=f"download_{key}",
+        use_container_width=True
+    )
+
+def export_options():
+    return (
+        st.session_state.get("optimize_export", False),
+        st.session_state.get("mirror_export", False),
+        st.session_state.get("deploy_export", False),
+    )
+
+def render_variant_picker():
+    """Show the ranked design variants side by side; picking one makes it a version."""
+    variants = st.session_state.variants
+    st.markdown("### Pick a design")
+    st.caption("Variants are ranked by completeness and validity of the generated code.")
+    columns = st.columns(len(variants))
+    for i, (column, variant) in enumerate(zip(columns, variants)):
+        version = WebsiteVersion(
+            html=variant["html"], css=variant["css"], js=variant["js"],
+            description=st.session_state.variant_description
+        )
+        with column:
+            st.markdown(f"**#{i+1}** · score {variant['score']}")
+            st.caption(f"{variant['label']} · {variant['elapsed']:.0f}s")
+            st.components.v1.html(create_preview_html(version), height=360, scrolling=True)
+            for issue in variant["issues"]:
+                st.caption(f"⚠️ {issue}")
+            if st.button("Use this design", key=f"use_variant_{i}"):
+                add_message("assistant", clean_response_for_display(variant["response"]), version.id, guide=True)
+                add_version(version)
+                set_current_version_index(len(st.session_state.website_versions) - 1)
+                del st.session_state.variants
+                st.rerun()
+    if st.button("Discard variants"):
+        del st.session_state.variants
+        st.rerun()
+
+def render_version_diff():
+    """Compare two versions file by file; only the selected file is diffed."""
+    versions = st.session_state.website_versions
+    if len(versions) < 2:
+        return
+
+    with st.expander("🔍 Compare versions"):
+        labels = [f"V{i+1}: {(meta or {}).get('description', '')[:30]}" for i, meta in enumerate(version_metadata())]
+        newest = max(st.session_state.current_version_index, 1)
+        col1, col2 = st.columns(2)
+        with col1:
+            old_index = st.selectbox("From", range(len(versions)), index=newest - 1,
+                                     format_func=labels.__getitem__, key="diff_old")
+        with col2:
+            new_index = st.selectbox("To", range(len(versions)), index=newest,
+                                     format_func=labels.__getitem__, key="diff_new")
+        kind = st.radio("File", DIFF_KINDS, horizontal=True,
+                        format_func={"html": "HTML", "css": "CSS", "js": "JavaScript"}.get, key="diff_kind")
+
+        diff = diff_versions(versions[old_index], versions[new_index], kind)
+        if not diff.changed:
+            st.info("No changes in this file.")
+            return
+        st.caption(f"+{diff.added} / -{diff.removed} lines")
+        text, truncated = diff.unified(max_lines=MAX_DIFF_LINES)
+        st.code(text, language="diff")
+        if truncated:
+            st.caption(f"Showing the first {MAX_DIFF_LINES} lines of the diff.")
+
+def profiling_requested():
+    """Developer mode: GHATA_PROFILE=1 or ?profile=1 in the URL."""
+    return enabled_by_env() or st.query_params.get("profile") == "1"
+
+def render_profiling_panel():
+    """Hotspots and allocation sites of the most recent profiled runs."""
+    captures = recent_captures()
+    with st.expander("🛠 Profiling", expanded=False):
+        if not captures:
+            st.caption("Captures appear here after the next rerun.")
+            return
+        for capture in captures[:5]:
+            st.markdown(f"**{capture.label}** · {capture.seconds * 1000:.0f} ms · "
+                        f"peak {capture.peak_kb / 1024:.1f} MiB")
+            st.code("\n".join(
+                f"{cumulative * 1000:9.1f} ms  {function}" for function, cumulative, _ in capture.hotspots[:8]
+            ))
+            st.caption(f"Full report: {capture.path}")
+
+def render_image_picker():
+    """Search Pexels and let the user choose which images the generator may use.
+
+    Returns (query, number of results, images to send to the model). Only
+    ticked images are sent; the images are None when the picker has no
+    results, so the submit handler can fetch them itself.
+    """
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        image_query = st.text_input(
+            "Search for images (optional)",
+            placeholder="e.g., bakery, coffee, pastries",
+            key="image_query_input"
+        )
+    with col2:
+        num_images = st.number_input(
+            "Number of images",
+            min_value=1,
+            max_value=10,
+            value=7,
+            key="num_images_input"
+        )
+
+    if not image_query:
+        return image_query, num_images, None
+
+    try:
+        with st.spinner("Fetching images..."):
+            images = load_images(image_query, int(num_images))
+    except Exception as e:
+        st.warning(f"Image search failed: {str(e)}")
+        return image_query, num_images, None
+
+    if not images:
+        st.warning("No images found. Placeholder images will be used instead.")
+        return image_query, num_images, None
+
+    st.caption("Tick the images to use (none ticked = placeholder images).")
+    selected = []
+    columns = st.columns(5)
+    for i, image in enumerate(images):
+        with columns[i % 5]:
+            st.image(image["thumbnail_bytes"] or image["thumbnail"], use_container_width=True)
+            if st.checkbox(image["alt"][:30] or f"Image {i+1}", key=f"pick_{image['thumbnail']}"):
+                selected.append(image)
+
+    return image_query, num_images, prompt_images(selected)
+
 def render_version_history():
     """Render the version history with proper error handling and reset button."""
     st.markdown("<h3>Version History</h3>", unsafe_allow_html=True)
@@ -212,6 +504,35 @@ def render_version_history():
         clear_session_state()
         st.rerun()
 
+    if st.session_state.get("project_id"):
+        metrics = get_autosave().metrics()
+        if metrics["flushes"]:
+            st.caption(
+                f"Autosaved {metrics['last_bytes'] / 1024:.1f} KB in {metrics['last_flush_ms']:.1f} ms"
+                f" ({metrics['pending']} change(s) pending)"
+            )
+        if metrics["consecutive_errors"] >= 3:
+            st.warning(f"Autosave keeps failing and will retry: {metrics['last_error']}")
+        if metrics["rejected"]:
+            st.error(f"{metrics['rejected']} change(s) could not be saved: {metrics['last_error']}")
+
+    memory = session_memory_report()
+    if memory:
+        caption = f"Session memory: {memory['used_bytes'] / 1048576:.1f} of {memory['limit_bytes'] / 1048576:.0f} MB"
+        if memory["spills"]:
+            caption += f" ({memory['spills']} spilled to disk, {memory['page_ins']} paged back in)"
+        st.caption(caption)
+
+    if st.session_state.get("last_stream_summary"):
+        st.caption(f"Last generation: {st.session_state.last_stream_summary}")
+
+    reuse = get_template_index().metrics()
+    if reuse["reuses"]:
+        st.caption(
+            f"Started {reuse['reuses']} of {reuse['lookups']} new site(s) from earlier sites"
+            f" ({reuse['reuse_rate']:.0%}), saving about {reuse['seconds_saved'] / 60:.1f} min"
+        )
+
     # If version history is hidden, return early
     if not st.session_state.show_history:
         return
@@ -221,31 +542,33 @@ def render_version_history():
         # Important: Using HTML instead of container for better scroll control
         st.markdown('<div class="scrollable-container" style="max-height: 60vh !important;">', unsafe_allow_html=True)
         try:
-            for i, version in enumerate(st.session_state.website_versions):
-                if not isinstance(version, WebsiteVersion):
+            # Cards only need metadata; a version's code is loaded when it is
+            # loaded or downloaded, not on every rerun
+            options = export_options()
+            for i, meta in enumerate(version_metadata()):
+                if meta is None:
                     st.warning(f"Skipping corrupted version at index {i}")
                     continue
 
                 is_active = i == st.session_state.current_version_index
-                st.markdown(create_version_card(version, i, is_active), unsafe_allow_html=True)
+                st.markdown(create_version_card(meta, i, is_active), unsafe_allow_html=True)
 
                 # Avoid nested columns - use side-by-side buttons with HTML/CSS instead
                 col1, col2 = st.columns(2)
                 with col1:
-                    load_btn = st.button("Load", key=f"load_{version.id}", use_container_width=True)
+                    load_btn = st.button("Load", key=f"load_{meta['id']}", use_container_width=True)
                 with col2:
-                    download_zip = create_download_zip(version)
-                    st.download_button(
-                        label="Download",
-                        data=download_zip,
-                        file_name=f"website_v{i+1}_{version.id}.zip",
-                        mime="application/zip",
-                        key=f"download_{version.id}",
-                        use_container_width=True
+                    render_zip_download(
+                        "Download", meta["id"], f"website_v{i+1}_{meta['id']}.zip",
+                        request=(meta["id"], options),
+                        build=lambda i=i: create_download_zip(
+                            st.session_state.website_versions[i], optimize=options[0],
+                            mirror_images=options[1], deploy=options[2]
+                        )
                     )
 
                 if load_btn:
-                    st.session_state.current_version_index = i
+                    set_current_version_index(i)
                     st.rerun()
 
                 st.markdown("<hr style='margin: 10px 0; opacity: 0.3'>", unsafe_allow_html=True)
@@ -277,6 +600,8 @@ def main():
     # Left column - Version history
     with left_panel:
         render_version_history()
+        if profiling_requested():
+            render_profiling_panel()
 
     # Right column - Chat and preview
     with right_panel:
@@ -286,7 +611,13 @@ def main():
         with chat_tab:
             # Chat interface
             render_chat_interface()
+
+            if st.session_state.get("variants"):
+                render_variant_picker()
             
+            # Image picker lives outside the form so results load as soon as a query is typed
+            image_query, num_images, picked_images = render_image_picker()
+
             # Input Form
             with st.form("website_input_form", clear_on_submit=True):
                 user_input = st.text_area(
@@ -295,23 +626,6 @@ def main():
                     placeholder="e.g., 'Create a landing page for a bakery with contact form in Hindi'"
                 )
                 
-                # Image search section
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    image_query = st.text_input(
-                        "Search for images (optional)",
-                        placeholder="e.g., bakery, coffee, pastries",
-                        key="image_query_input"
-                    )
-                with col2:
-                    num_images = st.number_input(
-                        "Number of images",
-                        min_value=1,
-                        max_value=10,
-                        value=7,
-                        key="num_images_input"
-                    )             
-        
                 with st.expander("🚀 Advanced: Choose AI Model"):
                     model_info = {
                         "Good (Fastest)  ": "⚡ Fastest response, good for simple websites",
@@ -328,16 +642,40 @@ def main():
                     
                     st.info(model_info[model_choice])
 
+                st.number_input(
+                    "Design variants to generate in parallel (new sites only)",
+                    min_value=1,
+                    max_value=MAX_VARIANTS,
+                    value=1,
+                    key="variant_count"
+                )
+                st.checkbox(
+                    "Start new sites from a similar earlier site when there is one",
+                    value=True,
+                    key="reuse_templates"
+                )
+                st.checkbox(
+                    "Show a live preview while generating",
+                    value=True,
+                    key="live_preview"
+                )
+                st.checkbox(
+                    "Only regenerate the section I mention (faster for small edits)",
+                    value=True,
+                    key="section_mode"
+                )
+
                 # Reference version checkbox
                 use_reference = st.checkbox("Reference a previous version")
                 
                 # Only show version selector if checkbox is checked and versions exist
                 referenced_version = None
                 if use_reference and st.session_state.website_versions:
-                    version_options = {
-                        f"V{i+1}: {v.description[:20]}... ({v.id})": i
-                        for i, v in enumerate(st.session_state.website_versions)
-                    }
+                    version_options = {"Any version (search all)": ALL_VERSIONS}
+                    version_options.update({
+                        f"V{i+1}: {meta['description'][:20]}... ({meta['id']})": i
+                        for i, meta in enumerate(version_metadata()) if meta is not None
+                    })
                     selected_version = st.selectbox(
                         "Select version to reference:",
                         options=list(version_options.keys()),
@@ -352,6 +690,7 @@ def main():
                     st.session_state.user_input = user_input
                     st.session_state.image_query = image_query  # Store image query
                     st.session_state.num_images = num_images    # Store num_images
+                    st.session_state.image_data = picked_images
                     st.session_state.submitted = True
                     st.session_state.use_reference = use_reference
                     st.session_state.referenced_version = referenced_version
@@ -360,6 +699,7 @@ def main():
         with preview_tab:
             # Preview section
             render_website_preview()
+            render_version_diff()
 
     # Submission handler
     if st.session_state.submitted:
@@ -367,20 +707,49 @@ def main():
         image_query = st.session_state.get("image_query")
         num_images = st.session_state.get("num_images", 5)
 
-        # Fetch images if query provided
-        image_data = []
-        if image_query:
+        # Use the images chosen in the picker, fetching only if the picker had no results
+        image_data = st.session_state.get("image_data")
+        if image_query and image_data is None:
             with st.spinner("Fetching images..."):
                 image_data = get_images_from_pexels(image_query, num_images)
                 if not image_data:
                     st.warning("No images found. Using placeholder images instead.")
+        image_data = image_data or []
 
         # Add version reference if enabled
+        reference_context = None
         if st.session_state.get("use_reference") and st.session_state.get("referenced_version") is not None:
-            ref = st.session_state.website_versions[st.session_state.referenced_version]
-            user_input += f"\n\nPlease reference version {ref.id} with description: '{ref.description}'"
+            reference_context = get_reference_context(user_input, st.session_state.referenced_version)
+            if st.session_state.referenced_version != ALL_VERSIONS:
+                ref = st.session_state.website_versions[st.session_state.referenced_version]
+                user_input += f"\n\nPlease reference version {ref.id} with description: '{ref.description}'"
 
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        add_message("user", user_input)
+
+        # A new site close to one from an earlier project starts from that site instantly
+        if (st.session_state.current_version_index < 0 and st.session_state.get("reuse_templates", True)
+                and not image_data and int(st.session_state.get("variant_count", 1)) == 1):
+            template = None
+            try:
+                template_index = get_template_index()
+                template_index.refresh()
+                match = template_index.match(user_input, exclude_project=st.session_state.get("project_id"))
+                if match:
+                    template = template_index.load(match)
+            except sqlite3.Error as e:
+                print(f"Template lookup failed: {str(e)}")
+            if template:
+                reused = WebsiteVersion(
+                    html=template.html, css=template.css, js=template.js,
+                    description=user_input.split('\n')[0][:50]
+                )
+                add_version(reused)
+                set_current_version_index(len(st.session_state.website_versions) - 1)
+                add_message("assistant", TEMPLATE_REUSE_MESSAGE.format(prompt=match.prompt.split('\n')[0]),
+                            reused.id)
+                template_index.record_reuse()
+                st.session_state.submitted = False
+                st.rerun()
 
         # Store timestamp of last animation update in session state
         if "last_animation_update" not in st.session_state:
@@ -410,12 +779,91 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
+        # Edit just one section when the request clearly targets it
+        section_map, section_index = None, None
+        if st.session_state.get("section_mode") and st.session_state.current_version_index >= 0:
+            section_map = SectionMap(st.session_state.website_versions[st.session_state.current_version_index])
+            section_index = section_map.find_target(st.session_state.user_input)
+
         # Generate the response
-        history = get_conversation_history_for_llm()
-        system_prompt = get_system_prompt(image_data)
+        if section_index is not None:
+            prompt = section_map.build_prompt(section_index, user_input)
+            history = []
+            system_prompt = SECTION_SYSTEM_PROMPT + get_image_context(image_data)
+        else:
+            prompt = user_input
+            history = get_conversation_history_for_llm()
+            system_prompt = get_system_prompt(image_data)
+        # Retrieved code is reference material, not something the model said,
+        # so it goes in the system prompt and the turns keep alternating
+        if reference_context:
+            system_prompt += "\n\n" + reference_context
         
+        # Size the output budget (and tier) to the expected response
+        current_code_chars = 0
+        if st.session_state.current_version_index >= 0:
+            current = st.session_state.website_versions[st.session_state.current_version_index]
+            current_code_chars = len(current.html) + len(current.css) + len(current.js)
+        token_plan = get_planner().plan(
+            model_choice, user_input, current_code_chars,
+            section_chars=len(section_map.sections[section_index].text) if section_index is not None else None
+        )
+        if token_plan.rerouted:
+            st.info(f"ℹ️ Using the {token_plan.tier} model: {token_plan.reason}.")
+        model_choice = token_plan.tier
+
+        # Several designs at once for a brand-new site; the user picks one
+        variant_count = int(st.session_state.get("variant_count", 1))
+        if variant_count > 1 and st.session_state.current_version_index < 0:
+            with st.spinner(f"Generating {variant_count} design variants in parallel..."):
+                candidates = generate_variants(
+                    prompt, history, system_prompt, model_choice,
+                    count=variant_count, max_tokens=token_plan.max_tokens
+                )
+            loading_placeholder.empty()
+            for key in ("last_animation_update", "current_gif", "current_message"):
+                st.session_state.pop(key, None)
+            st.session_state.submitted = False
+
+            usable = [c for c in candidates if c.error is None and c.html]
+            if not usable:
+                errors = "; ".join(c.error for c in candidates if c.error)
+                st.error("❌ None of the variants could be generated. " + errors)
+                return
+            st.session_state.variants = [
+                {
+                    "label": c.label, "score": c.score, "issues": c.issues, "elapsed": c.elapsed,
+                    "response": c.response, "html": c.html, "css": c.css, "js": c.js,
+                }
+                for c in usable
+            ]
+            st.session_state.variant_description = user_input.split('\n')[0][:50]
+            st.rerun()
+
+        # With GHATA_JOB_QUEUE set, generation runs in worker processes
+        job_queue = get_job_queue()
+
+        # Progressive preview while the model writes (full-site generations only)
+        live_preview = None
+        if st.session_state.get("live_preview", True) and section_index is None and not job_queue:
+            preview_placeholder = st.empty()
+
+            def render_live_frame(document):
+                with preview_placeholder.container():
+                    st.caption("Live preview (updating while the site is generated)")
+                    st.components.v1.html(document, height=600, scrolling=True)
+
+            live_preview = LivePreview(render_live_frame)
+
+        # Stream consumers get coalesced batches, each at a pace its own cost allows
+        stream_consumers = StreamFanout()
+        if live_preview:
+            stream_consumers.add(live_preview.feed)
+
         # Generate the response with a timeout mechanism
         response = None
+        finish_reason = None
+        queued_result = None
         timeout = 300  # 5-minute timeout
         start_time = time.time()
         
@@ -432,7 +880,22 @@ def main():
             
             try:
                 # Try to generate a response
-                response = generate_response(user_input, history, system_prompt, model_choice)
+                if job_queue:
+                    queued_result = run_queued_generation(
+                        job_queue, prompt, history, system_prompt, model_choice, token_plan.max_tokens
+                    )
+                    response = queued_result["response"] if queued_result else None
+                else:
+                    response = generate_response(
+                        prompt, history, system_prompt, model_choice,
+                        on_chunk=stream_consumers.feed if stream_consumers else None,
+                        max_tokens=token_plan.max_tokens
+                    )
+                    stream_consumers.close()
+                    stats = last_stream_stats()
+                    if stats:
+                        st.session_state.last_stream_summary = stats.summary()
+                        finish_reason = stats.finish_reason
                 if response:
                     break
                 
@@ -445,12 +908,40 @@ def main():
         # Check if the response was generated successfully
         if not response:
             loading_placeholder.empty()
+            if live_preview:
+                preview_placeholder.empty()
             st.error("❌ Website generation timed out or failed. Please try again.")
             st.session_state.submitted = False
             return
         
+        # Repair truncated or incomplete output with a continuation instead of a full rerun
+        def continue_response(partial, instruction):
+            follow_up_history = history + [
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": partial}
+            ]
+            if job_queue:
+                result = run_queued_generation(
+                    job_queue, instruction, follow_up_history, system_prompt, model_choice, token_plan.max_tokens
+                )
+                return result["response"] if result else None
+            follow_up = generate_response(instruction, follow_up_history, system_prompt, model_choice,
+                                          max_tokens=token_plan.max_tokens)
+            stats = last_stream_stats()
+            return follow_up, stats.finish_reason if stats else None
+
+        response, validation, repair_rounds = repair_response(response, continue_response,
+                                                              finish_reason=finish_reason)
+        get_planner().record(token_plan, len(response))
+        if st.session_state.current_version_index < 0:
+            get_template_index().record_generation(time.time() - start_time)
+        if not validation.ok:
+            st.warning("⚠️ The generated code may be incomplete: " + "; ".join(validation.issues))
+
         # Clear the loading animation
         loading_placeholder.empty()
+        if live_preview:
+            preview_placeholder.empty()
         
         # Reset animation-related session state
         if "last_animation_update" in st.session_state:
@@ -463,38 +954,22 @@ def main():
         # Extract code from response
         html_code, css_code, js_code = extract_code_from_response(response)
         
-        # Create user guide message
-        guide_message ="""
-
-***🎉 Website Generated Successfully!***
-
-<strong>📱 To see your website:</strong>
-
-- Click the "Website Preview" tab above
-- Use the preview panel to interact with your site
-- Check the HTML, CSS, and JS tabs for the code
-
-<strong>💡 You can:</strong>
-
-- Continue chatting to refine the website
-- Use version history to track changes
-- Download your website using the buttons below the preview
-
-<strong>🔄 Want to make changes?</strong>
-
-- Simply describe what you'd like to modify
-- Reference previous versions if needed
-- Add images by using the image search feature
-"""
-
-        
-        # Add both LLM response and guide to chat
-        st.session_state.messages.append({
-            "role": "assistant", 
-            "content": f"{response}\n\n{guide_message}"
-        })
-
-        if html_code or css_code or js_code:
+        new_version = None
+        if section_index is not None:
+            if html_code:
+                present = {language for language, _ in fenced_blocks(response)}
+                new_version = section_map.splice(
+                    section_index, html_code,
+                    css_code if "css" in present else None,
+                    js_code if "js" in present else None,
+                    description=user_input.split('\n')[0][:50]
+                )
+            else:
+                st.warning("The section edit came back without HTML; the current version was kept.")
+        elif queued_result and not repair_rounds and all(queued_result[kind] for kind in ("html", "css", "js")):
+            # The worker already built the version record from this exact response
+            new_version = job_result_version(queued_result)
+        elif html_code or css_code or js_code:
             base_html = base_css = base_js = ""
             if st.session_state.current_version_index >= 0:
                 current = st.session_state.website_versions[st.session_state.current_version_index]
@@ -506,13 +981,14 @@ def main():
                 js=js_code or base_js,
                 description=user_input.split('\n')[0][:50]
             )
-            st.session_state.website_versions.append(new_version)
 
-            # Update current_version_index
-            if st.session_state.current_version_index == -1:
-                st.session_state.current_version_index = 0
-            else:
-                st.session_state.current_version_index = len(st.session_state.website_versions) - 1
+        # The chat keeps only the prose; the code lives in the version it references
+        if new_version is not None:
+            add_version(new_version)
+            set_current_version_index(len(st.session_state.website_versions) - 1)
+            add_message("assistant", clean_response_for_display(response), new_version.id, guide=True)
+        else:
+            add_message("assistant", clean_response_for_display(response))
 
         st.session_state.submitted = False
         st.rerun()
@@ -526,4 +1002,5 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profile("rerun", enabled=profiling_requested()):
+        main()
\ No newline at end of file
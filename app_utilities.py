@@ -3,10 +3,62 @@ import streamlit as st
 import json
 import os
 import datetime
+import sqlite3
 from website_version import WebsiteVersion
+from project_store import get_store
+from autosave import get_autosave
+from session_format import write_session, detect_format, SessionFile
+from session_memory import MemoryBudget
+
+def hydrate_from_store():
+    """Attach this browser session to a stored project and lazily load its history.
+
+    The project id is kept in the `?project=` query parameter so a reload
+    resumes the same project. Version code is only read when a version is used.
+    """
+    store = get_store()
+    # Make sure changes queued by other tabs are visible before reading
+    get_autosave().flush()
+    project_id = st.query_params.get("project")
+    if not project_id or not store.project_exists(project_id):
+        project_id = store.create_project()
+        st.query_params["project"] = project_id
+
+    session = store.get_latest_session(project_id) or store.create_session(project_id)
+    attach_histories(store, project_id, session["id"])
+    st.session_state.current_version_index = min(
+        session["current_version_index"], len(st.session_state.website_versions) - 1
+    )
+
+def attach_histories(store, project_id, session_id):
+    """Point the session at store-backed histories that share one memory budget.
+
+    Payloads beyond the budget are dropped from memory and re-read from the
+    store when used; pending autosaves are flushed if one isn't stored yet.
+    """
+    budget = st.session_state.get("memory_budget")
+    if budget is None:
+        budget = st.session_state.memory_budget = MemoryBudget()
+    for old in (st.session_state.get("messages"), st.session_state.get("website_versions")):
+        if old is not None:
+            budget.release(old)
+    flush = get_autosave().flush
+    st.session_state.project_id = project_id
+    st.session_state.session_id = session_id
+    st.session_state.messages = store.load_message_history(session_id, budget)
+    st.session_state.messages.on_miss = flush
+    st.session_state.website_versions = store.load_version_history(project_id, budget)
+    st.session_state.website_versions.on_miss = flush
 
 def initialize_session_state():
     """Initialize all session state variables with defaults."""
+    if "project_id" not in st.session_state:
+        try:
+            hydrate_from_store()
+        except sqlite3.Error as e:
+            st.warning(f"Project history unavailable: {str(e)}")
+            st.session_state.project_id = None
+
     if "messages" not in st.session_state:
         st.session_state.messages = []
         
@@ -28,30 +80,105 @@ def initialize_session_state():
     if "last_saved" not in st.session_state:
         st.session_state.last_saved = None
 
-def save_state_to_file(filename="website_state.json"):
-    """Save the current session state to a JSON file."""
-    data = {
-        "messages": st.session_state.messages,
-        "website_versions": [v.to_dict() for v in st.session_state.website_versions],
-        "current_version_index": st.session_state.current_version_index,
-        "saved_at": datetime.datetime.now().isoformat()
-    }
-    
+def _autosave_enabled():
+    return bool(st.session_state.get("project_id"))
+
+def add_message(role, content, version_id=None, guide=False):
+    """Append a chat message to the session and queue it for autosave.
+
+    Assistant replies that produced a version store only their prose plus
+    `version_id`; the code itself lives in the version. `guide` shows the
+    usage guide under the message.
+    """
+    message = {"role": role, "content": content}
+    if version_id:
+        message["version_id"] = version_id
+    if guide:
+        message["guide"] = True
+    st.session_state.messages.append(message)
+    if _autosave_enabled():
+        get_autosave().mark_message(st.session_state.session_id, role, content, version_id, guide)
+
+def add_version(version):
+    """Append a website version to the session and queue it for autosave."""
+    st.session_state.website_versions.append(version)
+    if _autosave_enabled():
+        get_autosave().mark_version(st.session_state.project_id, version, st.session_state.session_id)
+
+def version_metadata():
+    """Id, description and timestamp of every version, without loading any code.
+
+    Entries are None for anything in the history that isn't a WebsiteVersion.
+    """
+    versions = st.session_state.website_versions
+    if hasattr(versions, "metadata"):
+        return versions.metadata()
+    return [
+        {"id": v.id, "description": v.description, "timestamp": v.timestamp}
+        if isinstance(v, WebsiteVersion) else None
+        for v in versions
+    ]
+
+def set_current_version_index(index):
+    """Select the active version and queue the change for autosave."""
+    st.session_state.current_version_index = index
+    if _autosave_enabled():
+        get_autosave().mark_current_index(st.session_state.session_id, index)
+
+DEFAULT_STATE_FILE = "website_state.ghs"
+LEGACY_STATE_FILE = "website_state.json"
+
+def save_state_to_file(filename=DEFAULT_STATE_FILE):
+    """Save the current session state; `.json` files use the legacy JSON format."""
     try:
-        with open(filename, "w") as f:
-            json.dump(data, f, indent=2)
+        if filename.endswith(".json"):
+            data = {
+                "messages": list(st.session_state.messages),
+                "website_versions": [v.to_dict() for v in st.session_state.website_versions],
+                "current_version_index": st.session_state.current_version_index,
+                "saved_at": datetime.datetime.now().isoformat()
+            }
+            with open(filename, "w") as f:
+                json.dump(data, f, indent=2)
+        else:
+            write_session(
+                filename,
+                st.session_state.messages,
+                st.session_state.website_versions,
+                st.session_state.current_version_index
+            )
         st.session_state.last_saved = datetime.datetime.now()
         return True
     except Exception as e:
         st.error(f"Error saving state: {str(e)}")
         return False
 
-def load_state_from_file(filename="website_state.json"):
-    """Load session state from a JSON file."""
-    if not os.path.exists(filename):
+def load_state_from_file(filename=None):
+    """Load session state from a saved file, detecting binary or legacy JSON format."""
+    if filename is None:
+        filename = next(
+            (f for f in (DEFAULT_STATE_FILE, LEGACY_STATE_FILE) if os.path.exists(f)), None
+        )
+    if not filename or not os.path.exists(filename):
         return False
-    
+
+    budget = st.session_state.get("memory_budget")
+    if budget is not None:
+        # The loaded lists replace the store-backed histories
+        budget.release(st.session_state.get("messages"))
+        budget.release(st.session_state.get("website_versions"))
+
     try:
+        if detect_format(filename) == "binary":
+            with SessionFile(filename) as session:
+                st.session_state.messages = session.load_messages()
+                st.session_state.website_versions = session.load_versions()
+                st.session_state.current_version_index = session.current_version_index
+                st.session_state.last_saved = datetime.datetime.fromtimestamp(
+                    session.saved_at or datetime.datetime.now().timestamp()
+                )
+            return True
+
         with open(filename, "r") as f:
             data = json.load(f)
         
@@ -77,14 +204,38 @@ def load_state_from_file(filename="website_state.json"):
 
 def clear_session_state():
     """Clear all session state data (reset the app)."""
-    if "messages" in st.session_state:
-        st.session_state.messages = []
-    
-    if "website_versions" in st.session_state:
-        st.session_state.website_versions = []
+    # Start a fresh project so the old history stays intact in the store
+    if st.session_state.get("project_id"):
+        try:
+            store = get_store()
+            project_id = store.create_project()
+            attach_histories(store, project_id, store.create_session(project_id)["id"])
+            st.query_params["project"] = project_id
+        except sqlite3.Error as e:
+            st.warning(f"Could not start a new project: {str(e)}")
+            st.session_state.messages = []
+            st.session_state.website_versions = []
+    else:
+        if "messages" in st.session_state:
+            st.session_state.messages = []
+
+        if "website_versions" in st.session_state:
+            st.session_state.website_versions = []
     
     if "current_version_index" in st.session_state:
         st.session_state.current_version_index = -1
     
     if "submitted" in st.session_state:
-        st.session_state.submitted = False
\ No newline at end of file
+        st.session_state.submitted = False
+
+    if "version_index" in st.session_state:
+        budget = st.session_state.get("memory_budget")
+        if budget is not None:
+            budget.release(st.session_state.version_index)
+        del st.session_state.version_index
+
+
+def session_memory_report():
+    """Memory budget usage of this session, or None without store-backed histories."""
+    budget = st.session_state.get("memory_budget")
+    return budget.report() if budget is not None else None
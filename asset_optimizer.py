@@ -0,0 +1,232 @@
+#asset_optimizer.py
+"""Conservative minifiers and critical-CSS extraction for exported sites.
+
+These are regex tokenizers, not full parsers: they only drop comments and
+whitespace that can't change meaning, and leave anything unusual untouched.
+"""
+import gzip
+import hashlib
+import re
+
+# Strings first so comment markers inside them are never treated as comments
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*[\s\S]*?\*/)')
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+_CSS_AFTER_COLON = re.compile(r":\s+")
+
+_JS_TOKENS = re.compile(
+    r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)'
+    r'|((?:(?<=^)|(?<=[\s;{}(),]))//[^\n]*)'
+    r'|(/\*[\s\S]*?\*/)',
+    re.MULTILINE
+)
+_JS_LINE_BREAKS = re.compile(r"[ \t]*\n\s*")
+
+_HTML_RAW_BLOCKS = re.compile(r"(<(pre|textarea|script|style)\b[\s\S]*?</\2\s*>)", re.IGNORECASE)
+_HTML_COMMENT = re.compile(r"<!--(?!\[if)[\s\S]*?-->")
+_WHITESPACE = re.compile(r"\s+")
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from CSS."""
+    # Pass 1: drop comments (a comment still separates tokens, so leave a space)
+    css = _CSS_TOKENS.sub(lambda m: m.group(1) or " ", css)
+    # Pass 2: tidy everything between string literals
+    out = []
+    last = 0
+    for match in _CSS_TOKENS.finditer(css):
+        if match.group(1):
+            out.append(_tidy_css(css[last:match.start()]))
+            out.append(match.group(1))
+            last = match.end()
+    out.append(_tidy_css(css[last:]))
+    return "".join(out).strip()
+
+def _tidy_css(code):
+    code = _WHITESPACE.sub(" ", code)
+    code = _CSS_PUNCTUATION.sub(r"\1", code)
+    code = _CSS_AFTER_COLON.sub(":", code)
+    return code.replace(";}", "}")
+
+def _split_css_blocks(css):
+    """Split minified CSS into top-level (prelude, body) pairs; body is None for statements."""
+    blocks = []
+    i = 0
+    length = len(css)
+    while i < length:
+        brace = css.find("{", i)
+        semi = css.find(";", i)
+        if brace == -1 or (semi != -1 and semi < brace):
+            # @import/@charset style statement
+            end = semi if semi != -1 else length
+            blocks.append((css[i:end + 1], None))
+            i = end + 1
+            continue
+        depth = 0
+        j = brace
+        while j < length:
+            if css[j] == "{":
+                depth += 1
+            elif css[j] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        blocks.append((css[i:brace], css[brace + 1:j]))
+        i = j + 1
+    return blocks
+
+def _join_css_blocks(blocks):
+    return "".join(prelude if body is None else f"{prelude}{{{body}}}" for prelude, body in blocks)
+
+def dedupe_css_rules(css):
+    """Drop earlier copies of identical rules, keeping the last (cascade-safe).
+
+    Expects minified CSS. Nested at-rule bodies (e.g. @media) are deduped
+    independently.
+    """
+    if "{" not in css or css.count("{") != css.count("}"):
+        return css
+    blocks = []
+    for prelude, body in _split_css_blocks(css):
+        if body is not None and prelude.startswith("@") and "{" in body:
+            body = dedupe_css_rules(body)
+        blocks.append((prelude, body))
+
+    seen = set()
+    kept = []
+    for prelude, body in reversed(blocks):
+        key = (prelude, body)
+        if body is not None and key in seen:
+            continue
+        seen.add(key)
+        kept.append((prelude, body))
+    kept.reverse()
+    return _join_css_blocks(kept)
+
+def minify_js(js):
+    """Strip comments and indentation from JavaScript, keeping line breaks for ASI."""
+    def replace(match):
+        string, line_comment, block_comment = match.groups()
+        if string:
+            return string
+        if block_comment:
+            # A comment still separates tokens; a multi-line one may end a statement
+            return "\n" if "\n" in block_comment else " "
+        return ""
+    # Pass 1: drop comments
+    stripped = _JS_TOKENS.sub(replace, js)
+    # Pass 2: drop indentation and blank lines between literals; string and
+    # template literal contents are part of the program's values
+    out = []
+    last = 0
+    for match in _JS_TOKENS.finditer(stripped):
+        if match.group(1):
+            out.append(_JS_LINE_BREAKS.sub("\n", stripped[last:match.start()]))
+            out.append(match.group(1))
+            last = match.end()
+    out.append(_JS_LINE_BREAKS.sub("\n", stripped[last:]))
+    return "".join(out).strip()
+
+def minify_html(html):
+    """Remove comments and collapse whitespace outside pre/textarea/script/style."""
+    out = []
+    last = 0
+    for match in _HTML_RAW_BLOCKS.finditer(html):
+        out.append(_minify_html_text(html[last:match.start()]))
+        out.append(match.group(1))
+        last = match.end()
+    out.append(_minify_html_text(html[last:]))
+    return "".join(out).strip()
+
+def _minify_html_text(text):
+    text = _HTML_COMMENT.sub("", text)
+    return _WHITESPACE.sub(" ", text)
+
+_TAG_OPEN = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)([^>]*)>")
+_CLASS_ATTR = re.compile(r"""\bclass\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+_ID_ATTR = re.compile(r"""\bid\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+_SELECTOR_PARTS = re.compile(r"([.#]?)(-?[_a-zA-Z][_a-zA-Z0-9-]*)")
+_PSEUDO = re.compile(r"::?[a-zA-Z-]+(\([^)]*\))?")
+_ALWAYS_CRITICAL = {"*", "html", "body", ":root"}
+
+def above_the_fold(html, limit=3):
+    """Return the markup up to the end of the first `limit` top-level sections."""
+    end = 0
+    for _ in range(limit):
+        match = re.search(r"</(header|nav|section|main|div)\s*>", html[end:], re.IGNORECASE)
+        if not match:
+            break
+        end += match.end()
+    return html[:end] if end else html[:4096]
+
+def _collect_selectors(html):
+    tags, classes, ids = set(), set(), set()
+    for match in _TAG_OPEN.finditer(html):
+        tags.add(match.group(1).lower())
+        attrs = match.group(2)
+        class_match = _CLASS_ATTR.search(attrs)
+        if class_match:
+            classes.update(class_match.group(1).split())
+        id_match = _ID_ATTR.search(attrs)
+        if id_match:
+            ids.add(id_match.group(1))
+    return tags, classes, ids
+
+def _selector_is_critical(selector, tags, classes, ids):
+    selector = selector.strip()
+    if selector in _ALWAYS_CRITICAL:
+        return True
+    # Every class, id and tag the selector names must appear above the fold
+    parts = _SELECTOR_PARTS.findall(_PSEUDO.sub("", selector))
+    if not parts:
+        return False
+    for prefix, name in parts:
+        if prefix == "." and name not in classes:
+            return False
+        if prefix == "#" and name not in ids:
+            return False
+        if not prefix and name.lower() not in tags:
+            return False
+    return True
+
+def extract_critical_css(css, html, limit=3):
+    """Return the minified rules that style the first `limit` sections of `html`."""
+    tags, classes, ids = _collect_selectors(above_the_fold(html, limit))
+    critical = []
+    for prelude, body in _split_css_blocks(css):
+        if body is None or prelude.startswith("@"):
+            if prelude.startswith("@font-face") or prelude.startswith("@import"):
+                critical.append((prelude, body))
+            continue
+        if any(_selector_is_critical(s, tags, classes, ids) for s in prelude.split(",")):
+            critical.append((prelude, body))
+    return _join_css_blocks(critical)
+
+def gzip_bytes(data):
+    """Gzip with a fixed mtime so identical input gives identical archives."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def brotli_bytes(data):
+    """Brotli at maximum quality, or None when the optional brotli package is missing."""
+    brotli = _brotli()
+    if brotli is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return brotli.compress(data, quality=11)
+
+def fingerprint_name(name, data, length=10):
+    """Insert a content hash before the extension: styles.css -> styles.<hash>.css."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:length]
+    stem, dot, ext = name.rpartition(".")
+    return f"{stem}.{digest}.{ext}" if dot else f"{name}.{digest}"
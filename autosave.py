@@ -0,0 +1,197 @@
+#autosave.py
+import atexit
+import sqlite3
+import threading
+import time
+from config import get_setting
+
+class AutosaveService:
+    """Debounced background writer for session changes.
+
+    The script thread only records what changed (`mark_*`); a daemon thread
+    writes the pending changes to the project store once no new change has
+    arrived for `debounce` seconds (or `max_delay` after the first one), and
+    once more at interpreter shutdown.
+
+    Transient database errors (locked, busy, I/O) put the batch back to be
+    retried. Any other error means a change can never be written, e.g. a
+    duplicate version id; such changes are set aside in `rejected` so they
+    don't block everything queued after them.
+    """
+
+    def __init__(self, store, debounce=1.0, max_delay=5.0):
+        self._store = store
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._current_index = {}  # session_id -> index; only the latest value is written
+        self._first_dirty = None
+        self._last_dirty = None
+        self._stopped = False
+        self.rejected = []  # (change, error message) that failed outside transient errors
+        self._metrics = {
+            "flushes": 0,
+            "errors": 0,
+            "consecutive_errors": 0,
+            "rejected": 0,
+            "last_error": None,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "last_bytes": 0,
+            "total_bytes": 0,
+            "last_flush_at": None,
+        }
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    # Dirty tracking (called from the script thread; never touches the database)
+
+    def mark_message(self, session_id, role, content, version_id=None, guide=False):
+        self._mark(("message", session_id, role, content, version_id, guide))
+
+    def mark_version(self, project_id, version, session_id=None):
+        self._mark(("version", project_id, version, session_id))
+
+    def mark_current_index(self, session_id, index):
+        with self._cond:
+            self._current_index[session_id] = index
+            self._touch()
+
+    def _mark(self, change):
+        with self._cond:
+            self._pending.append(change)
+            self._touch()
+
+    def _touch(self):
+        now = time.monotonic()
+        if self._first_dirty is None:
+            self._first_dirty = now
+        self._last_dirty = now
+        self._cond.notify()
+
+    # Background flushing
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._first_dirty is None:
+                        self._cond.wait()
+                        continue
+                    due = min(self._last_dirty + self.debounce, self._first_dirty + self.max_delay)
+                    delay = due - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._stopped:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write all pending changes now; returns the number of bytes written."""
+        with self._flush_lock:
+            with self._cond:
+                changes = self._pending
+                changes.extend(("current_index", session_id, index)
+                               for session_id, index in self._current_index.items())
+                self._pending = []
+                self._current_index = {}
+                self._first_dirty = self._last_dirty = None
+            if not changes:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                written = self._store.apply_changes(changes)
+            except sqlite3.OperationalError as e:
+                self._failed(changes, e)
+                return 0
+            except sqlite3.Error:
+                # The batch was rolled back; write what can be written one by one
+                written = 0
+                for i, change in enumerate(changes):
+                    try:
+                        written += self._store.apply_changes([change])
+                    except sqlite3.OperationalError as e:
+                        self._failed(changes[i:], e)
+                        return written
+                    except sqlite3.Error as e:
+                        self._reject(change, e)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._cond:
+                metrics = self._metrics
+                metrics["flushes"] += 1
+                metrics["consecutive_errors"] = 0
+                metrics["last_flush_ms"] = elapsed_ms
+                metrics["total_flush_ms"] += elapsed_ms
+                metrics["last_bytes"] = written
+                metrics["total_bytes"] += written
+                metrics["last_flush_at"] = time.time()
+            return written
+
+    def _failed(self, changes, error):
+        print(f"Autosave failed, will retry: {str(error)}")
+        with self._cond:
+            self._metrics["errors"] += 1
+            self._metrics["consecutive_errors"] += 1
+            self._metrics["last_error"] = str(error)
+            self._requeue(changes)
+
+    def _reject(self, change, error):
+        print(f"Autosave dropped a {change[0]} change: {str(error)}")
+        with self._cond:
+            self.rejected.append((change, str(error)))
+            self._metrics["errors"] += 1
+            self._metrics["rejected"] += 1
+            self._metrics["last_error"] = str(error)
+
+    def _requeue(self, changes):
+        # Put failed changes back in front of anything marked during the flush
+        for change in changes:
+            if change[0] == "current_index":
+                self._current_index.setdefault(change[1], change[2])
+        self._pending = [c for c in changes if c[0] != "current_index"] + self._pending
+        self._touch()
+
+    def has_pending(self):
+        with self._cond:
+            return bool(self._pending or self._current_index)
+
+    def metrics(self):
+        """Return a snapshot of flush latency and bytes-written counters."""
+        with self._cond:
+            snapshot = dict(self._metrics)
+            snapshot["pending"] = len(self._pending) + len(self._current_index)
+        flushes = snapshot["flushes"]
+        snapshot["avg_flush_ms"] = snapshot["total_flush_ms"] / flushes if flushes else 0.0
+        return snapshot
+
+    def stop(self):
+        """Stop the background thread and write anything still pending."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_autosave():
+    """Return the process-wide AutosaveService, starting it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from project_store import get_store
+                _service = AutosaveService(
+                    get_store(),
+                    debounce=float(get_setting("GHATA_AUTOSAVE_DEBOUNCE", "1.0")),
+                    max_delay=float(get_setting("GHATA_AUTOSAVE_MAX_DELAY", "5.0"))
+                )
+                atexit.register(_service.stop)
+    return _service
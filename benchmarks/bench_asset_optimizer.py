@@ -0,0 +1,92 @@
+#bench_asset_optimizer.py
+"""Byte savings and processing time of the export optimization stage.
+
+Run from the repository root:
+    python benchmarks/bench_asset_optimizer.py [--sites 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import file_handler
+from asset_optimizer import gzip_bytes, minify_js
+from file_handler import build_index_html, create_download_zip, optimize_assets
+from sample_sites import make_site
+from website_version import WebsiteVersion
+
+# (source, expected minified output) pairs the optimizer must keep meaning-preserving
+MINIFY_JS_CASES = [
+    ("return/* x */value;", "return value;"),
+    ("let a = 1; /* note */\n  let b = 2;", "let a = 1;\nlet b = 2;"),
+    ("a = b/*\n*/c", "a = b\nc"),
+    ("s = '/* not a comment */'; // tail", "s = '/* not a comment */';"),
+]
+
+def check_minify_js():
+    for source, expected in MINIFY_JS_CASES:
+        result = minify_js(source)
+        assert result == expected, f"minify_js({source!r}) = {result!r}, expected {expected!r}"
+    print(f"minify_js: {len(MINIFY_JS_CASES)} cases ok")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=200)
+    args = parser.parse_args()
+    check_minify_js()
+
+    versions = [WebsiteVersion(*make_site(seed=i, sections=4 + i % 5), description=f"site {i}")
+                for i in range(args.sites)]
+    file_handler.OPTIMIZED_CACHE_SIZE = args.sites
+
+    totals = {"raw": 0, "min": 0, "gz_raw": 0, "gz_min": 0}
+    for kind in ("html", "css", "js"):
+        totals[kind] = [0, 0]
+
+    start = time.perf_counter()
+    optimized = [optimize_assets(v) for v in versions]
+    cold_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for v in versions:
+        optimize_assets(v)
+    warm_s = time.perf_counter() - start
+
+    for v, assets in zip(versions, optimized):
+        raw = {"html": build_index_html(v, "Site"), "css": v.css, "js": v.js}
+        mini = {"html": build_index_html(v, "Site", assets), "css": assets["css"], "js": assets["js"]}
+        for kind in ("html", "css", "js"):
+            raw_len, min_len = len(raw[kind].encode()), len(mini[kind].encode())
+            totals[kind][0] += raw_len
+            totals[kind][1] += min_len
+            totals["raw"] += raw_len
+            totals["min"] += min_len
+            totals["gz_raw"] += len(gzip_bytes(raw[kind]))
+            totals["gz_min"] += len(gzip_bytes(mini[kind]))
+
+    print(f"{args.sites} sites")
+    for kind in ("html", "css", "js"):
+        raw_len, min_len = totals[kind]
+        print(f"  {kind:<5} {raw_len / 1024:8.0f} KB -> {min_len / 1024:8.0f} KB  ({1 - min_len / raw_len:5.1%} smaller)")
+    print(f"  total {totals['raw'] / 1024:8.0f} KB -> {totals['min'] / 1024:8.0f} KB  "
+          f"({1 - totals['min'] / totals['raw']:5.1%} smaller)")
+    print(f"  gzip  {totals['gz_raw'] / 1024:8.0f} KB -> {totals['gz_min'] / 1024:8.0f} KB  "
+          f"({1 - totals['gz_min'] / totals['gz_raw']:5.1%} smaller over the wire)")
+    print(f"optimize: {cold_s / args.sites * 1000:.2f} ms/site cold, "
+          f"{warm_s / args.sites * 1e6:.1f} us/site cached")
+
+    start = time.perf_counter()
+    for v in versions[:50]:
+        create_download_zip(v)
+    plain_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for v in versions[:50]:
+        create_download_zip(v, optimize=True)
+    opt_s = time.perf_counter() - start
+    print(f"zip build: {plain_s / 50 * 1000:.2f} ms plain, {opt_s / 50 * 1000:.2f} ms optimized (cached assets)")
+
+if __name__ == "__main__":
+    main()
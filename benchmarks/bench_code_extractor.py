@@ -0,0 +1,98 @@
+#bench_code_extractor.py
+"""Compare the single-pass response tokenizer with the previous regex functions.
+
+The previous extract_code_from_response ran one lazy regex per language
+over the whole response, and clean_response_for_display two more
+substitutions. The script checks both give the same results on a corpus
+of ~100KB responses, then times a cold pass (new responses) and a warm
+pass (the same responses again, as on a Streamlit rerun).
+
+Run from the repository root:
+    python benchmarks/bench_code_extractor.py [--responses 20] [--size 100000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sample_sites import make_response
+from code_extractor import extract_code_from_response, clean_response_for_display, parse_response
+
+def legacy_extract(response):
+    html_code = css_code = js_code = ""
+    html_matches = re.findall(r"```html\s*([\s\S]*?)\s*```", response)
+    if html_matches:
+        html_code = html_matches[0].strip()
+    css_matches = re.findall(r"```css\s*([\s\S]*?)\s*```", response)
+    if css_matches:
+        css_code = css_matches[0].strip()
+    js_matches = re.findall(r"```(?:javascript|js)\s*([\s\S]*?)\s*```", response)
+    if js_matches:
+        js_code = js_matches[0].strip()
+    if not css_code and not js_code:
+        inline_css = re.findall(r"<style>([\s\S]*?)</style>", html_code, re.IGNORECASE)
+        inline_js = re.findall(r"<script>([\s\S]*?)</script>", html_code, re.IGNORECASE)
+        if inline_css:
+            css_code = inline_css[0].strip()
+        if inline_js:
+            js_code = inline_js[0].strip()
+    return html_code, css_code, js_code
+
+def legacy_clean(response):
+    cleaned = re.sub(r'```(html|css|javascript|js)[\s\S]*?```', '[Code block removed for clarity]', response)
+    cleaned = re.sub(r'```[\s\S]*?```', '[Code block removed for clarity]', cleaned)
+    return cleaned
+
+def build_corpus(count, size):
+    corpus = []
+    for seed in range(count):
+        response = make_response(seed, sections=8)
+        # Pad the prose and code to the target size, as long generations are
+        padding = "\n".join(f"<p class=\"filler-{i}\">Paragraph {i} of seed {seed}.</p>"
+                            for i in range(max(0, (size - len(response)) // 45)))
+        response = response.replace("```html\n", "```html\n" + padding + "\n", 1)
+        corpus.append(response + f"\n\nExtra notes:\n```bash\nnpm run build-{seed}\n```\n")
+    return corpus
+
+def timed(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in corpus:
+            fn(response)
+    return (time.perf_counter() - start) / (repeat * len(corpus))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responses", type=int, default=20)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.responses, args.size)
+    average = sum(map(len, corpus)) / len(corpus)
+    for response in corpus:
+        assert extract_code_from_response(response) == legacy_extract(response)
+        assert clean_response_for_display(response) == legacy_clean(response)
+    print(f"{len(corpus)} responses, {average / 1024:.0f} KB on average; outputs match")
+
+    def both_legacy(response):
+        legacy_extract(response)
+        legacy_clean(response)
+
+    def both_new(response):
+        extract_code_from_response(response)
+        clean_response_for_display(response)
+
+    legacy = timed(both_legacy, corpus, args.repeat)
+    parse_response.cache_clear()
+    cold = timed(lambda r: (parse_response.cache_clear(), both_new(r)), corpus, args.repeat)
+    both_new_warm = timed(both_new, corpus, args.repeat)
+    print(f"{'previous regexes':<26} {legacy * 1e3:8.3f} ms per response")
+    print(f"{'single pass, cold':<26} {cold * 1e3:8.3f} ms per response  ({legacy / cold:5.1f}x)")
+    print(f"{'single pass, cached':<26} {both_new_warm * 1e3:8.3f} ms per response  ({legacy / both_new_warm:5.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#bench_image_mirror.py
+"""Offline check and timing of image mirroring against a local image server.
+
+A thread-hosted http.server stands in for Pexels/Unsplash. The script
+exports two versions that share images, then exports again, and reports
+how many requests reached the server (each image should be fetched once).
+It also builds deploy bundles with mirrored images and checks that every
+image reference in index.html and the fingerprinted stylesheet resolves
+to a file in the archive.
+
+Run from the repository root:
+    python benchmarks/bench_image_mirror.py [--images 8]
+"""
+import argparse
+import io
+import os
+import posixpath
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_mirror
+from file_handler import create_all_versions_zip, create_download_zip
+from image_mirror import ImageCache, mirror_images, _pillow
+from website_version import WebsiteVersion
+
+_LOCAL_REF = re.compile(r"""(?:src=["']|url\(["']?)([^"')]*images/[^"')]+)""")
+
+def check_bundle_refs(data, pages):
+    """Return the image references in `pages` (and their stylesheets) missing from the ZIP."""
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    names = set(archive.namelist())
+    missing = []
+    for page in pages:
+        html = archive.read(page).decode("utf-8")
+        documents = [(page, html)]
+        for href in re.findall(r'href="([^"]+\.css)"', html):
+            path = posixpath.normpath(posixpath.join(posixpath.dirname(page), href))
+            documents.append((path, archive.read(path).decode("utf-8")))
+        for path, text in documents:
+            for ref in _LOCAL_REF.findall(text):
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(path), ref))
+                if target not in names:
+                    missing.append(f"{path}: {ref}")
+    return missing
+
+def make_png(width, height, seed):
+    """Build a solid-colour PNG with the standard library only."""
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+    row = b"\x00" + bytes([(seed * 40) % 256, (seed * 90) % 256, (seed * 150) % 256]) * width
+    raw = zlib.compress(row * height)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", raw) + chunk(b"IEND", b"")
+
+class ImageServer(ThreadingHTTPServer):
+    def __init__(self, images):
+        super().__init__(("127.0.0.1", 0), ImageHandler)
+        self.images = images
+        self.requests = 0
+        self.paths = []
+        self.lock = threading.Lock()
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.paths.append(self.path)
+        data = self.server.images.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=8)
+    args = parser.parse_args()
+
+    images = {f"/photos/{i}.png": make_png(1600, 1000, i) for i in range(args.images)}
+    server = ImageServer(images)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def site(offset):
+        tags = "\n".join(
+            f'<img src="{base}/photos/{(i + offset) % args.images}.png" alt="photo {i}" width="600" height="375">'
+            for i in range(args.images)
+        )
+        css = f".hero {{ background-image: url('{base}/photos/0.png'); }}"
+        return f"<main>{tags}<img src=\"{base}/missing.png\" alt=\"broken\"></main>", css
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ImageCache(os.path.join(tmp, "cache"))
+        timings = []
+        for label, offset in (("version 1 (cold)", 0), ("version 2 (shared)", 3), ("version 1 again", 0)):
+            html, css = site(offset)
+            start = time.perf_counter()
+            new_html, new_css, files = mirror_images(html, css, cache=cache)
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+            local_refs = new_html.count('src="images/')
+            print(f"{label:<20} {elapsed * 1000:7.1f} ms  {len(files):3d} files "
+                  f"{sum(map(len, files.values())) / 1024:7.0f} KB  local <img>: {local_refs}  "
+                  f"server requests so far: {server.requests}")
+
+        print(f"responsive variants: {'yes (Pillow)' if _pillow() else 'skipped (Pillow not installed)'}")
+        print(f"missing image left remote: {base + '/missing.png' in new_html}")
+        print(f"css url rewritten: {'images/' in new_css}")
+
+        # Deploy bundles move the stylesheet into assets/; its url()s must still resolve
+        image_mirror._cache = cache
+        versions = [WebsiteVersion(html=h, css=c, description=f"v{i}")
+                    for i, (h, c) in enumerate(site(offset) for offset in (0, 3))]
+        single = create_download_zip(versions[0], mirror_images=True, deploy=True)
+        combined = create_all_versions_zip(versions, mirror_images=True, deploy=True)
+        folders = [f"v{i+1}_{v.id}/index.html" for i, v in enumerate(versions)]
+        broken = check_bundle_refs(single, ["index.html"]) + check_bundle_refs(combined, folders)
+        print(f"deploy + mirror refs check: {'ok' if not broken else 'FAILED ' + ', '.join(broken[:3])}")
+
+    server.shutdown()
+    # Every image is requested once, and so is the missing one: later exports
+    # skip it while the cache remembers the failure
+    expected = args.images + 1
+    print(f"download-once check: {'ok' if server.requests == expected else 'FAILED'} "
+          f"({server.requests} requests, expected {expected})")
+    missing_requests = server.paths.count("/missing.png")
+    print(f"failed URL skipped by later exports: {'ok' if missing_requests == 1 else 'FAILED'} "
+          f"({missing_requests} request(s) for the missing image across all exports)")
+    assert server.requests == expected and missing_requests == 1
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#bench_job_queue.py
+"""Offline check and timing of the job queue with several local workers.
+
+A stand-in handler sleeps for the simulated model latency and returns the
+extracted code of a synthetic response, so no API key is needed. The
+script runs the same batch through the in-process queue (threads) and the
+SQLite queue (worker processes), checks every job finished exactly once,
+and also kills a worker mid-job to show its job is picked up again after
+the lease expires.
+
+Run from the repository root:
+    python benchmarks/bench_job_queue.py [--jobs 40] [--workers 4] [--latency 0.2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import (InProcessJobQueue, SQLiteJobQueue, DONE, start_worker_threads,
+                       start_worker_processes, job_result_version)
+
+HANDLER = "benchmarks.bench_job_queue:fake_generation"
+
+def fake_generation(payload):
+    """Sleep like a model call, then return a generation-job style result."""
+    from benchmarks.sample_sites import make_response
+    from code_extractor import extract_code_from_response
+    time.sleep(payload["latency"])
+    response = make_response(payload["seed"])
+    html, css, js = extract_code_from_response(response)
+    return {"response": response, "html": html, "css": css, "js": js,
+            "description": f"Site {payload['seed']}", "pid": os.getpid()}
+
+def check(job_queue, job_ids):
+    jobs = [job_queue.get(job_id) for job_id in job_ids]
+    done = [job for job in jobs if job.status == DONE]
+    versions = [job_result_version(job.result) for job in done]
+    assert len(done) == len(job_ids), f"only {len(done)}/{len(job_ids)} jobs finished"
+    assert all(version.html for version in versions)
+    assert max(job.attempts for job in done) == 1 or job_queue.max_attempts > 1
+    return {job.result["pid"] for job in done}
+
+def run_threads(args):
+    job_queue = InProcessJobQueue()
+    job_ids = [job_queue.submit(HANDLER, {"seed": i, "latency": args.latency}) for i in range(args.jobs)]
+    stop = threading.Event()
+    start = time.perf_counter()
+    start_worker_threads(job_queue, args.workers, stop)
+    for job_id in job_ids:
+        job_queue.wait(job_id)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    check(job_queue, job_ids)
+    print(f"in-process, {args.workers} threads    {elapsed:6.2f} s  ({args.jobs / elapsed:5.1f} jobs/s)")
+
+def run_processes(args, directory):
+    path = os.path.join(directory, "jobs.db")
+    job_queue = SQLiteJobQueue(path)
+    job_ids = [job_queue.submit(HANDLER, {"seed": i, "latency": args.latency}) for i in range(args.jobs)]
+    start = time.perf_counter()
+    processes = start_worker_processes(path, args.workers, idle_exit=1.0)
+    for job_id in job_ids:
+        job_queue.wait(job_id, poll_interval=0.05)
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    pids = check(job_queue, job_ids)
+    print(f"sqlite, {args.workers} processes       {elapsed:6.2f} s  ({args.jobs / elapsed:5.1f} jobs/s)"
+          f"  {len(pids)} worker pid(s) used")
+
+def run_crash_recovery(args, directory):
+    path = os.path.join(directory, "crash.db")
+    job_queue = SQLiteJobQueue(path, lease=1.0)
+    job_id = job_queue.submit(HANDLER, {"seed": 0, "latency": 5.0})
+    victim = start_worker_processes(path, 1, lease=1.0)[0]
+    while job_queue.get(job_id).status != "running":
+        time.sleep(0.05)
+    victim.terminate()
+    victim.join()
+    # A fresh worker takes the job over once the dead worker's lease runs out
+    recovery = SQLiteJobQueue(path, lease=1.0)
+    recovery_job = None
+    while recovery_job is None:
+        recovery_job = recovery.claim("recovery")
+        time.sleep(0.1)
+    recovery.complete(recovery_job.id, fake_generation(dict(recovery_job.payload, latency=0)))
+    job = recovery.get(job_id)
+    assert job.status == DONE and job.attempts == 2
+    print(f"crash recovery                 job re-run after lease expiry (attempts={job.attempts})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    serial = args.jobs * args.latency
+    print(f"{args.jobs} jobs at {args.latency:.2f} s each (serial: {serial:.1f} s)")
+    run_threads(args)
+    with tempfile.TemporaryDirectory() as directory:
+        run_processes(args, directory)
+        run_crash_recovery(args, directory)
+
+if __name__ == "__main__":
+    main()
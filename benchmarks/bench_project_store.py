@@ -0,0 +1,75 @@
+#bench_project_store.py
+"""Benchmark the SQLite project store with many projects.
+
+Run from the repository root:
+    python benchmarks/bench_project_store.py [--projects 10000] [--versions 3] [--code-size 4096]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project_store import ProjectStore
+from website_version import WebsiteVersion
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} median {statistics.median(samples) * 1e6:9.1f} us   p95 {p95 * 1e6:9.1f} us")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--versions", type=int, default=3)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--code-size", type=int, default=4096)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    html = "<section>" + "x" * args.code_size + "</section>"
+    css = "body{}" + "y" * args.code_size
+    js = "console.log(1);" + "z" * args.code_size
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProjectStore(os.path.join(tmp, "bench.db"))
+
+        start = time.perf_counter()
+        project_ids = []
+        for p in range(args.projects):
+            project_id = store.create_project(f"project {p}")
+            session_id = store.create_session(project_id)["id"]
+            for m in range(args.messages):
+                store.add_message(session_id, "user" if m % 2 == 0 else "assistant", f"message {m}")
+            for v in range(args.versions):
+                store.add_version(project_id, WebsiteVersion(html, css, js, f"version {v}"), session_id)
+            project_ids.append(project_id)
+        elapsed = time.perf_counter() - start
+        print(f"populated {args.projects} projects x {args.versions} versions in {elapsed:.1f} s "
+              f"({args.projects / elapsed:.0f} projects/s)")
+        print(f"database size: {os.path.getsize(os.path.join(tmp, 'bench.db')) / 1e6:.1f} MB")
+
+        sample = [random.choice(project_ids) for _ in range(args.lookups)]
+        report("list_versions (metadata)", [timed(store.list_versions, pid)[1] for pid in sample])
+        report("get_latest_session", [timed(store.get_latest_session, pid)[1] for pid in sample])
+
+        histories = [store.load_version_history(pid) for pid in sample]
+        report("load latest version (code)", [timed(h.__getitem__, -1)[1] for h in histories])
+
+        sessions = [store.get_latest_session(pid)["id"] for pid in sample]
+        report("get_messages", [timed(store.get_messages, sid)[1] for sid in sessions])
+        report("list_projects page", [timed(store.list_projects, 50, 0)[1] for _ in range(200)])
+
+        store.close()
+
+if __name__ == "__main__":
+    main()
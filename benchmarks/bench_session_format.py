@@ -0,0 +1,83 @@
+#bench_session_format.py
+"""Compare saved-session formats: legacy indented JSON vs the binary format.
+
+Run from the repository root:
+    python benchmarks/bench_session_format.py [--versions 50]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sample_sites import make_site, make_response
+from session_format import SessionFile, available_codecs, write_session
+from website_version import WebsiteVersion
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", type=int, default=50)
+    args = parser.parse_args()
+
+    versions, messages = [], []
+    for i in range(args.versions):
+        html, css, js = make_site(seed=i, sections=8)
+        versions.append(WebsiteVersion(html, css, js, f"revision {i}"))
+        messages.append({"role": "user", "content": f"please change revision {i}"})
+        messages.append({"role": "assistant", "content": make_response(seed=i, sections=8)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "state.json")
+
+        def save_json():
+            data = {"messages": messages, "website_versions": [v.to_dict() for v in versions],
+                    "current_version_index": len(versions) - 1, "saved_at": "2025-01-01T00:00:00"}
+            with open(json_path, "w") as f:
+                json.dump(data, f, indent=2)
+
+        def load_json():
+            with open(json_path) as f:
+                data = json.load(f)
+            [WebsiteVersion.from_dict(v) for v in data["website_versions"]]
+
+        def list_json():
+            with open(json_path) as f:
+                data = json.load(f)
+            [(v["id"], v["description"]) for v in data["website_versions"]]
+
+        save_s = best_of(save_json)
+        print(f"{args.versions} versions, {len(messages)} messages")
+        print(f"{'format':<12}{'size KB':>10}{'save ms':>10}{'load ms':>10}{'list ms':>10}")
+        print(f"{'json':<12}{os.path.getsize(json_path) / 1024:>10.0f}{save_s * 1000:>10.1f}"
+              f"{best_of(load_json) * 1000:>10.1f}{best_of(list_json) * 1000:>10.1f}")
+
+        for codec in available_codecs():
+            path = os.path.join(tmp, f"state.{codec}.ghs")
+            save_s = best_of(lambda: write_session(path, messages, versions, len(versions) - 1, codec=codec))
+
+            def load():
+                with SessionFile(path) as session:
+                    session.load_messages()
+                    session.load_versions()
+
+            def listing():
+                with SessionFile(path) as session:
+                    session.versions_meta()
+
+            print(f"{'ghs/' + codec:<12}{os.path.getsize(path) / 1024:>10.0f}{save_s * 1000:>10.1f}"
+                  f"{best_of(load) * 1000:>10.1f}{best_of(listing) * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
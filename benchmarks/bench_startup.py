@@ -0,0 +1,94 @@
+#bench_startup.py
+"""Cold-start import benchmark based on `python -X importtime`.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py [--runs 5] [--top 10]
+
+Each target is imported in a fresh interpreter so nothing is cached in
+sys.modules. The core layer is also checked to make sure it stays free of
+streamlit and openai.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "core": "import website_version, file_handler, code_extractor",
+    "headless": "import headless",
+    "llm_handler": "import llm_handler",
+    "app": "import app",
+}
+
+HEAVY_MODULES = ("streamlit", "openai", "requests", "dotenv")
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def run_target(statement):
+    """Import a statement in a fresh interpreter and return its timings and error."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    error = None
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1]
+    return parse_importtime(proc.stderr), error
+
+def check_core_isolation():
+    """Return the heavy modules pulled in by importing the core layer."""
+    probe = (
+        TARGETS["core"] + "; import sys; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT,
+                          capture_output=True, text=True)
+    return [m for m in proc.stdout.strip().split(",") if m]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, statement in TARGETS.items():
+        totals = []
+        last_timings = {}
+        error = None
+        for _ in range(args.runs):
+            timings, error = run_target(statement)
+            if error:
+                break
+            totals.append(sum(self_us for self_us, _ in timings.values()))
+            last_timings = timings
+
+        print(f"== {label}: {statement}")
+        if error:
+            print(f"   skipped ({error})")
+            continue
+        print(f"   median total import time: {statistics.median(totals) / 1000:.1f} ms "
+              f"over {args.runs} runs, {len(last_timings)} modules")
+        hotspots = sorted(last_timings.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_us, cumulative_us) in hotspots[:args.top]:
+            print(f"   {cumulative_us / 1000:8.1f} ms cumulative  {self_us / 1000:7.1f} ms self  {name}")
+
+    leaked = check_core_isolation()
+    if leaked:
+        print(f"!! core layer imports heavy modules: {', '.join(leaked)}")
+        return 1
+    print("core layer imports without streamlit/openai/requests/dotenv")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
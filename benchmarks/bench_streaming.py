@@ -0,0 +1,159 @@
+#bench_streaming.py
+"""CPU cost per generated token of consuming a stream, with and without coalescing.
+
+A thread-hosted mock server streams a model-style response as OpenAI
+chat-completion SSE events of a few characters each (20k by default). The
+client parses them into chunk objects shaped like the OpenAI SDK's and
+feeds them through llm_handler's delta loop, then to a UI stand-in that
+re-extracts and serializes the page on every call, once per delta and
+once per coalesced batch. Each run
+reports CPU time per token, with the SSE parsing baseline subtracted.
+
+Run from the repository root:
+    python benchmarks/bench_streaming.py [--chunks 20000]
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sample_sites import make_response
+from live_preview import StreamingCodeExtractor
+from llm_handler import stream_completion
+from stream_adapter import StreamFanout, StreamStats, coalesce
+import llm_handler
+
+class StreamServer(ThreadingHTTPServer):
+    def __init__(self, events):
+        super().__init__(("127.0.0.1", 0), StreamHandler)
+        self.events = events
+
+class StreamHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(self.server.events)
+
+    def log_message(self, format, *args):
+        pass
+
+def build_events(chunks):
+    response = make_response(1, sections=8)
+    while len(response) < chunks * 3:
+        response += make_response(len(response), sections=8)
+    step = max(1, len(response) // chunks)
+    pieces = [response[i:i + step] for i in range(0, len(response), step)][:chunks]
+    lines = []
+    for piece in pieces:
+        event = {"id": "bench", "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        lines.append(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+    lines.append(b"data: [DONE]\n\n")
+    return b"".join(lines), "".join(pieces)
+
+class Namespace:
+    def __init__(self, data):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                value = Namespace(value)
+            elif isinstance(value, list):
+                value = [Namespace(v) if isinstance(v, dict) else v for v in value]
+            setattr(self, key, value)
+
+def sse_chunks(address):
+    """Yield SDK-like chunk objects from the mock server."""
+    connection = http.client.HTTPConnection(*address)
+    connection.request("POST", "/v1/chat/completions", body=b"{}")
+    response = connection.getresponse()
+    for line in response:
+        if not line.startswith(b"data: "):
+            continue
+        payload = line[6:].strip()
+        if payload == b"[DONE]":
+            break
+        yield Namespace(json.loads(payload))
+    connection.close()
+
+class FakeClient:
+    """Just enough of the OpenAI client for stream_completion()."""
+
+    def __init__(self, address):
+        self.chat = Namespace({"completions": {}})
+        self.chat.completions.create = lambda **kwargs: sse_chunks(address)
+
+class NaiveUI:
+    """A consumer that redraws on every call, like an unthrottled st.empty() update."""
+
+    def __init__(self):
+        self.extractor = StreamingCodeExtractor()
+        self.frames = 0
+
+    def update(self, text):
+        self.extractor.feed(text)
+        # Stand-in for pushing a frame to the browser: serialize the partial page
+        json.dumps({"html": self.extractor.partial_html()[-4096:]})
+        self.frames += 1
+
+def run(label, address, consume, baseline=None):
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    text, extra = consume(stream_completion([], {"model": "m", "temperature": 0, "top_p": 1, "max_tokens": 1}))
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start
+    tokens = len(text) / 3.5
+    overhead = "" if baseline is None else f"{(cpu - baseline) / tokens * 1e6:8.2f} us/token over parsing"
+    print(f"{label:<22} cpu {cpu * 1000:8.1f} ms   wall {wall * 1000:8.1f} ms   "
+          f"{cpu / tokens * 1e6:7.2f} us/token {overhead}   {extra}")
+    return cpu, text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    args = parser.parse_args()
+
+    events, expected = build_events(args.chunks)
+    server = StreamServer(events)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_handler._client = FakeClient(server.server_address[:2])
+    print(f"{args.chunks} chunks, {len(expected)} chars (~{len(expected) / 3.5:.0f} tokens)")
+
+    def parse_only(deltas):
+        return "".join(deltas), ""
+
+    def per_delta(deltas):
+        ui = NaiveUI()
+        parts = []
+        for delta in deltas:
+            parts.append(delta)
+            ui.update(delta)
+        return "".join(parts), f"{ui.frames} frames"
+
+    def coalesced(deltas):
+        ui = NaiveUI()
+        fanout = StreamFanout().add(ui.update)
+        stats = StreamStats()
+        parts = []
+        for batch in coalesce(deltas, stats):
+            parts.append(batch)
+            fanout.feed(batch)
+        fanout.close()
+        return "".join(parts), f"{ui.frames} frames, {stats.batches} batches"
+
+    baseline, text = run("parse only", server.server_address, parse_only)
+    assert text == expected
+    _, text = run("per-delta updates", server.server_address, per_delta, baseline)
+    assert text == expected
+    _, text = run("coalesced + fanout", server.server_address, coalesced, baseline)
+    assert text == expected
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
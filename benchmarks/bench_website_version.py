@@ -0,0 +1,91 @@
+#bench_website_version.py
+"""Memory and load-time benchmark for large version histories.
+
+Compares the slotted WebsiteVersion against the previous dict-based class
+(copied below) for creating, loading (`from_dict`) and saving (`to_dict`).
+
+Run from the repository root:
+    python benchmarks/bench_website_version.py [--versions 50000]
+"""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website_version import WebsiteVersion
+
+class LegacyWebsiteVersion:
+    """The pre-slots implementation, kept here only for comparison."""
+
+    def __init__(self, html="", css="", js="", description="", timestamp=None):
+        self.html = html
+        self.css = css
+        self.js = js
+        self.description = description
+        self.timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.id = str(uuid.uuid4())[:8]
+
+    def to_dict(self):
+        return {"id": self.id, "html": self.html, "css": self.css, "js": self.js,
+                "description": self.description, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(html=data.get("html", ""), css=data.get("css", ""), js=data.get("js", ""),
+                   description=data.get("description", "No description provided."),
+                   timestamp=data.get("timestamp") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+def measure(label, cls, records):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    versions = [cls.from_dict(r) for r in records]
+    load_s = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for v in versions:
+        v.to_dict()
+    save_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    created = [cls("<p></p>", "p{}", "", "new") for _ in range(len(records))]
+    create_s = time.perf_counter() - start
+
+    stable = all(v.id == r["id"] for v, r in zip(versions, records))
+    n = len(records)
+    print(f"{label:<8} load {load_s / n * 1e6:6.2f} us/v   save {save_s / n * 1e6:6.2f} us/v   "
+          f"create {create_s / n * 1e6:6.2f} us/v   memory {current / n:7.0f} B/v   "
+          f"stable ids: {stable}")
+    del versions, created
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", type=int, default=50000)
+    args = parser.parse_args()
+
+    # Code strings are shared between records so the numbers reflect per-object overhead
+    html, css, js = "<main>" + "x" * 2000 + "</main>", "body{}" * 200, "let a = 1;" * 100
+    descriptions = ["Create a landing page for a bakery", "Make the header darker", "Add a contact form"]
+    records = [
+        WebsiteVersion(html, css, js, descriptions[i % 3], created_at=1.7e9 + i).to_dict()
+        for i in range(args.versions)
+    ]
+    # Legacy records had no epoch field and only the formatted timestamp
+    legacy_records = [{k: v for k, v in r.items() if k != "created_at"} for r in records]
+
+    print(f"{args.versions} versions")
+    measure("legacy", LegacyWebsiteVersion, records)
+    measure("slots", WebsiteVersion, records)
+    measure("slots*", WebsiteVersion, legacy_records)
+    print("slots* = slotted class loading old files without created_at (parses timestamp)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#sample_sites.py
+"""Synthetic generated-site corpus shared by the benchmarks.
+
+The sites imitate what the system prompt asks the model for: full pages
+with a comment on every section, quoted attributes and plenty of newlines.
+"""
+import random
+
+SECTIONS = ["hero", "about", "menu", "gallery", "testimonials", "pricing", "contact", "faq"]
+
+def make_html(rng, sections):
+    parts = [
+        "<!-- Header: site navigation -->",
+        '<header class="site-header">\n  <nav class="nav">',
+        "\n".join(f'    <a href="#{s}" class="nav-link">{s.title()}</a>' for s in sections),
+        "  </nav>\n</header>",
+    ]
+    for s in sections:
+        parts.append(f"<!-- {s.title()} section: {rng.choice(['layout', 'content', 'call to action'])} -->")
+        parts.append(f'<section id="{s}" class="section section-{s}">')
+        parts.append(f'  <h2 class="section-title">{s.title()}</h2>')
+        for i in range(rng.randint(3, 8)):
+            parts.append(f'  <div class="card" data-index="{i}">')
+            parts.append(f'    <img src="https://images.pexels.com/photos/{rng.randint(1000, 99999)}/photo.jpeg" '
+                         f'alt="{s} image {i}" width="600" height="400">')
+            parts.append(f'    <p class="card-text">Fresh "{s}" content number {i}, described in detail.</p>')
+            parts.append("  </div>")
+        parts.append("</section>")
+    parts.append('<!-- Footer -->\n<footer class="site-footer"><p>&copy; 2025 Example</p></footer>')
+    return "\n".join(parts)
+
+def make_css(rng, sections):
+    rules = ["/* Base styles */", "body {\n  margin: 0;\n  font-family: 'Segoe UI', sans-serif;\n}"]
+    for s in sections:
+        rules.append(f"/* {s.title()} section styles */")
+        rules.append(f".section-{s} {{\n  padding: {rng.randint(20, 80)}px;\n  background: #{rng.randint(0, 0xFFFFFF):06x};\n}}")
+        rules.append(f".section-{s} .card {{\n  display: flex;\n  gap: 1rem;\n  border-radius: 8px;\n}}")
+        # Models often repeat rules verbatim further down the file
+        rules.append(".card {\n  box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);\n}")
+    rules.append("@media (max-width: 768px) {\n  .card {\n    flex-direction: column;\n  }\n}")
+    return "\n\n".join(rules)
+
+def make_js(rng, sections):
+    lines = ["// Smooth scrolling for navigation links",
+             "document.querySelectorAll('.nav-link').forEach(function (link) {",
+             "  link.addEventListener('click', function (event) {",
+             "    // Prevent the default jump",
+             "    event.preventDefault();",
+             "    document.querySelector(link.getAttribute('href')).scrollIntoView({ behavior: 'smooth' });",
+             "  });", "});"]
+    for s in sections:
+        lines.append(f"// Handlers for the {s} section")
+        lines.append(f"function init{s.title()}() {{\n  try {{\n    const el = document.getElementById('{s}');\n"
+                     f"    /* Guard against missing markup */\n    if (!el) return;\n"
+                     f"    el.classList.add('ready');\n  }} catch (error) {{\n    console.error(\"{s} failed\", error);\n  }}\n}}")
+    return "\n".join(lines)
+
+def make_site(seed=0, sections=6):
+    """Return (html, css, js) for one synthetic site."""
+    rng = random.Random(seed)
+    chosen = rng.sample(SECTIONS, min(sections, len(SECTIONS)))
+    return make_html(rng, chosen), make_css(rng, chosen), make_js(rng, chosen)
+
+def make_response(seed=0, sections=6):
+    """Return a model-style response wrapping a synthetic site in fenced blocks."""
+    html, css, js = make_site(seed, sections)
+    return (f"Here is your website. I focused on a clean layout.\n\n```html\n{html}\n```\n\n"
+            f"And the styles:\n\n```css\n{css}\n```\n\nFinally the behaviour:\n\n"
+            f"```javascript\n{js}\n```\n\nLet me know if you want changes!")
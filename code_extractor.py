@@ -0,0 +1,100 @@
+#code_extractor.py
+"""Fenced code block extraction and display cleaning for model responses.
+
+A response is tokenized once: a single compiled pattern finds every
+``` fence and fences are paired in order into block spans. Extraction,
+display cleaning and output validation all read the same span index,
+which is cached per response string so Streamlit reruns don't rescan.
+"""
+import re
+from functools import lru_cache
+
+_FENCE = re.compile(r"```([A-Za-z]*)")
+_INLINE_STYLE = re.compile(r"<style>([\s\S]*?)</style>", re.IGNORECASE)
+_INLINE_SCRIPT = re.compile(r"<script>([\s\S]*?)</script>", re.IGNORECASE)
+CODE_KINDS = {"html": "html", "css": "css", "javascript": "js", "js": "js"}
+PLACEHOLDER = "[Code block removed for clarity]"
+PARSE_CACHE_SIZE = 64
+
+class FencedBlock:
+    """One fenced block: `start`/`end` span the fences, `body_*` the code."""
+
+    __slots__ = ("language", "start", "end", "body_start", "body_end", "closed")
+
+    def __init__(self, language, start, end, body_start, body_end, closed):
+        self.language = language
+        self.start = start
+        self.end = end
+        self.body_start = body_start
+        self.body_end = body_end
+        self.closed = closed
+
+class ParsedResponse:
+    """Block spans of a response plus lazily derived code and display text."""
+
+    __slots__ = ("text", "blocks", "_code", "_display")
+
+    def __init__(self, text):
+        self.text = text
+        self.blocks = []
+        fences = _FENCE.finditer(text)
+        for opening in fences:
+            closing = next(fences, None)
+            if closing is None:
+                # Unclosed final block (e.g. truncated output)
+                self.blocks.append(FencedBlock(opening.group(1).lower(), opening.start(), len(text),
+                                               opening.end(), len(text), False))
+                break
+            self.blocks.append(FencedBlock(opening.group(1).lower(), opening.start(), closing.start() + 3,
+                                           opening.end(), closing.start(), True))
+        self._code = None
+        self._display = None
+
+    def code(self):
+        """(html, css, js) from the first closed block of each kind."""
+        if self._code is None:
+            found = {}
+            for block in self.blocks:
+                kind = CODE_KINDS.get(block.language)
+                if kind and block.closed and kind not in found:
+                    found[kind] = self.text[block.body_start:block.body_end].strip()
+            html_code, css_code, js_code = found.get("html", ""), found.get("css", ""), found.get("js", "")
+
+            # Handle inline CSS/JS in HTML (for models like DeepSeek)
+            if not css_code and not js_code:
+                inline_css = _INLINE_STYLE.search(html_code)
+                inline_js = _INLINE_SCRIPT.search(html_code)
+                if inline_css:
+                    css_code = inline_css.group(1).strip()
+                if inline_js:
+                    js_code = inline_js.group(1).strip()
+            self._code = (html_code, css_code, js_code)
+        return self._code
+
+    def display(self):
+        """The response with every closed block replaced by a placeholder."""
+        if self._display is None:
+            parts = []
+            position = 0
+            for block in self.blocks:
+                if not block.closed:
+                    break
+                parts.append(self.text[position:block.start])
+                parts.append(PLACEHOLDER)
+                position = block.end
+            parts.append(self.text[position:])
+            self._display = "".join(parts)
+        return self._display
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_response(response):
+    """Tokenize a response once; repeated calls with the same text hit the cache."""
+    return ParsedResponse(response)
+
+def extract_code_from_response(response):
+    """Extract HTML, CSS, and JS code blocks from the LLM response."""
+    return parse_response(response).code()
+
+def clean_response_for_display(response):
+    """Replace fenced code blocks with a short placeholder for the chat."""
+    return parse_response(response).display()
@@ -0,0 +1,19 @@
+#config.py
+import os
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def load_config():
+    """Load environment variables from .env once per process."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        # python-dotenv is optional for workers that get their env from the host
+        pass
+    else:
+        load_dotenv()
+    return os.environ
+
+def get_setting(name, default=None):
+    """Read a setting from the environment, loading .env on first use."""
+    return load_config().get(name, default)
@@ -0,0 +1,329 @@
+#evaluation.py
+"""Offline evaluation of generation quality, latency and token cost per tier.
+
+A prompt corpus is replayed through llm_handler.generate_response_text
+against a recorded or mocked backend that stands in for the OpenAI
+client, so the real streaming, coalescing and fallback code runs without
+network access. Each output is scored with local static checks and the
+results are summarized per tier in MODEL_CONFIGS.
+
+Usage:
+    python evaluation.py --backend mock
+    python evaluation.py --backend live --record recordings.jsonl   # needs NVIDIA_API_KEY
+    python evaluation.py --backend replay --recordings recordings.jsonl --output report.json
+"""
+import argparse
+import json
+import math
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+
+import llm_handler
+from code_extractor import extract_code_from_response
+from llm_handler import MODEL_CONFIGS, generate_response_text, get_system_prompt
+from output_validator import validate_response
+
+CHARS_PER_TOKEN = 3.5
+
+# Each prompt lists features the generated site must contain; a feature is
+# a regex searched in the html, css or js (prefix "css:" / "js:"), or in the html.
+DEFAULT_CORPUS = [
+    {"prompt": "Create a landing page for a bakery with a menu and a contact form",
+     "features": [r"<nav\b", r"<form\b", r"menu", r"css:@media"]},
+    {"prompt": "Build a portfolio website for a photographer with an image gallery",
+     "features": [r"<img\b", r"gallery", r"<footer\b", r"css:grid|flex"]},
+    {"prompt": "Make a one-page site for a yoga studio with class schedule and pricing",
+     "features": [r"schedule", r"pric", r"<table\b|<ul\b", r"css:@media"]},
+    {"prompt": "Create a product launch page with a countdown timer and signup form",
+     "features": [r"<form\b", r"countdown", r"js:setInterval|setTimeout", r"<header\b"]},
+    {"prompt": "Design a restaurant website with menu tabs and a reservation form",
+     "features": [r"<form\b", r"menu", r"js:addEventListener", r"<footer\b"]},
+]
+
+# Backends ------------------------------------------------------------------
+
+class _Obj:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+def _chunk(text):
+    return _Obj(choices=[_Obj(delta=_Obj(content=text), finish_reason=None)])
+
+class ReplayClient:
+    """Stand-in for the OpenAI client that streams canned responses.
+
+    `respond(model, messages, max_tokens, **params)` returns (response text,
+    seconds to spread the stream over); `params` are the sampling settings the
+    request was made with. Output is cut at max_tokens like a real model.
+    """
+
+    def __init__(self, respond, chunk_chars=12, sleep=True):
+        self._respond = respond
+        self._chunk_chars = chunk_chars
+        self._sleep = sleep
+        self.chat = _Obj(completions=_Obj(create=self._create))
+
+    def _create(self, model, messages, max_tokens, stream=True, **params):
+        text, seconds = self._respond(model, messages, max_tokens, **params)
+        text = text[:int(max_tokens * CHARS_PER_TOKEN)]
+        pieces = [text[i:i + self._chunk_chars] for i in range(0, len(text), self._chunk_chars)]
+        delay = seconds / max(len(pieces), 1)
+
+        def stream_chunks():
+            for piece in pieces:
+                if self._sleep and delay:
+                    time.sleep(delay)
+                yield _chunk(piece)
+        return stream_chunks()
+
+def _user_prompt(messages):
+    return next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+# Relative behaviour of the tiers in the mock backend: output speed, and how
+# often a feature is left out
+MOCK_PROFILES = {
+    "Good": {"tokens_per_second": 180, "skip_feature": 0.35},
+    "Better": {"tokens_per_second": 90, "skip_feature": 0.15},
+    "Best": {"tokens_per_second": 45, "skip_feature": 0.05},
+}
+
+def mock_site(prompt, skip_feature, rng):
+    """A plausible response for `prompt` that includes each known feature unless skipped."""
+    words = re.findall(r"[a-z]+", prompt.lower())
+    title = " ".join(words[3:6]).title() or "My Site"
+    sections = []
+    for word in ("menu", "gallery", "schedule", "pricing", "countdown", "contact"):
+        if word in words or word in prompt.lower():
+            if rng.random() >= skip_feature:
+                sections.append(f'<section id="{word}" class="{word}"><h2>{word.title()}</h2>'
+                                f'<ul><li>Item one</li><li>Item two</li></ul></section>')
+    if "form" in words and rng.random() >= skip_feature:
+        sections.append('<section id="signup"><form><input type="email" required>'
+                        '<button type="submit">Send</button></form></section>')
+    if "gallery" in words:
+        sections.append('<div class="gallery">' + '<img src="https://images.pexels.com/1.jpg" alt="">' * 4 + '</div>')
+    html = (f'<header><nav><a href="#">Home</a></nav><h1>{title}</h1></header>\n<main>\n'
+            + "\n".join(sections) + '\n</main>\n<footer><p>&copy; 2025</p></footer>')
+    css = ("body { font-family: sans-serif; margin: 0; }\n.gallery { display: grid; gap: 8px; }\n"
+           + ("@media (max-width: 600px) { header { padding: 8px; } }\n" if rng.random() >= skip_feature else ""))
+    js = ("document.querySelectorAll('a').forEach(function (a) {\n"
+          "  a.addEventListener('click', function () {});\n});\n"
+          + ("setInterval(function () {}, 1000);\n" if "countdown" in words else ""))
+    return (f"Here is your website.\n\n```html\n{html}\n```\n\n```css\n{css}\n```\n\n"
+            f"```javascript\n{js}\n```\n\nEnjoy!")
+
+def mock_backend(seed=0, time_scale=0.01):
+    """Deterministic mock: tiers differ in speed and in how often they skip features."""
+    by_model = {config["model"]: tier for tier, config in MODEL_CONFIGS.items()}
+    lock = threading.Lock()
+    rng = random.Random(seed)
+
+    def respond(model, messages, max_tokens, **params):
+        profile = MOCK_PROFILES[by_model[model]]
+        with lock:
+            local = random.Random(rng.random())
+        text = mock_site(_user_prompt(messages), profile["skip_feature"], local)
+        seconds = len(text) / CHARS_PER_TOKEN / profile["tokens_per_second"] * time_scale
+        return text, seconds
+    return respond
+
+def replay_backend(path, time_scale=1.0):
+    """Serve recorded responses keyed by (model, prompt); see record_to()."""
+    recordings = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings.setdefault((entry["model"], entry["prompt"]), []).append(entry)
+    positions = {}
+
+    def respond(model, messages, max_tokens, **params):
+        key = (model, _user_prompt(messages))
+        entries = recordings.get(key)
+        if not entries:
+            raise LookupError(f"No recording for {model}: {key[1][:40]!r}")
+        index = positions.get(key, 0)
+        positions[key] = index + 1
+        entry = entries[index % len(entries)]
+        return entry["response"], entry["seconds"] * time_scale
+    return respond
+
+# Scoring -------------------------------------------------------------------
+
+def score_output(response, features):
+    """Static checks of one response; returns a dict with a 0-100 `quality`."""
+    html, css, js = extract_code_from_response(response or "")
+    validation = validate_response(response or "")
+    sources = {"html": html, "css": css, "js": js}
+    present = []
+    for feature in features:
+        kind, _, pattern = feature.partition(":")
+        if kind not in ("css", "js") or not pattern:
+            kind, pattern = "html", feature
+        present.append(bool(re.search(pattern, sources[kind], re.IGNORECASE)))
+    extracted = bool(html)
+    quality = 0.0
+    if extracted:
+        quality = 30 + 10 * sum(bool(part) for part in (css, js))
+        quality += 50 * (sum(present) / len(present) if present else 1)
+        quality -= 10 * len(validation.issues)
+    return {
+        "extracted": extracted,
+        "valid": validation.ok,
+        "issues": validation.issues,
+        "features_found": sum(present),
+        "features_total": len(present),
+        "quality": max(0.0, min(100.0, quality)),
+    }
+
+# Harness -------------------------------------------------------------------
+
+def run_evaluation(corpus, tiers, respond, repeats=1, sleep=True, record=None):
+    """Replay every prompt through generate_response_text for each tier.
+
+    Returns a list of per-run result dicts. With `record` (a file object),
+    every response is also written as a JSON line usable by replay_backend.
+    """
+    previous_client = llm_handler._client
+    llm_handler._client = ReplayClient(respond, sleep=sleep)
+    results = []
+    try:
+        for tier in tiers:
+            model = MODEL_CONFIGS[tier]["model"]
+            for _ in range(repeats):
+                for item in corpus:
+                    fallbacks = []
+                    start = time.perf_counter()
+                    try:
+                        response = generate_response_text(
+                            item["prompt"], custom_system_prompt=get_system_prompt(), model_choice=tier,
+                            on_fallback=lambda model_type, error: fallbacks.append(str(error))
+                        )
+                        error = None
+                    except Exception as e:
+                        response, error = "", str(e)
+                    seconds = time.perf_counter() - start
+                    result = {"tier": tier, "prompt": item["prompt"], "seconds": seconds,
+                              "tokens": int(len(response) / CHARS_PER_TOKEN),
+                              "fallback": bool(fallbacks), "error": error}
+                    result.update(score_output(response, item.get("features", [])))
+                    results.append(result)
+                    if record is not None and response and not fallbacks:
+                        record.write(json.dumps({"model": model, "prompt": item["prompt"],
+                                                 "response": response, "seconds": seconds}) + "\n")
+    finally:
+        llm_handler._client = previous_client
+    return results
+
+def summarize(results):
+    """Per-tier latency, quality and token figures."""
+    report = {}
+    for tier in dict.fromkeys(r["tier"] for r in results):
+        runs = [r for r in results if r["tier"] == tier]
+        seconds = sorted(r["seconds"] for r in runs)
+        quality = statistics.mean(r["quality"] for r in runs)
+        tokens = statistics.mean(r["tokens"] for r in runs)
+        mean_seconds = statistics.mean(seconds)
+        report[tier] = {
+            "runs": len(runs),
+            "model": MODEL_CONFIGS[tier]["model"],
+            "mean_seconds": mean_seconds,
+            # Nearest rank: with few runs this is the slowest one
+            "p95_seconds": seconds[math.ceil(0.95 * len(seconds)) - 1],
+            "mean_quality": quality,
+            "extraction_rate": sum(r["extracted"] for r in runs) / len(runs),
+            "valid_rate": sum(r["valid"] for r in runs) / len(runs),
+            "feature_rate": (sum(r["features_found"] for r in runs)
+                             / max(1, sum(r["features_total"] for r in runs))),
+            "mean_tokens": tokens,
+            "tokens_per_second": tokens / mean_seconds if mean_seconds else 0.0,
+            "quality_per_second": quality / mean_seconds if mean_seconds else 0.0,
+            "errors": sum(bool(r["error"]) for r in runs),
+            "fallbacks": sum(r["fallback"] for r in runs),
+        }
+    return report
+
+def recommend_tier(report, min_quality=80.0):
+    """Fastest tier whose mean quality reaches `min_quality` (best quality otherwise)."""
+    good_enough = [tier for tier, row in report.items() if row["mean_quality"] >= min_quality]
+    if good_enough:
+        return min(good_enough, key=lambda tier: report[tier]["mean_seconds"])
+    return max(report, key=lambda tier: report[tier]["mean_quality"])
+
+def format_report(report):
+    lines = [f"{'tier':<8}{'runs':>5}{'mean s':>9}{'p95 s':>9}{'quality':>9}{'features':>10}"
+             f"{'valid':>7}{'tokens':>8}{'tok/s':>8}{'q/s':>8}"]
+    for tier, row in report.items():
+        lines.append(f"{tier:<8}{row['runs']:>5}{row['mean_seconds']:>9.2f}{row['p95_seconds']:>9.2f}"
+                     f"{row['mean_quality']:>9.1f}{row['feature_rate']:>10.0%}{row['valid_rate']:>7.0%}"
+                     f"{row['mean_tokens']:>8.0f}{row['tokens_per_second']:>8.0f}{row['quality_per_second']:>8.1f}")
+    return "\n".join(lines)
+
+def run_evaluation_live(corpus, tiers, repeats=1, record=None):
+    """Same as run_evaluation but against the real API client."""
+    real_client = llm_handler.get_client()
+
+    def respond(model, messages, max_tokens, **params):
+        # params carry the tier's temperature/top_p and the penalties that
+        # generate_response_text sent, so live runs sample like the app
+        completion = real_client.chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, stream=True, **params
+        )
+        parts = [c.choices[0].delta.content or "" for c in completion if c.choices]
+        return "".join(parts), 0.0
+    return run_evaluation(corpus, tiers, respond, repeats, sleep=False, record=record)
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate generation quality and latency per model tier.")
+    parser.add_argument("--backend", choices=["mock", "replay", "live"], default="mock")
+    parser.add_argument("--recordings", help="JSONL recordings for --backend replay")
+    parser.add_argument("--record", help="Write responses as JSONL recordings (for later replay)")
+    parser.add_argument("--corpus", help="JSON list of {prompt, features} (default: built-in corpus)")
+    parser.add_argument("--tiers", nargs="+", default=list(MODEL_CONFIGS), choices=list(MODEL_CONFIGS))
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--time-scale", type=float, default=None,
+                        help="Scale replayed/mock latencies (default: 1 for replay, 0.01 for mock)")
+    parser.add_argument("--min-quality", type=float, default=80.0)
+    parser.add_argument("--output", help="Write the per-tier report as JSON")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    record = open(args.record, "a", encoding="utf-8") if args.record else None
+    try:
+        if args.backend == "live":
+            results = run_evaluation_live(corpus, args.tiers, args.repeats, record)
+        else:
+            if args.backend == "replay":
+                if not args.recordings:
+                    parser.error("--backend replay needs --recordings")
+                respond = replay_backend(args.recordings, args.time_scale or 1.0)
+            else:
+                respond = mock_backend(time_scale=args.time_scale or 0.01)
+            results = run_evaluation(corpus, args.tiers, respond, args.repeats, record=record)
+    finally:
+        if record is not None:
+            record.close()
+
+    report = summarize(results)
+    if args.backend == "mock":
+        print("MOCK BACKEND: tier speeds and quality come from MOCK_PROFILES, not from the models.\n"
+              "Use these numbers to test the harness only, never for routing.\n")
+    print(format_report(report))
+    if args.backend != "mock":
+        print(f"\nRecommended default (quality >= {args.min_quality:.0f}): "
+              f"{recommend_tier(report, args.min_quality)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, "report": report, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,244 @@
 #file_handler.py
 
 import io
-import zipfile
 import json
 import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+from asset_optimizer import (
+    minify_css, minify_js, minify_html, dedupe_css_rules, extract_critical_css, gzip_bytes,
+    brotli_bytes, fingerprint_name
+)
 
-def create_download_zip(version):
-    """Create a ZIP file with all website files for a specific version."""
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-        # Create main HTML file with proper DOCTYPE and metadata
-        zipf.writestr("index.html", f"""<!DOCTYPE html>
+OPTIMIZED_CACHE_SIZE = 64
+COMPRESSED_CACHE_SIZE = 128
+# Deploy bundles: fingerprinted files never change, index.html must revalidate
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+_optimized_cache = OrderedDict()
+_optimized_cache_lock = threading.Lock()
+_compressed_cache = OrderedDict()
+_compressed_cache_lock = threading.Lock()
+
+def optimize_assets(version):
+    """Minify a version's assets and extract its critical CSS, cached by content hash."""
+    key = version.content_hash
+    with _optimized_cache_lock:
+        cached = _optimized_cache.get(key)
+        if cached is not None:
+            _optimized_cache.move_to_end(key)
+            return cached
+
+    css = dedupe_css_rules(minify_css(version.css))
+    assets = {
+        "html": minify_html(version.html),
+        "css": css,
+        "js": minify_js(version.js),
+        "critical_css": extract_critical_css(css, version.html),
+    }
+
+    with _optimized_cache_lock:
+        _optimized_cache[key] = assets
+        while len(_optimized_cache) > OPTIMIZED_CACHE_SIZE:
+            _optimized_cache.popitem(last=False)
+    return assets
+
+def build_index_html(version, title, assets=None, css_href="styles.css", js_href="script.js"):
+    """Build index.html linking the stylesheet and script; `assets` enables the optimized head."""
+    if assets is None:
+        stylesheet = f'<link rel="stylesheet" href="{css_href}">'
+        body = version.html
+    else:
+        # Inline the above-the-fold rules and load the full stylesheet without blocking render
+        stylesheet = (
+            f"<style>{assets['critical_css']}</style>\n"
+            f'    <link rel="preload" href="{css_href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+            f'    <noscript><link rel="stylesheet" href="{css_href}"></noscript>'
+        )
+        body = assets["html"]
+    return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <meta name="description" content="{version.description}">
-    <title>Generated Website</title>
-    <link rel="stylesheet" href="styles.css">
+    <title>{title}</title>
+    {stylesheet}
 </head>
 <body>
-{version.html}
-<script src="script.js"></script>
+{body}
+<script src="{js_href}"></script>
 </body>
-</html>""")
-        
-        # Add CSS file
-        zipf.writestr("styles.css", version.css)
-        
-        # Add JavaScript file
-        zipf.writestr("script.js", version.js)
+</html>"""
+
+def mirror_version_images(version, url_prefix="images", css_url_prefix=None):
+    """Return (version with local image URLs, {file name: bytes}) for bundling.
+
+    `url_prefix` is the images folder as seen from index.html and
+    `css_url_prefix` as seen from the stylesheet (default: the same).
+    """
+    from image_mirror import mirror_images
+    from website_version import WebsiteVersion
+
+    html, css, images = mirror_images(version.html, version.css, url_prefix=url_prefix,
+                                      css_url_prefix=css_url_prefix)
+    if not images:
+        return version, {}
+    mirrored = WebsiteVersion(
+        html=html, css=css, js=version.js, description=version.description,
+        id=version.id, created_at=version.created_at
+    )
+    return mirrored, images
+
+def write_site_files(zipf, version, title, folder="", optimize=False):
+    """Write index.html, styles.css and script.js (plus .gz siblings when optimized)."""
+    assets = optimize_assets(version) if optimize else None
+    files = {
+        "index.html": build_index_html(version, title, assets),
+        "styles.css": assets["css"] if assets else version.css,
+        "script.js": assets["js"] if assets else version.js,
+    }
+    for name, content in files.items():
+        zipf.writestr(f"{folder}{name}", content)
+        if optimize:
+            zipf.writestr(f"{folder}{name}.gz", gzip_bytes(content))
+
+def compressed_copies(data):
+    """Return (gzip bytes, brotli bytes or None), cached by content.
+
+    Brotli at quality 11 is slow, so each distinct file is only compressed
+    once per process however many bundles include it.
+    """
+    key = hashlib.sha256(data).digest()
+    with _compressed_cache_lock:
+        cached = _compressed_cache.get(key)
+        if cached is not None:
+            _compressed_cache.move_to_end(key)
+            return cached
+
+    copies = (gzip_bytes(data), brotli_bytes(data))
+
+    with _compressed_cache_lock:
+        _compressed_cache[key] = copies
+        while len(_compressed_cache) > COMPRESSED_CACHE_SIZE:
+            _compressed_cache.popitem(last=False)
+    return copies
+
+def write_deploy_file(zipf, path, content, files, cache_control, compress=True):
+    """Write `path` once per archive, with .gz/.br siblings, and record it in `files`."""
+    import zipfile
+
+    if path in files:
+        return
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    entry = {"bytes": len(data), "cache_control": cache_control}
+    # Already-compressed files (images) are stored as-is and get no siblings
+    zipf.writestr(path, data, compress_type=None if compress else zipfile.ZIP_STORED)
+    if compress:
+        gzipped, brotli = compressed_copies(data)
+        zipf.writestr(f"{path}.gz", gzipped)
+        entry["gzip_bytes"] = len(gzipped)
+        if brotli is not None:
+            zipf.writestr(f"{path}.br", brotli)
+            entry["br_bytes"] = len(brotli)
+    files[path] = entry
+
+def write_deploy_site(zipf, version, title, files, folder="", optimize=False):
+    """Write one version for static hosting and return {logical name: archive path}.
+
+    The stylesheet and script go to the archive-wide `assets/` folder under
+    content-hashed names, so they can be cached forever and versions with
+    identical assets share one file; index.html is rewritten to match.
+    """
+    assets = optimize_assets(version) if optimize else None
+    css = assets["css"] if assets else version.css
+    js = assets["js"] if assets else version.js
+    paths = {
+        "styles.css": f"assets/{fingerprint_name('styles.css', css)}",
+        "script.js": f"assets/{fingerprint_name('script.js', js)}",
+    }
+    write_deploy_file(zipf, paths["styles.css"], css, files, IMMUTABLE_CACHE)
+    write_deploy_file(zipf, paths["script.js"], js, files, IMMUTABLE_CACHE)
+
+    up = "../" * folder.count("/")
+    html = build_index_html(version, title, assets,
+                            css_href=up + paths["styles.css"], js_href=up + paths["script.js"])
+    paths["index.html"] = f"{folder}index.html"
+    write_deploy_file(zipf, paths["index.html"], html, files, REVALIDATE_CACHE)
+    return paths
+
+def deploy_headers(files):
+    """A `_headers` file (Netlify, Cloudflare Pages) giving every file its Cache-Control.
+
+    The .gz/.br copies get the same rules, for hosts that serve them directly.
+    """
+    lines = []
+    for path, entry in sorted(files.items()):
+        routes = [f"/{path}"]
+        if path.endswith("index.html"):
+            routes.append(f"/{path[:-len('index.html')]}")
+        if "gzip_bytes" in entry:
+            routes.append(f"/{path}.gz")
+        if "br_bytes" in entry:
+            routes.append(f"/{path}.br")
+        for route in routes:
+            lines.append(f"{route}\n  Cache-Control: {entry['cache_control']}")
+    return "\n".join(lines) + "\n"
+
+def write_deploy_manifest(zipf, files, entries):
+    """Write asset-manifest.json and _headers for everything recorded in `files`."""
+    manifest = {
+        "generated_on": datetime.datetime.now().isoformat(),
+        "entries": entries,
+        "files": files,
+    }
+    zipf.writestr("asset-manifest.json", json.dumps(manifest, indent=2))
+    zipf.writestr("_headers", deploy_headers(files))
+
+def files_section(deploy):
+    if deploy:
+        return """- `index.html`: Main HTML structure of the website
+- `assets/`: CSS and JavaScript under content-hashed names (with `.gz`/`.br` copies)
+- `asset-manifest.json`: Maps `styles.css`/`script.js` to their hashed files
+- `_headers`: Cache-Control rules for hosts that read this file"""
+    return """- `index.html`: Main HTML structure of the website
+- `styles.css`: CSS styling rules
+- `script.js`: JavaScript functionality"""
+
+def create_download_zip(version, optimize=False, mirror_images=False, deploy=False):
+    """Create a ZIP file with all website files for a specific version.
+
+    With `optimize`, assets are minified, critical CSS is inlined into
+    index.html and precompressed `.gz` copies are added. With
+    `mirror_images`, remote images are downloaded into `images/` with
+    responsive variants and the page is rewritten to use them. With
+    `deploy`, the result is a static-host bundle: fingerprinted assets,
+    .gz/.br copies, an asset manifest and a `_headers` file.
+    """
+    import zipfile
+
+    zip_buffer = io.BytesIO()
+    
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        deploy_files = {}
+        if mirror_images:
+            # Deploy bundles keep the stylesheet in assets/, one level below images/
+            version, images = mirror_version_images(version, css_url_prefix="../images" if deploy else None)
+            for name, data in images.items():
+                if deploy:
+                    # Mirrored image names are content hashes already
+                    write_deploy_file(zipf, f"images/{name}", data, deploy_files, IMMUTABLE_CACHE, compress=False)
+                else:
+                    # Images are already compressed; storing avoids wasted deflate time
+                    zipf.writestr(f"images/{name}", data, compress_type=zipfile.ZIP_STORED)
+
+        # Create main HTML, CSS and JavaScript files
+        if deploy:
+            paths = write_deploy_site(zipf, version, "Generated Website", deploy_files, optimize=optimize)
+            write_deploy_manifest(zipf, deploy_files, {version.id: paths})
+        else:
+            write_site_files(zipf, version, "Generated Website", optimize=optimize)
         
         # Add a README file with useful information
         zipf.writestr("README.md", f"""# Generated Website
@@ -41,9 +249,7 @@ def create_download_zip(version):
 - Created: {version.timestamp}
 
 ## Files
-- `index.html`: Main HTML structure of the website
-- `styles.css`: CSS styling rules
-- `script.js`: JavaScript functionality
+{files_section(deploy)}
 
 ## How to Use
 1. Open `index.html` in any modern web browser to view the website
@@ -64,8 +270,15 @@ This website was generated with AI Website Generator.
     zip_buffer.seek(0)
     return zip_buffer.getvalue()
 
-def create_all_versions_zip(website_versions):
-    """Create a ZIP file with all website versions organized in folders."""
+def create_all_versions_zip(website_versions, optimize=False, mirror_images=False, deploy=False):
+    """Create a ZIP file with all website versions organized in folders.
+
+    With `deploy`, each folder holds only its index.html; fingerprinted
+    assets live in one root `assets/` folder, so identical stylesheets and
+    scripts are stored once however many versions use them.
+    """
+    import zipfile
+
     all_versions_zip = io.BytesIO()
     
     with zipfile.ZipFile(all_versions_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
@@ -86,6 +299,9 @@ Navigate to any version folder and open `index.html` in your web browser.
         
         # Create a versions.json file with summary data
         versions_data = []
+        written_images = set()
+        deploy_files = {}
+        deploy_entries = {}
         
         for i, version in enumerate(website_versions):
             folder_name = f"v{i+1}_{version.id}"
@@ -99,24 +315,27 @@ Navigate to any version folder and open `index.html` in your web browser.
                 "timestamp": version.timestamp
             })
             
+            # Images live in one shared root folder so versions reuse them
+            if mirror_images:
+                # Both the version folder and assets/ sit next to images/
+                version, images = mirror_version_images(version, url_prefix="../images",
+                                                        css_url_prefix="../images")
+                for name, data in images.items():
+                    if deploy:
+                        write_deploy_file(zipf, f"images/{name}", data, deploy_files, IMMUTABLE_CACHE, compress=False)
+                    elif f"images/{name}" not in written_images:
+                        zipf.writestr(f"images/{name}", data, compress_type=zipfile.ZIP_STORED)
+                        written_images.add(f"images/{name}")
+
             # Create folder for this version
-            zipf.writestr(f"{folder_name}/index.html", f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <meta name="description" content="{version.description}">
-    <title>Website - Version {i+1}</title>
-    <link rel="stylesheet" href="styles.css">
-</head>
-<body>
-{version.html}
-<script src="script.js"></script>
-</body>
-</html>""")
-            
-            zipf.writestr(f"{folder_name}/styles.css", version.css)
-            zipf.writestr(f"{folder_name}/script.js", version.js)
+            if deploy:
+                deploy_entries[folder_name] = write_deploy_site(
+                    zipf, version, f"Website - Version {i+1}", deploy_files,
+                    folder=f"{folder_name}/", optimize=optimize
+                )
+            else:
+                write_site_files(zipf, version, f"Website - Version {i+1}",
+                                 folder=f"{folder_name}/", optimize=optimize)
             
             # Add version-specific metadata file
             metadata = {
@@ -129,6 +348,8 @@ Navigate to any version folder and open `index.html` in your web browser.
         
         # Add the versions summary JSON
         zipf.writestr("versions.json", json.dumps(versions_data, indent=2))
+        if deploy:
+            write_deploy_manifest(zipf, deploy_files, deploy_entries)
     
     all_versions_zip.seek(0)
     return all_versions_zip.getvalue()
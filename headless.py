@@ -0,0 +1,54 @@
+#headless.py
+"""Generate a website from the command line without starting Streamlit.
+
+Usage:
+    python headless.py "Create a landing page for a bakery" --model Good --output site.zip
+"""
+import argparse
+import sys
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate a website without the Streamlit UI.")
+    parser.add_argument("prompt", help="Description of the website to create")
+    parser.add_argument("--model", default="Better", choices=["Good", "Better", "Best"],
+                        help="Model tier to use (default: Better)")
+    parser.add_argument("--images", default="", help="Optional Pexels search query")
+    parser.add_argument("--num-images", type=int, default=5, help="Number of images to fetch")
+    parser.add_argument("--output", default="website.zip", help="Path of the ZIP file to write")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Heavy modules are imported only once we know there is work to do
+    from llm_handler import generate_response_text, get_system_prompt
+    from code_extractor import extract_code_from_response
+    from website_version import WebsiteVersion
+    from file_handler import create_download_zip
+
+    image_data = []
+    if args.images:
+        from image_handler import get_images_from_pexels
+        image_data = get_images_from_pexels(args.images, args.num_images)
+
+    def report_fallback(model_type, api_error):
+        print(f"Error with {model_type} model ({api_error}). Trying fallback model...", file=sys.stderr)
+
+    response = generate_response_text(
+        args.prompt, custom_system_prompt=get_system_prompt(image_data),
+        model_choice=args.model, on_fallback=report_fallback
+    )
+    html_code, css_code, js_code = extract_code_from_response(response or "")
+    if not (html_code or css_code or js_code):
+        print("No code found in the model response.", file=sys.stderr)
+        return 1
+
+    version = WebsiteVersion(html=html_code, css=css_code, js=js_code,
+                             description=args.prompt.split('\n')[0][:50])
+    with open(args.output, "wb") as f:
+        f.write(create_download_zip(version))
+    print(f"Saved version {version.id} to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,12 @@
 import os
-import requests
 from typing import List, Dict
+from config import load_config
 
 def get_images_from_pexels(query: str, per_page: int = 5) -> List[Dict]:
     """Fetch images from Pexels API based on query"""
+    import requests
+
+    load_config()
     api_key = os.getenv("PEXELS_API_KEY")
     headers = {
         "Authorization": api_key
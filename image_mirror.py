@@ -0,0 +1,275 @@
+#image_mirror.py
+"""Mirror remote images into exported sites.
+
+Images referenced by a version are downloaded once into a content-addressed
+cache on disk (shared by every version and project), resized into
+responsive variants when Pillow is installed, and the HTML/CSS are
+rewritten to point at the bundled local copies.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from config import get_setting
+
+DEFAULT_CACHE_DIR = ".image_cache"
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+DOWNLOAD_TIMEOUT = 15
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+# A URL that failed to download isn't tried again for this long
+FAILURE_RETRY_SECONDS = 600
+
+_IMG_TAG = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_SRC_ATTR = re.compile(r"""\bsrc\s*=\s*(["'])(https?://[^"']+)\1""", re.IGNORECASE)
+_WIDTH_ATTR = re.compile(r"""\bwidth\s*=\s*["']?(\d+)""", re.IGNORECASE)
+_SRCSET_ATTR = re.compile(r"""\s(srcset|sizes)\s*=\s*(["'])[^"']*\2""", re.IGNORECASE)
+_CSS_URL = re.compile(r"""url\(\s*(["']?)(https?://[^"')]+)\1\s*\)""", re.IGNORECASE)
+
+_EXTENSIONS = {
+    "image/jpeg": "jpg", "image/png": "png", "image/gif": "gif",
+    "image/webp": "webp", "image/svg+xml": "svg", "image/avif": "avif",
+}
+_PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+def _sniff_extension(data, content_type=""):
+    if data.startswith(b"\xff\xd8"):
+        return "jpg"
+    if data.startswith(b"\x89PNG"):
+        return "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return _EXTENSIONS.get(content_type.split(";")[0].strip(), "img")
+
+class ImageCache:
+    """Content-addressed image store: objects/<sha256[:2]>/<sha256>.<ext>.
+
+    A small JSON index maps source URLs to digests so each URL is fetched
+    at most once; resized variants are cached next to their original.
+    Failed downloads are remembered in memory for FAILURE_RETRY_SECONDS so
+    repeated exports don't wait on the same dead URL again.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(root, "urls.json")
+        self._failures = {}  # url -> (monotonic time, error message)
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        try:
+            with open(self._index_path) as f:
+                self._urls = json.load(f)
+        except (OSError, ValueError):
+            self._urls = {}
+
+    def _object_path(self, digest, ext, width=None):
+        name = f"{digest}-{width}w.{ext}" if width else f"{digest}.{ext}"
+        return os.path.join(self.root, "objects", digest[:2], name)
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._urls, f)
+        os.replace(tmp_path, self._index_path)
+
+    def lookup(self, url):
+        """Return (digest, ext) for an already mirrored URL, or None."""
+        with self._lock:
+            entry = self._urls.get(url)
+        if entry and os.path.exists(self._object_path(*entry)):
+            return tuple(entry)
+        return None
+
+    def fetch(self, url):
+        """Download `url` unless cached and return (digest, ext)."""
+        cached = self.lookup(url)
+        if cached:
+            return cached
+        with self._lock:
+            failure = self._failures.get(url)
+        if failure and time.monotonic() - failure[0] < FAILURE_RETRY_SECONDS:
+            raise OSError(f"skipped, failed recently: {failure[1]}")
+        try:
+            request = urllib.request.Request(url, headers={"User-Agent": "ghata-image-mirror/1.0"})
+            with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+                data = response.read(MAX_IMAGE_BYTES + 1)
+                content_type = response.headers.get("Content-Type", "")
+            if len(data) > MAX_IMAGE_BYTES:
+                raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes")
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._failures[url] = (time.monotonic(), str(e))
+            raise
+        return self.add(url, data, content_type)
+
+    def add(self, url, data, content_type=""):
+        digest = hashlib.sha256(data).hexdigest()
+        ext = _sniff_extension(data, content_type)
+        path = self._object_path(digest, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._urls[url] = [digest, ext]
+            self._save_index()
+        return digest, ext
+
+    def read(self, digest, ext, width=None):
+        with open(self._object_path(digest, ext, width), "rb") as f:
+            return f.read()
+
+    def variants(self, digest, ext, widths):
+        """Return {width: bytes} for resized copies narrower than the original.
+
+        Needs Pillow; without it (or for formats it can't re-encode) no
+        variants are produced and the original is used alone.
+        """
+        Image = _pillow()
+        if Image is None or ext not in _PIL_FORMATS:
+            return {}
+        result = {}
+        original = None
+        for width in widths:
+            path = self._object_path(digest, ext, width)
+            if os.path.exists(path):
+                result[width] = self.read(digest, ext, width)
+                continue
+            if original is None:
+                original = Image.open(io.BytesIO(self.read(digest, ext)))
+                original.load()
+            if width >= original.width:
+                continue
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+            if _PIL_FORMATS[ext] == "JPEG" and resized.mode not in ("RGB", "L"):
+                resized = resized.convert("RGB")
+            buffer = io.BytesIO()
+            resized.save(buffer, _PIL_FORMATS[ext], optimize=True, quality=82)
+            data = buffer.getvalue()
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            result[width] = data
+        return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_image_cache():
+    """Return the process-wide ImageCache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache(get_setting("GHATA_IMAGE_CACHE", DEFAULT_CACHE_DIR))
+    return _cache
+
+def find_image_urls(html, css=""):
+    """Return the remote image URLs used by <img src> and CSS url(), in order."""
+    urls = []
+    for tag in _IMG_TAG.findall(html):
+        match = _SRC_ATTR.search(tag)
+        if match:
+            urls.append(match.group(2))
+    urls.extend(match.group(2) for match in _CSS_URL.finditer(html))
+    urls.extend(match.group(2) for match in _CSS_URL.finditer(css))
+    return list(dict.fromkeys(urls))
+
+def _layout_widths(html):
+    """Map each image URL to the largest width attribute it is displayed at."""
+    widths = {}
+    for tag in _IMG_TAG.findall(html):
+        src = _SRC_ATTR.search(tag)
+        width = _WIDTH_ATTR.search(tag)
+        if src and width:
+            widths[src.group(2)] = max(widths.get(src.group(2), 0), int(width.group(1)))
+    return widths
+
+def mirror_images(html, css, cache=None, url_prefix="images", max_workers=6, css_url_prefix=None):
+    """Download a site's images and rewrite it to use bundled local files.
+
+    Returns (html, css, files) where `files` maps file names (to be placed in
+    an `images/` folder) to bytes; the rewritten code refers to them as
+    `url_prefix/<name>`, or `css_url_prefix/<name>` in the stylesheet when
+    it is stored in another folder than the page. URLs that fail to
+    download are left untouched.
+    """
+    cache = cache or get_image_cache()
+    urls = find_image_urls(html, css)
+    if not urls:
+        return html, css, {}
+
+    def fetch(url):
+        try:
+            return url, cache.fetch(url)
+        except Exception as e:
+            print(f"Error mirroring image {url}: {str(e)}")
+            return url, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        fetched = dict(pool.map(fetch, urls))
+
+    layout_widths = _layout_widths(html)
+    files = {}
+    local = {}  # url -> (file name, srcset, sizes)
+    for url, entry in fetched.items():
+        if entry is None:
+            continue
+        digest, ext = entry
+        name = digest[:16]
+        files[f"{name}.{ext}"] = cache.read(digest, ext)
+
+        display_width = layout_widths.get(url)
+        # Variants up to twice the displayed width cover high-density screens
+        widths = [w for w in VARIANT_WIDTHS if not display_width or w <= display_width * 2]
+        srcset = []
+        for width, data in sorted(cache.variants(digest, ext, widths).items()):
+            files[f"{name}-{width}w.{ext}"] = data
+            srcset.append(f"{url_prefix}/{name}-{width}w.{ext} {width}w")
+        sizes = f"(max-width: {display_width}px) 100vw, {display_width}px" if display_width else "100vw"
+        local[url] = (f"{name}.{ext}", ", ".join(srcset), sizes)
+
+    def rewrite_img(match):
+        tag = match.group(0)
+        src = _SRC_ATTR.search(tag)
+        if not src or src.group(2) not in local:
+            return tag
+        file_name, srcset, sizes = local[src.group(2)]
+        quote = src.group(1)
+        replacement = f"src={quote}{url_prefix}/{file_name}{quote}"
+        if srcset:
+            tag = _SRCSET_ATTR.sub("", tag)
+            replacement += f' srcset="{srcset}" sizes="{sizes}"'
+        src = _SRC_ATTR.search(tag)
+        return tag[:src.start()] + replacement + tag[src.end():]
+
+    def css_url_rewriter(prefix):
+        def rewrite_css_url(match):
+            url = match.group(2)
+            if url not in local:
+                return match.group(0)
+            return f'url("{prefix}/{local[url][0]}")'
+        return rewrite_css_url
+
+    html = _IMG_TAG.sub(rewrite_img, html)
+    html = _CSS_URL.sub(css_url_rewriter(url_prefix), html)
+    css = _CSS_URL.sub(css_url_rewriter(css_url_prefix or url_prefix), css)
+    return html, css, files
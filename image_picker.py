@@ -0,0 +1,105 @@
+#image_picker.py
+"""Search results and thumbnails for the image picker, prefetched concurrently.
+
+Results are cached per (query, count) and thumbnail bytes live in a
+byte-bounded LRU, so reruns and repeated searches don't hit Pexels again.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from image_handler import get_images_from_pexels
+
+THUMBNAIL_CACHE_BYTES = 16 * 1024 * 1024
+SEARCH_CACHE_SIZE = 32
+THUMBNAIL_TIMEOUT = 10
+
+# Searches wait on thumbnail downloads, so the two must not share a pool:
+# searches filling every worker would wait on thumbnails that never start
+_search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="image-search")
+_thumbnail_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="image-thumbnail")
+
+class ThumbnailCache:
+    """Thread-safe LRU of thumbnail bytes bounded by total size."""
+
+    def __init__(self, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            data = self._items.get(url)
+            if data is not None:
+                self._items.move_to_end(url)
+            return data
+
+    def put(self, url, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(url, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[url] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    @property
+    def size(self):
+        return self._size
+
+_thumbnails = ThumbnailCache()
+_searches = OrderedDict()
+_searches_lock = threading.Lock()
+
+def _fetch_thumbnail(url):
+    cached = _thumbnails.get(url)
+    if cached is not None:
+        return cached
+    import requests
+    try:
+        response = requests.get(url, timeout=THUMBNAIL_TIMEOUT)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Error fetching thumbnail: {str(e)}")
+        return None
+    _thumbnails.put(url, response.content)
+    return response.content
+
+def _search(query, per_page):
+    key = (query.strip().lower(), per_page)
+    with _searches_lock:
+        if key in _searches:
+            _searches.move_to_end(key)
+            return _searches[key]
+    images = get_images_from_pexels(query, per_page)
+    if images:
+        with _searches_lock:
+            _searches[key] = images
+            while len(_searches) > SEARCH_CACHE_SIZE:
+                _searches.popitem(last=False)
+    return images
+
+def _search_with_thumbnails(query, per_page):
+    images = _search(query, per_page)
+    thumbnails = list(_thumbnail_executor.map(_fetch_thumbnail, [img["thumbnail"] for img in images]))
+    return [dict(img, thumbnail_bytes=data) for img, data in zip(images, thumbnails)]
+
+def prefetch_images(query, per_page=10):
+    """Start fetching search results and their thumbnails; returns a Future.
+
+    The future resolves to the image dicts from get_images_from_pexels with an
+    extra "thumbnail_bytes" entry (None if that thumbnail failed).
+    """
+    return _search_executor.submit(_search_with_thumbnails, query, per_page)
+
+def load_images(query, per_page=10, timeout=30):
+    """Fetch results and thumbnails, waiting up to `timeout` seconds."""
+    return prefetch_images(query, per_page).result(timeout=timeout)
+
+def prompt_images(images):
+    """Strip picker-only fields before passing images to get_system_prompt."""
+    return [{k: v for k, v in img.items() if k != "thumbnail_bytes"} for img in images]
@@ -0,0 +1,450 @@
+#job_queue.py
+"""Job queue for running generations outside the Streamlit process.
+
+A job names a handler ("module:function") and carries a JSON payload;
+workers claim jobs, call the handler and store its JSON result. Two
+queues share the same interface:
+
+- InProcessJobQueue: a thread-safe in-memory queue, worked by threads.
+- SQLiteJobQueue: a table in a SQLite file that any number of worker
+  processes on the machine can consume. Claimed jobs hold a lease; if a
+  worker dies, the job is handed out again once the lease expires, so a
+  restart doesn't lose queued or in-flight work.
+
+A caller that stops waiting cancels its job. Queued cancelled jobs are
+never handed out; handlers of running ones notice through
+check_cancelled() and stop early.
+
+Run worker processes with:
+    python job_queue.py jobs.db --workers 4
+"""
+import abc
+import argparse
+import importlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+GENERATION_HANDLER = "job_queue:generate_website_job"
+# Seconds a claimed job may run before it is handed out again; also how
+# long the app waits for a generation job
+DEFAULT_LEASE = 300
+DEFAULT_MAX_ATTEMPTS = 2
+POLL_INTERVAL = 0.5
+CANCEL_CHECK_INTERVAL = 2.0
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+class JobCancelled(BaseException):
+    """Raised by check_cancelled() inside a handler whose job was cancelled.
+
+    A BaseException so that handlers' own `except Exception` fallbacks (such
+    as the model fallback in generate_response_text) don't swallow it.
+    """
+
+class Job:
+    __slots__ = ("id", "handler", "payload", "status", "result", "error", "attempts")
+
+    def __init__(self, id, handler, payload, status=QUEUED, result=None, error=None, attempts=0):
+        self.id = id
+        self.handler = handler
+        self.payload = payload
+        self.status = status
+        self.result = result
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+class JobQueue(abc.ABC):
+    """Interface shared by the queue implementations."""
+
+    @abc.abstractmethod
+    def submit(self, handler, payload):
+        """Queue a job and return its id."""
+
+    @abc.abstractmethod
+    def claim(self, worker_id):
+        """Take the next runnable job for a worker, or return None."""
+
+    @abc.abstractmethod
+    def complete(self, job_id, result):
+        """Store a running job's result (ignored if it was cancelled meanwhile)."""
+
+    @abc.abstractmethod
+    def fail(self, job_id, error):
+        """Record a failure; the job is retried until it runs out of attempts."""
+
+    @abc.abstractmethod
+    def cancel(self, job_id):
+        """Cancel a job that hasn't finished; returns True if it was cancelled."""
+
+    @abc.abstractmethod
+    def get(self, job_id):
+        """Return the Job, or None if the id is unknown."""
+
+    def wait(self, job_id, timeout=None, poll_interval=POLL_INTERVAL):
+        """Block until a job finishes (or the timeout passes) and return it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.finished:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+class InProcessJobQueue(JobQueue):
+    """Thread-safe in-memory queue for a single process."""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._jobs = {}
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def submit(self, handler, payload):
+        job = Job(uuid.uuid4().hex, handler, payload)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._ready.put(job.id)
+        return job.id
+
+    def claim(self, worker_id, timeout=POLL_INTERVAL):
+        try:
+            job_id = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status != QUEUED:
+                return None
+            job.status = RUNNING
+            job.attempts += 1
+            return job
+
+    def complete(self, job_id, result):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status != RUNNING:
+                return
+            job.status, job.result = DONE, result
+            self._finished.notify_all()
+
+    def fail(self, job_id, error):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status != RUNNING:
+                return
+            job.error = error
+            if job.attempts < self.max_attempts:
+                job.status = QUEUED
+                self._ready.put(job_id)
+                return
+            job.status = FAILED
+            self._finished.notify_all()
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.status = CANCELLED
+            self._finished.notify_all()
+            return True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None, poll_interval=POLL_INTERVAL):
+        with self._lock:
+            self._finished.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].finished, timeout
+            )
+            return self._jobs.get(job_id)
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    handler TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+class SQLiteJobQueue(JobQueue):
+    """Queue stored in a SQLite file, shared by worker processes on one machine."""
+
+    def __init__(self, path, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._connect().executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so claim() can take the write lock up front
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, handler, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, handler, payload, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, handler, json.dumps(payload), QUEUED, now, now)
+        )
+        return job_id
+
+    def claim(self, worker_id):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1", (QUEUED, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["attempts"] >= self.max_attempts:
+                # Its last worker died mid-run; don't hand it out forever
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (FAILED, row["error"] or "Worker lease expired", now, row["id"])
+                )
+                conn.execute("COMMIT")
+                return self.claim(worker_id)
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, lease_until = ?, "
+                "updated_at = ? WHERE id = ?",
+                (RUNNING, worker_id, now + self.lease, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(row["id"], row["handler"], json.loads(row["payload"]), RUNNING,
+                   attempts=row["attempts"] + 1)
+
+    def complete(self, job_id, result):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (DONE, json.dumps(result), time.time(), job_id, RUNNING)
+        )
+
+    def fail(self, job_id, error):
+        self._connect().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, error = ?, "
+            "lease_until = NULL, updated_at = ? WHERE id = ? AND status = ?",
+            (self.max_attempts, QUEUED, FAILED, error, time.time(), job_id, RUNNING)
+        )
+
+    def cancel(self, job_id):
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status IN (?, ?)",
+            (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+        )
+        return cursor.rowcount > 0
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return Job(row["id"], row["handler"], json.loads(row["payload"]), row["status"],
+                   json.loads(row["result"]) if row["result"] else None, row["error"], row["attempts"])
+
+    def counts(self):
+        """Return {status: number of jobs}."""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+_handlers = {}
+_running = threading.local()
+
+def check_cancelled(interval=CANCEL_CHECK_INTERVAL):
+    """Raise JobCancelled if the job this worker thread runs has been cancelled.
+
+    Handlers call this from their long-running loops; the queue is asked at
+    most every `interval` seconds. Outside a worker it does nothing.
+    """
+    running = getattr(_running, "job", None)
+    if running is None:
+        return
+    now = time.monotonic()
+    if now - running["checked"] < interval:
+        return
+    running["checked"] = now
+    job = running["queue"].get(running["id"])
+    if job is not None and job.status == CANCELLED:
+        raise JobCancelled(running["id"])
+
+def resolve_handler(path):
+    """Import a "module:function" handler once per process."""
+    handler = _handlers.get(path)
+    if handler is None:
+        module_name, _, function_name = path.partition(":")
+        handler = getattr(importlib.import_module(module_name), function_name)
+        _handlers[path] = handler
+    return handler
+
+def run_worker(job_queue, worker_id=None, stop_event=None, max_jobs=None, idle_exit=None,
+               poll_interval=POLL_INTERVAL):
+    """Claim and run jobs until stopped; returns the number of jobs handled.
+
+    `idle_exit` stops the worker after that many seconds without work.
+    """
+    from profiling import enabled_by_env, profile
+    worker_id = worker_id or f"{os.getpid()}-{threading.get_ident()}"
+    profiling = enabled_by_env()
+    handled = 0
+    idle_since = time.monotonic()
+    while not (stop_event and stop_event.is_set()) and (max_jobs is None or handled < max_jobs):
+        job = job_queue.claim(worker_id)
+        if job is None:
+            if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                break
+            if not isinstance(job_queue, InProcessJobQueue):
+                time.sleep(poll_interval)
+            continue
+        _running.job = {"queue": job_queue, "id": job.id, "checked": time.monotonic()}
+        try:
+            with profile("job-" + job.handler.rpartition(":")[2], enabled=profiling):
+                result = resolve_handler(job.handler)(job.payload)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            job_queue.fail(job.id, f"{type(e).__name__}: {e}")
+        else:
+            job_queue.complete(job.id, result)
+        finally:
+            _running.job = None
+        handled += 1
+        idle_since = time.monotonic()
+    return handled
+
+def start_worker_threads(job_queue, count, stop_event):
+    """Work a queue from `count` daemon threads in this process."""
+    threads = [
+        threading.Thread(target=run_worker, args=(job_queue, f"thread-{i}", stop_event),
+                         name=f"job-worker-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def _worker_process(path, worker_id, idle_exit, lease):
+    run_worker(SQLiteJobQueue(path, lease=lease), worker_id, idle_exit=idle_exit)
+
+def start_worker_processes(path, count, idle_exit=None, lease=DEFAULT_LEASE):
+    """Start `count` worker processes consuming the SQLite queue at `path`."""
+    import multiprocessing
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(path, f"process-{i}", idle_exit, lease),
+                                name=f"job-worker-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+# Generation jobs
+
+def generation_payload(prompt, conversation_history=None, system_prompt=None, model_choice="Better",
+                       max_tokens=None):
+    return {
+        "prompt": prompt,
+        "history": conversation_history or [],
+        "system_prompt": system_prompt,
+        "model_choice": model_choice,
+        "max_tokens": max_tokens,
+    }
+
+def generate_website_job(payload):
+    """Handler for generation jobs: the response plus the version record built from it.
+
+    The result holds "response" and the fields of WebsiteVersion.to_dict().
+    """
+    from llm_handler import generate_response_text
+    from code_extractor import extract_code_from_response
+    from website_version import WebsiteVersion
+
+    response = generate_response_text(
+        payload["prompt"], payload["history"], payload["system_prompt"], payload["model_choice"],
+        max_tokens=payload.get("max_tokens"), on_chunk=lambda batch: check_cancelled()
+    ) or ""
+    html_code, css_code, js_code = extract_code_from_response(response)
+    version = WebsiteVersion(html=html_code, css=css_code, js=js_code,
+                             description=payload["prompt"].split("\n")[0][:50])
+    return dict(version.to_dict(), response=response)
+
+def job_result_version(result):
+    """Turn a generation job result into a WebsiteVersion."""
+    from website_version import WebsiteVersion
+    return WebsiteVersion.from_dict(result)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Return the SQLite queue named by GHATA_JOB_QUEUE, or None to generate in-process."""
+    global _queue
+    if _queue is None:
+        from config import get_setting
+        path = get_setting("GHATA_JOB_QUEUE")
+        if not path:
+            return None
+        with _queue_lock:
+            if _queue is None:
+                _queue = SQLiteJobQueue(path)
+    return _queue
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run generation workers for a SQLite job queue.")
+    parser.add_argument("path", help="Path of the SQLite job queue")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    SQLiteJobQueue(args.path)  # create the schema before the workers race for it
+    processes = start_worker_processes(args.path, args.workers)
+    print(f"Started {len(processes)} worker(s) on {args.path}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    # Run through the imported module so workers, handlers and check_cancelled
+    # share one copy of _running and JobCancelled instead of a separate __main__
+    import job_queue
+
+    raise SystemExit(job_queue.main())
@@ -0,0 +1,166 @@
+#live_preview.py
+"""Progressive preview of a website while the model is still streaming it.
+
+StreamingCodeExtractor follows the fenced ```html/```css blocks as text
+arrives, scanning each character once. LivePreview feeds it and calls a
+render callback with a best-effort, auto-closed document at a bounded
+frame rate; the interval grows with document size so very long streams
+still cost bounded CPU.
+"""
+import re
+import time
+
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+_TAG = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)([^<>]*?)(/?)>")
+
+class StreamingCodeExtractor:
+    """Incrementally collects the first html and css fenced blocks of a stream."""
+
+    _LANGUAGES = {"html": "html", "css": "css"}
+
+    def __init__(self):
+        self.html = []
+        self.css = []
+        self._pending = ""     # text not yet classified (may hold a partial fence)
+        self._block = None     # "html", "css", "skip" or None when outside a block
+        self._seen = set()
+        self._tag_stack = []
+        self._tag_tail = ""    # unfinished "<tag" at the end of the html so far
+
+    def feed(self, text):
+        data = self._pending + text
+        self._pending = ""
+        position = 0
+        while position < len(data):
+            fence = data.find("```", position)
+            if fence == -1:
+                # Hold back a possible partial fence at the end
+                keep = len(data) - len(data.rstrip("`"))
+                self._emit(data[position:len(data) - keep])
+                self._pending = data[len(data) - keep:]
+                return
+            self._emit(data[position:fence])
+            if self._block is None:
+                newline = data.find("\n", fence)
+                if newline == -1:
+                    self._pending = data[fence:]
+                    return
+                language = data[fence + 3:newline].strip().lower()
+                kind = self._LANGUAGES.get(language)
+                # Only the first block of each kind counts, like extract_code_from_response
+                self._block = kind if kind and kind not in self._seen else "skip"
+                if kind:
+                    self._seen.add(kind)
+                position = newline + 1
+            else:
+                self._block = None
+                position = fence + 3
+
+    def _emit(self, text):
+        if not text or self._block in (None, "skip"):
+            return
+        if self._block == "css":
+            self.css.append(text)
+            return
+        self.html.append(text)
+        self._track_tags(text)
+
+    def _track_tags(self, text):
+        text = self._tag_tail + text
+        last = 0
+        for match in _TAG.finditer(text):
+            closing, name, _, self_closing = match.groups()
+            name = name.lower()
+            last = match.end()
+            if self_closing or name in VOID_TAGS:
+                continue
+            if closing:
+                if name in self._tag_stack:
+                    while self._tag_stack.pop() != name:
+                        pass
+            else:
+                self._tag_stack.append(name)
+        open_bracket = text.rfind("<", last)
+        self._tag_tail = text[open_bracket:] if open_bracket != -1 and ">" not in text[open_bracket:] else ""
+
+    def partial_html(self):
+        """HTML so far with any unfinished tag dropped and open elements closed."""
+        html = "".join(self.html)
+        if self._tag_tail:
+            html = html[:len(html) - len(self._tag_tail)]
+        # Inside <script>/<style> the rest is raw text; closing keeps the page parseable
+        closers = "".join(f"</{name}>" for name in reversed(self._tag_stack))
+        return html + closers
+
+    def partial_css(self):
+        """CSS so far with unbalanced braces closed."""
+        css = "".join(self.css)
+        depth = css.count("{") - css.count("}")
+        return css + "}" * max(depth, 0)
+
+class LivePreview:
+    """Throttled progressive renderer.
+
+    `render(document)` is called at most once per interval with a full HTML
+    document. The interval is `min_interval`, stretched by one second per
+    `bytes_per_second` of accumulated code.
+    """
+
+    def __init__(self, render, min_interval=0.75, bytes_per_second=100_000, clock=time.monotonic):
+        self._render = render
+        self.min_interval = min_interval
+        self.bytes_per_second = bytes_per_second
+        self._clock = clock
+        self._extractor = StreamingCodeExtractor()
+        self._last_render = None
+        self._size = 0
+        self._dirty = False
+        self.frames = 0
+
+    def feed(self, text):
+        extractor = self._extractor
+        before = len(extractor.html) + len(extractor.css)
+        extractor.feed(text)
+        self._size += len(text)
+        if len(extractor.html) + len(extractor.css) != before:
+            self._dirty = True
+        if not self._dirty:
+            return
+        now = self._clock()
+        interval = self.min_interval + self._size / self.bytes_per_second
+        if self._last_render is None or now - self._last_render >= interval:
+            self._flush(now)
+
+    def _flush(self, now):
+        if not self._dirty or not self._extractor.html:
+            return
+        self._last_render = now
+        self._dirty = False
+        self.frames += 1
+        self._render(self.document())
+
+    def document(self):
+        """The current best-effort preview document (scripts are left out)."""
+        return f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>{self._extractor.partial_css()}</style>
+</head>
+<body>
+{_strip_scripts(self._extractor.partial_html())}
+</body>
+</html>"""
+
+    def finish(self):
+        """Render the last frame if anything arrived since the previous one."""
+        self._flush(self._clock())
+
+_SCRIPT = re.compile(r"<script\b[\s\S]*?(</script\s*>|$)", re.IGNORECASE)
+
+def _strip_scripts(html):
+    # Half-written scripts would throw; the final version runs them
+    return _SCRIPT.sub("", html)
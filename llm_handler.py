@@ -1,8 +1,10 @@
 #llm_hander.py
 import os
-import re
-import streamlit as st
-from openai import OpenAI
+import threading
+from config import load_config
+from stream_adapter import StreamStats, coalesce, set_last_stats
+# Re-exported so existing callers keep importing extraction from here
+from code_extractor import extract_code_from_response, clean_response_for_display
 
 def get_system_prompt(image_data=None):
     """Get the system prompt with optional image context"""
@@ -95,141 +97,161 @@ def get_system_prompt(image_data=None):
 Remember: NEVER return partial code. ALWAYS return the COMPLETE website code with ALL features.
 """
     
-    if image_data:
-        # Build image context section
-        image_context = "\nAvailable Images:\n"
-        for idx, img in enumerate(image_data):
-            image_context += (
-                f"Image {idx + 1}:\n"
-                f"- URL: {img['url']}\n"
-                f"- Dimensions: {img['width']}x{img['height']}\n"
-                f"- Alt text: {img['alt']}\n"
-            )
-        # Append image context to base prompt
-        base_prompt += f"\n{image_context}\nUse these images appropriately in the generated website."
-    
-    return base_prompt
+    # Append image context to base prompt
+    return base_prompt + get_image_context(image_data)
 
-def generate_response(prompt, conversation_history=None, custom_system_prompt=None, model_choice="Better"):
-    """Generate a response using the selected LLM with timeout handling."""
-    try:
-        client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=os.environ.get("NVIDIA_API_KEY")
+def get_image_context(image_data=None):
+    """Describe the available images for a system prompt ("" when there are none)."""
+    if not image_data:
+        return ""
+    # Build image context section
+    image_context = "\nAvailable Images:\n"
+    for idx, img in enumerate(image_data):
+        image_context += (
+            f"Image {idx + 1}:\n"
+            f"- URL: {img['url']}\n"
+            f"- Dimensions: {img['width']}x{img['height']}\n"
+            f"- Alt text: {img['alt']}\n"
         )
-        
-        # Model configurations
-        model_configs = {
-            "Good": {
-                "model": "nvidia/llama-3.3-nemotron-super-49b-v1",
-                "temperature": 0.6,
-                "top_p": 0.95,
-                "max_tokens": 16384,
-            },
-            "Better": {
-                "model": "nvidia/llama-3.1-nemotron-ultra-253b-v1",
-                "temperature": 0.6,
-                "top_p": 0.95,
-                "max_tokens": 16384,
-            },
-            "Best": {
-                "model": "deepseek-ai/deepseek-r1",
-                "temperature": 0.6,
-                "top_p": 0.7,
-                "max_tokens": 4096,
-            }
-        }
-        
-        # Select model config based on choice
-        model_type = model_choice.split(" ")[0]  # Extract "Good", "Better", or "Best"
-        config = model_configs[model_type]
-        
-        system_prompt = custom_system_prompt if custom_system_prompt else get_system_prompt()
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        if conversation_history:
-            messages.extend(conversation_history)
-        messages.append({"role": "user", "content": prompt})
-        
-        response_text = ""
-        response_placeholder = st.empty()
-        
-        try:
-            with st.spinner(f"Generating website using {model_type} model..."):
-                completion = client.chat.completions.create(
-                    model=config["model"],
-                    messages=messages,
-                    temperature=config["temperature"],
-                    top_p=config["top_p"],
-                    max_tokens=config["max_tokens"],
-                    frequency_penalty=0.2,
-                    presence_penalty=0.2,
-                    stream=True
+    return f"\n{image_context}\nUse these images appropriately in the generated website."
+
+# Model configurations
+MODEL_CONFIGS = {
+    "Good": {
+        "model": "nvidia/llama-3.3-nemotron-super-49b-v1",
+        "temperature": 0.6,
+        "top_p": 0.95,
+        "max_tokens": 16384,
+    },
+    "Better": {
+        "model": "nvidia/llama-3.1-nemotron-ultra-253b-v1",
+        "temperature": 0.6,
+        "top_p": 0.95,
+        "max_tokens": 16384,
+    },
+    "Best": {
+        "model": "deepseek-ai/deepseek-r1",
+        "temperature": 0.6,
+        "top_p": 0.7,
+        "max_tokens": 4096,
+    }
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the process-wide OpenAI client, importing openai on first use.
+
+    The client keeps one HTTP connection pool and is safe to share between
+    the threads of a multi-variant generation.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                load_config()
+                _client = OpenAI(
+                    base_url="https://integrate.api.nvidia.com/v1",
+                    api_key=os.environ.get("NVIDIA_API_KEY")
                 )
-                
-                for chunk in completion:
-                    if chunk.choices[0].delta.content is not None:
-                        response_text += chunk.choices[0].delta.content
-                        
-        except Exception as api_error:
-            st.error(f"Error with {model_type} model. Trying fallback model...")
-            # Fallback to Good model if any error occurs
-            fallback_config = model_configs["Good"]
-            completion = client.chat.completions.create(
-                model=fallback_config["model"],
-                messages=messages,
-                temperature=fallback_config["temperature"],
-                top_p=fallback_config["top_p"],
-                max_tokens=fallback_config["max_tokens"],
-                stream=True
+    return _client
+
+def get_model_config(model_choice):
+    """Map a UI model choice like "Better (Default)" to its tier name and config."""
+    model_type = model_choice.split(" ")[0]  # Extract "Good", "Better", or "Best"
+    return model_type, MODEL_CONFIGS[model_type]
+
+def build_messages(prompt, conversation_history=None, custom_system_prompt=None):
+    """Assemble the chat messages sent to the LLM."""
+    system_prompt = custom_system_prompt if custom_system_prompt else get_system_prompt()
+    messages = [{"role": "system", "content": system_prompt}]
+
+    if conversation_history:
+        messages.extend(conversation_history)
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def stream_completion(messages, config, stats=None, **extra_params):
+    """Yield the text deltas of a streamed chat completion.
+
+    The completion's finish reason is stored on `stats` when given.
+    """
+    completion = get_client().chat.completions.create(
+        model=config["model"],
+        messages=messages,
+        temperature=config["temperature"],
+        top_p=config["top_p"],
+        max_tokens=config["max_tokens"],
+        stream=True,
+        **extra_params
+    )
+
+    for chunk in completion:
+        choices = chunk.choices
+        if choices:
+            if stats is not None and getattr(choices[0], "finish_reason", None):
+                stats.finish_reason = choices[0].finish_reason
+            content = choices[0].delta.content
+            if content:
+                yield content
+
+def _collect(chunks, stats, on_chunk=None):
+    # Deltas are joined into time/size-bounded batches before anything else touches them
+    parts = []
+    for batch in coalesce(chunks, stats):
+        parts.append(batch)
+        if on_chunk:
+            on_chunk(batch)
+    set_last_stats(stats)
+    return "".join(parts)
+
+def generate_response_text(prompt, conversation_history=None, custom_system_prompt=None,
+                           model_choice="Better", on_fallback=None, on_chunk=None, max_tokens=None,
+                           temperature=None):
+    """Generate a response without any UI, falling back to the Good model on errors.
+
+    `on_chunk` is called with each batch of streamed text; `max_tokens` and
+    `temperature` override the tier's settings. Exceptions from the fallback
+    request propagate to the caller.
+    """
+    model_type, config = get_model_config(model_choice)
+    if max_tokens:
+        config = dict(config, max_tokens=max_tokens)
+    if temperature is not None:
+        config = dict(config, temperature=temperature)
+    messages = build_messages(prompt, conversation_history, custom_system_prompt)
+
+    try:
+        stats = StreamStats()
+        return _collect(stream_completion(
+            messages, config, stats, frequency_penalty=0.2, presence_penalty=0.2
+        ), stats, on_chunk)
+    except Exception as api_error:
+        if on_fallback:
+            on_fallback(model_type, api_error)
+        # Fallback to Good model if any error occurs
+        stats = StreamStats()
+        return _collect(stream_completion(messages, MODEL_CONFIGS["Good"], stats), stats, on_chunk)
+
+def generate_response(prompt, conversation_history=None, custom_system_prompt=None, model_choice="Better",
+                      on_chunk=None, max_tokens=None):
+    """Generate a response using the selected LLM with timeout handling."""
+    import streamlit as st
+
+    def report_fallback(model_type, api_error):
+        st.error(f"Error with {model_type} model. Trying fallback model...")
+
+    try:
+        model_type, _ = get_model_config(model_choice)
+        with st.spinner(f"Generating website using {model_type} model..."):
+            return generate_response_text(
+                prompt, conversation_history, custom_system_prompt, model_choice,
+                on_fallback=report_fallback, on_chunk=on_chunk, max_tokens=max_tokens
             )
-            
-            for chunk in completion:
-                if chunk.choices[0].delta.content is not None:
-                    response_text += chunk.choices[0].delta.content
-        
-        response_placeholder.empty()
-        return response_text
-        
+
     except Exception as e:
         st.error(f"Error connecting to API. Please check your API key and try again.")
         st.error(f"Detailed error: {str(e)}")
         return None
-    
-def extract_code_from_response(response):
-    """Extract HTML, CSS, and JS code blocks from the LLM response."""
-    html_code = ""
-    css_code = ""
-    js_code = ""
-
-    # Extract HTML
-    html_matches = re.findall(r"```html\s*([\s\S]*?)\s*```", response)
-    if html_matches:
-        html_code = html_matches[0].strip()
-
-    # Extract CSS
-    css_matches = re.findall(r"```css\s*([\s\S]*?)\s*```", response)
-    if css_matches:
-        css_code = css_matches[0].strip()
-
-    # Extract JavaScript
-    js_matches = re.findall(r"```(?:javascript|js)\s*([\s\S]*?)\s*```", response)
-    if js_matches:
-        js_code = js_matches[0].strip()
-
-    # Handle inline CSS/JS in HTML (for models like DeepSeek)
-    if not css_code and not js_code:
-        inline_css = re.findall(r"<style>([\s\S]*?)</style>", html_code, re.IGNORECASE)
-        inline_js = re.findall(r"<script>([\s\S]*?)</script>", html_code, re.IGNORECASE)
-
-        if inline_css:
-            css_code = inline_css[0].strip()
-        if inline_js:
-            js_code = inline_js[0].strip()
-
-    return html_code, css_code, js_code
-
-def clean_response_for_display(response):
-    cleaned = re.sub(r'```(html|css|javascript|js)[\s\S]*?```', '[Code block removed for clarity]', response)
-    cleaned = re.sub(r'```[\s\S]*?```', '[Code block removed for clarity]', cleaned)
-    return cleaned
\ No newline at end of file
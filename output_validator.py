@@ -0,0 +1,165 @@
+#output_validator.py
+"""Validate model output and repair it with targeted continuation requests.
+
+A full regeneration costs the whole output again; when a response is only
+truncated or missing one block, asking the model to continue (or to send
+just the missing block) costs a fraction of that.
+"""
+import re
+from code_extractor import extract_code_from_response, parse_response
+
+_TAG = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)([^<>]*?)(/?)>")
+_RAW_TEXT = re.compile(r"<(script|style)\b[^>]*>[\s\S]*?</\1\s*>", re.IGNORECASE)
+_HTML_COMMENT = re.compile(r"<!--[\s\S]*?-->")
+_INLINE_BLOCK = {"css": re.compile(r"<style\b", re.IGNORECASE), "js": re.compile(r"<script\b", re.IGNORECASE)}
+_COMMENTS_AND_STRINGS = re.compile(r'/\*[\s\S]*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+BLOCK_LANGUAGES = {"html": "html", "css": "css", "javascript": "js", "js": "js"}
+BLOCK_FENCES = {"html": "html", "css": "css", "js": "javascript"}
+OVERLAP_WINDOW = 600
+
+class ValidationResult:
+    """Outcome of validate_response; `issues` holds human-readable messages."""
+
+    def __init__(self):
+        self.truncated_block = None   # "html"/"css"/"js" if the response stops inside that block
+        self.missing_blocks = []
+        self.unclosed_tags = []
+        self.css_brace_balance = 0
+        self.issues = []
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    @property
+    def repairable(self):
+        """True when a continuation or missing-block request can fix the response.
+
+        Unclosed tags and unbalanced braces in otherwise complete blocks are
+        reported but not repaired: the checks are heuristics, and asking a
+        finished response to "continue" only appends text nothing reads.
+        """
+        return bool(self.truncated_block or self.missing_blocks)
+
+def fenced_blocks(response):
+    """Return [(language, closed)] for each fenced block in order."""
+    return [(BLOCK_LANGUAGES.get(block.language, block.language), block.closed)
+            for block in parse_response(response).blocks]
+
+def unclosed_tags(html):
+    """Return the element names still open at the end of `html`."""
+    stack = []
+    html = _RAW_TEXT.sub("", _HTML_COMMENT.sub("", html))
+    for match in _TAG.finditer(html):
+        closing, name, _, self_closing = match.groups()
+        name = name.lower()
+        if self_closing or name in VOID_TAGS:
+            continue
+        if closing:
+            if name in stack:
+                while stack.pop() != name:
+                    pass
+        else:
+            stack.append(name)
+    # Browsers auto-close these, so models often omit them
+    return [name for name in stack if name not in ("p", "li", "td", "tr", "th", "option", "html", "body", "head")]
+
+def css_brace_balance(css):
+    """Open-minus-close brace count, ignoring comments and strings."""
+    stripped = _COMMENTS_AND_STRINGS.sub("", css)
+    return stripped.count("{") - stripped.count("}")
+
+def validate_response(response, required=("html", "css", "js"), finish_reason=None):
+    """Check a response for truncation, broken markup and missing blocks."""
+    result = ValidationResult()
+    blocks = fenced_blocks(response)
+    present = {language for language, _ in blocks}
+    html, css, _ = extract_code_from_response(response)
+    # CSS/JS inlined into the html counts as present
+    present.update(kind for kind, pattern in _INLINE_BLOCK.items() if html and pattern.search(html))
+
+    if blocks and not blocks[-1][1]:
+        result.truncated_block = blocks[-1][0]
+        result.issues.append(f"Response stops inside the {result.truncated_block} block")
+    elif finish_reason == "length" and any(kind not in present for kind in required):
+        # Cut off between blocks; a complete response that happened to hit the limit needs nothing
+        result.truncated_block = blocks[-1][0] if blocks else "html"
+        result.issues.append("Response hit the token limit")
+
+    if not html and "html" in present:
+        # Unclosed final block: take its text so the checks below still run
+        html = response[response.rfind("```html") + 7:] if result.truncated_block == "html" else ""
+    for kind in required:
+        if kind not in present and result.truncated_block is None:
+            result.missing_blocks.append(kind)
+            result.issues.append(f"Missing {kind} block")
+
+    if html and result.truncated_block is None:
+        result.unclosed_tags = unclosed_tags(html)
+        if result.unclosed_tags:
+            result.issues.append(f"Unclosed HTML tags: {', '.join(result.unclosed_tags[:5])}")
+    if css and result.truncated_block is None:
+        result.css_brace_balance = css_brace_balance(css)
+        if result.css_brace_balance:
+            result.issues.append(f"Unbalanced CSS braces ({result.css_brace_balance:+d})")
+    return result
+
+def continuation_prompt(response, result):
+    """Build the follow-up instruction for a repairable result."""
+    if result.truncated_block:
+        tail = response[-400:]
+        return (
+            "Your previous response was cut off. Continue EXACTLY where it stopped, "
+            "starting with the next character. Do not repeat anything already written "
+            "and do not restart the code block. Finish the current block and then any "
+            "remaining html/css/javascript blocks.\n\n"
+            f"The response currently ends with:\n{tail}"
+        )
+    fences = ", ".join(f"```{BLOCK_FENCES[kind]}" for kind in result.missing_blocks)
+    return (
+        f"Your previous response is missing these code blocks: {fences}. "
+        "Reply with ONLY those blocks, complete and consistent with the code you already sent."
+    )
+
+def merge_continuation(response, continuation):
+    """Append a continuation, removing re-opened fences and text the model repeated."""
+    blocks = fenced_blocks(response)
+    inside_block = bool(blocks) and not blocks[-1][1]
+    if inside_block:
+        # Models sometimes re-open the block they are continuing
+        continuation = re.sub(r"^\s*```[a-zA-Z]*\n", "", continuation, count=1)
+    # Drop the longest prefix of the continuation that repeats the response's end
+    window = response[-OVERLAP_WINDOW:]
+    for size in range(min(len(window), len(continuation)), 20, -1):
+        if window.endswith(continuation[:size]):
+            continuation = continuation[size:]
+            break
+    return response + continuation
+
+def repair_response(response, continue_fn, max_rounds=2, required=("html", "css", "js"), finish_reason=None):
+    """Validate and, if needed, repair a response.
+
+    `continue_fn(partial_response, instruction)` must return the model's
+    follow-up text, a (text, finish_reason) pair, or None. `finish_reason`
+    is that of the initial response ("length" when it hit the token limit).
+    Returns (response, ValidationResult of the final response, rounds used).
+    """
+    result = validate_response(response, required, finish_reason)
+    rounds = 0
+    while result.repairable and rounds < max_rounds:
+        rounds += 1
+        follow_up = continue_fn(response, continuation_prompt(response, result))
+        finish_reason = None
+        if isinstance(follow_up, tuple):
+            follow_up, finish_reason = follow_up
+        if not follow_up:
+            break
+        if result.truncated_block:
+            response = merge_continuation(response, follow_up)
+        else:
+            response = response.rstrip() + "\n\n" + follow_up.strip()
+        result = validate_response(response, required, finish_reason)
+    return response, result, rounds
@@ -0,0 +1,186 @@
+#preview_server.py
+"""Serve website versions over HTTP so previews can be cached by the browser.
+
+Inlining a whole site into st.components.v1.html sends it through the
+websocket on every rerun. Instead each version is published once under
+/v/<content hash>/ by a small threaded HTTP server in the app process,
+and the preview is a plain iframe pointing at it. The URLs change
+whenever the code changes, so responses carry immutable caching headers,
+strong ETags and gzip encoding.
+"""
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from asset_optimizer import gzip_bytes
+from config import get_setting
+
+MAX_PUBLISHED_VERSIONS = 32
+GZIP_MIN_BYTES = 1024
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CONTENT_TYPES = {
+    "index.html": "text/html; charset=utf-8",
+    "styles.css": "text/css; charset=utf-8",
+    "script.js": "application/javascript; charset=utf-8",
+}
+
+def preview_index_html(version):
+    """Preview page that loads the version's styles.css and script.js."""
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Website Preview</title>
+    <link rel="stylesheet" href="styles.css">
+</head>
+<body>
+{version.html}
+<script src="script.js"></script>
+</body>
+</html>"""
+
+class _PublishedFile:
+    __slots__ = ("body", "etag", "_gzipped")
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip_bytes(self.body)
+        return self._gzipped
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    server_version = "GhataPreview"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        preview = self.server.preview
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "v":
+            parts.append("index.html")
+        published = preview.lookup(parts[1], parts[2]) if len(parts) == 3 and parts[0] == "v" else None
+        if published is None:
+            self.send_error(404)
+            return
+
+        headers = {
+            "Cache-Control": CACHE_CONTROL,
+            "ETag": published.etag,
+            "Vary": "Accept-Encoding",
+        }
+        if published.etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+            preview.count("not_modified")
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        body = published.body
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = published.gzipped()
+            headers["Content-Encoding"] = "gzip"
+        headers["Content-Type"] = CONTENT_TYPES[parts[2]]
+        headers["Content-Length"] = str(len(body))
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+        preview.count("served", len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+class PreviewServer:
+    """Threaded HTTP server holding the most recently published versions."""
+
+    def __init__(self, host="127.0.0.1", port=0, max_versions=MAX_PUBLISHED_VERSIONS):
+        self.max_versions = max_versions
+        self._versions = OrderedDict()   # content hash -> {file name: _PublishedFile}
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "served": 0, "not_modified": 0, "bytes_sent": 0}
+        self._httpd = ThreadingHTTPServer((host, port), _PreviewHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.preview = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="preview-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def publish(self, version):
+        """Make a version available and return its path (/v/<hash>/)."""
+        key = version.content_hash
+        with self._lock:
+            if key in self._versions:
+                self._versions.move_to_end(key)
+                return f"/v/{key}/"
+        contents = {
+            "index.html": preview_index_html(version),
+            "styles.css": version.css,
+            "script.js": version.js,
+        }
+        files = {
+            name: _PublishedFile(text.encode("utf-8"), f'"{key}-{name}"')
+            for name, text in contents.items()
+        }
+        with self._lock:
+            self._versions[key] = files
+            self._stats["published"] += 1
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+        return f"/v/{key}/"
+
+    def url(self, version, base_url=None):
+        """Absolute URL of a version's preview page, publishing it if needed."""
+        return (base_url or self.address).rstrip("/") + self.publish(version)
+
+    def lookup(self, key, name):
+        with self._lock:
+            files = self._versions.get(key)
+            return files.get(name) if files else None
+
+    def count(self, stat, sent=0):
+        with self._lock:
+            self._stats[stat] += 1
+            self._stats["bytes_sent"] += sent
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, versions=len(self._versions))
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def get_preview_server():
+    """Return the process-wide PreviewServer, or None if it can't be started.
+
+    GHATA_PREVIEW_PORT picks the port (default: any free port).
+    """
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                try:
+                    _server = PreviewServer(port=int(get_setting("GHATA_PREVIEW_PORT", "0")))
+                except (OSError, ValueError) as e:
+                    print(f"Preview server unavailable: {str(e)}")
+                    _server = False
+    return _server or None
@@ -0,0 +1,150 @@
+#profiling.py
+"""Developer-mode profiling of app reruns and generation jobs.
+
+Enabled with GHATA_PROFILE=1 (whole process) or ?profile=1 in the app URL
+(that browser session only). Each capture runs the wrapped code under
+cProfile and tracemalloc and writes a text report (top functions by
+cumulative time, top allocation sites) plus the raw .prof file to
+GHATA_PROFILE_DIR, keeping the newest GHATA_PROFILE_KEEP captures.
+
+When profiling is off, callers pay one boolean check: nothing here is
+imported into the hot path and no profiler is installed.
+"""
+import io
+import os
+import threading
+import time
+from collections import deque
+from config import get_setting
+
+DEFAULT_PROFILE_DIR = ".profiles"
+DEFAULT_KEEP = 20
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+_active = threading.local()
+_recent = deque(maxlen=DEFAULT_KEEP)
+_recent_lock = threading.Lock()
+_capture_lock = threading.Lock()  # cProfile and tracemalloc are per process
+
+def enabled_by_env():
+    return get_setting("GHATA_PROFILE", "0").lower() in ("1", "true", "on")
+
+class Capture:
+    """Summary of one profiled run, as shown in the app's profiling panel."""
+
+    __slots__ = ("label", "started", "seconds", "peak_kb", "hotspots", "allocations", "path")
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.seconds = 0.0
+        self.peak_kb = 0.0
+        self.hotspots = []      # [(function, cumulative seconds, calls)]
+        self.allocations = []   # [(file:line, KiB, count)]
+        self.path = None
+
+def recent_captures():
+    """Newest first."""
+    with _recent_lock:
+        return list(reversed(_recent))
+
+class profile:
+    """Context manager profiling its block when `enabled` is true.
+
+    Nested captures on the same thread fold into the outer one, and only
+    one capture runs at a time per process (others are skipped), because
+    cProfile and tracemalloc can't be stacked.
+    """
+
+    def __init__(self, label, enabled=True):
+        self.label = label
+        self.enabled = enabled
+        self.capture = None
+
+    def __enter__(self):
+        if not self.enabled or getattr(_active, "on", False) or not _capture_lock.acquire(blocking=False):
+            self.enabled = False
+            return self
+        import cProfile
+        import tracemalloc
+        _active.on = True
+        self.capture = Capture(self.label)
+        self._own_tracemalloc = not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        self._profiler = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.enabled:
+            return False
+        import tracemalloc
+        self._profiler.disable()
+        try:
+            capture = self.capture
+            capture.seconds = time.perf_counter() - self._start
+            snapshot = tracemalloc.take_snapshot()
+            capture.peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+            _write_report(capture, self._profiler, snapshot)
+            with _recent_lock:
+                _recent.append(capture)
+        finally:
+            _active.on = False
+            _capture_lock.release()
+        # Exceptions (including Streamlit's rerun signal) propagate unchanged
+        return False
+
+def _write_report(capture, profiler, snapshot):
+    import pstats
+    import tracemalloc
+
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    capture.hotspots = [
+        (f"{os.path.basename(filename)}:{line}({name})", cumulative, calls)
+        for (filename, line, name), (_, calls, _, cumulative, _) in rows[:TOP_FUNCTIONS]
+    ]
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    capture.allocations = [
+        (f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+         stat.size / 1024, stat.count)
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+
+    directory = get_setting("GHATA_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(capture.started))
+    base = os.path.join(directory, f"{stamp}-{int(capture.started * 1000) % 1000:03d}-{capture.label}")
+    stats.dump_stats(base + ".prof")
+
+    report = io.StringIO()
+    report.write(f"{capture.label}: {capture.seconds * 1000:.1f} ms, peak traced memory {capture.peak_kb:.0f} KiB\n\n")
+    report.write("Top functions by cumulative time\n")
+    for function, cumulative, calls in capture.hotspots:
+        report.write(f"  {cumulative * 1000:10.2f} ms {calls:8d} calls  {function}\n")
+    report.write("\nTop allocation sites (live at the end of the run)\n")
+    for site, size_kb, count in capture.allocations:
+        report.write(f"  {size_kb:10.1f} KiB {count:8d} blocks {site}\n")
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+    capture.path = base + ".txt"
+    _rotate(directory, int(get_setting("GHATA_PROFILE_KEEP", DEFAULT_KEEP)))
+
+def _rotate(directory, keep):
+    reports = sorted(name for name in os.listdir(directory) if name.endswith(".txt"))
+    for name in reports[:-keep] if keep > 0 else []:
+        for extension in (".txt", ".prof"):
+            try:
+                os.remove(os.path.join(directory, name[:-4] + extension))
+            except FileNotFoundError:
+                pass
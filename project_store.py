@@ -0,0 +1,512 @@
+#project_store.py
+import abc
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config import get_setting
+from website_version import WebsiteVersion
+from session_memory import message_size, version_size
+
+DEFAULT_DB_PATH = "ghata_projects.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    current_version_index INTEGER NOT NULL DEFAULT -1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_project ON sessions(project_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    -- Generated code lives in the referenced version; content is the prose only
+    version_id TEXT,
+    guide INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+
+-- Version metadata only; the code lives in version_blobs so listing stays cheap
+CREATE TABLE IF NOT EXISTS versions (
+    rowid INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    version_id TEXT NOT NULL,
+    session_id TEXT,
+    description TEXT NOT NULL DEFAULT '',
+    timestamp TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    UNIQUE (project_id, version_id)
+);
+CREATE INDEX IF NOT EXISTS idx_versions_project ON versions(project_id, created_at);
+
+-- Predicted vs actual output size of generations, used by token_planner
+CREATE TABLE IF NOT EXISTS token_usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tier TEXT NOT NULL,
+    request_kind TEXT NOT NULL,
+    predicted_tokens INTEGER NOT NULL,
+    actual_tokens INTEGER NOT NULL,
+    max_tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS version_blobs (
+    version_rowid INTEGER PRIMARY KEY REFERENCES versions(rowid) ON DELETE CASCADE,
+    html TEXT NOT NULL,
+    css TEXT NOT NULL,
+    js TEXT NOT NULL
+);
+"""
+
+class ProjectStore:
+    """SQLite-backed store for projects, sessions, chat messages and versions.
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    readers never block the writer.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+
+    def _migrate(self, conn):
+        # Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+        with conn:
+            if "version_id" not in columns:
+                conn.execute("ALTER TABLE messages ADD COLUMN version_id TEXT")
+            if "guide" not in columns:
+                conn.execute("ALTER TABLE messages ADD COLUMN guide INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Projects
+
+    def create_project(self, name="Untitled project"):
+        project_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO projects (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (project_id, name, now, now)
+            )
+        return project_id
+
+    def project_exists(self, project_id):
+        row = self._connect().execute(
+            "SELECT 1 FROM projects WHERE id = ?", (project_id,)
+        ).fetchone()
+        return row is not None
+
+    def list_projects(self, limit=50, offset=0):
+        """Return the most recently updated projects."""
+        rows = self._connect().execute(
+            "SELECT id, name, created_at, updated_at FROM projects "
+            "ORDER BY updated_at DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_project(self, project_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    def _touch_project(self, conn, project_id, now):
+        conn.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (now, project_id))
+
+    # Sessions
+
+    def create_session(self, project_id):
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (id, project_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, project_id, now, now)
+            )
+        return self.get_session(session_id)
+
+    def get_session(self, session_id):
+        row = self._connect().execute(
+            "SELECT * FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_latest_session(self, project_id):
+        row = self._connect().execute(
+            "SELECT * FROM sessions WHERE project_id = ? ORDER BY updated_at DESC LIMIT 1",
+            (project_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def set_current_version_index(self, session_id, index):
+        with self._connect() as conn:
+            self._update_current_index(conn, session_id, index, time.time())
+
+    def _update_current_index(self, conn, session_id, index, now):
+        conn.execute(
+            "UPDATE sessions SET current_version_index = ?, updated_at = ? WHERE id = ?",
+            (index, now, session_id)
+        )
+
+    # Messages
+
+    def add_message(self, session_id, role, content, version_id=None, guide=False):
+        with self._connect() as conn:
+            self._insert_message(conn, session_id, role, content, version_id, guide, time.time())
+
+    def _insert_message(self, conn, session_id, role, content, version_id, guide, now):
+        conn.execute(
+            "INSERT INTO messages (session_id, role, content, version_id, guide, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, role, content, version_id, int(bool(guide)), now)
+        )
+        conn.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+
+    def get_messages(self, session_id, limit=None):
+        """Return a session's messages oldest first, optionally only the last `limit`."""
+        if limit is None:
+            rows = self._connect().execute(
+                "SELECT role, content, version_id, guide FROM messages WHERE session_id = ? ORDER BY id",
+                (session_id,)
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT role, content, version_id, guide FROM (SELECT id, role, content, version_id, guide "
+                "FROM messages "
+                "WHERE session_id = ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (session_id, limit)
+            ).fetchall()
+        return [message_from_row(row) for row in rows]
+
+    def count_messages(self, session_id):
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0]
+
+    def get_message_at(self, session_id, position):
+        """Return the session's message at 0-based `position`, or None."""
+        row = self._connect().execute(
+            "SELECT role, content, version_id, guide FROM messages WHERE session_id = ? "
+            "ORDER BY id LIMIT 1 OFFSET ?", (session_id, position)
+        ).fetchone()
+        return message_from_row(row) if row else None
+
+    def load_message_history(self, session_id, budget=None, preload=20):
+        """Return a MessageHistory with the last `preload` messages already in memory."""
+        count = self.count_messages(session_id)
+        history = MessageHistory(self, session_id, count, budget)
+        recent = self.get_messages(session_id, limit=preload) if preload else []
+        for offset, message in enumerate(recent):
+            history._keep(count - len(recent) + offset, message)
+        return history
+
+    # Versions
+
+    def add_version(self, project_id, version, session_id=None):
+        with self._connect() as conn:
+            self._insert_version(conn, project_id, version, session_id, time.time())
+
+    def _insert_version(self, conn, project_id, version, session_id, now):
+        size = len(version.html) + len(version.css) + len(version.js)
+        cursor = conn.execute(
+            "INSERT INTO versions (project_id, version_id, session_id, description, "
+            "timestamp, size, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (project_id, version.id, session_id, version.description,
+             version.timestamp, size, version.created_at)
+        )
+        conn.execute(
+            "INSERT INTO version_blobs (version_rowid, html, css, js) VALUES (?, ?, ?, ?)",
+            (cursor.lastrowid, version.html, version.css, version.js)
+        )
+        self._touch_project(conn, project_id, now)
+
+    def list_versions(self, project_id):
+        """Return version metadata (no code) for a project, oldest first."""
+        rows = self._connect().execute(
+            "SELECT version_id AS id, description, timestamp, size, created_at FROM versions "
+            "WHERE project_id = ? ORDER BY created_at, rowid", (project_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_version(self, project_id, version_id):
+        """Load a single version including its code, or None."""
+        row = self._connect().execute(
+            "SELECT v.version_id, v.description, v.timestamp, v.created_at, b.html, b.css, b.js "
+            "FROM versions v JOIN version_blobs b ON b.version_rowid = v.rowid "
+            "WHERE v.project_id = ? AND v.version_id = ?", (project_id, version_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return WebsiteVersion(
+            html=row["html"], css=row["css"], js=row["js"],
+            description=row["description"], timestamp=row["timestamp"],
+            id=row["version_id"], created_at=row["created_at"]
+        )
+
+    def first_versions(self, limit=500, after_rowid=None):
+        """Return the first version of each project with the request that produced it.
+
+        Rows are dicts with project_id, version_id, rowid, description and
+        prompt (the project's first user message, or "" if none), newest
+        first. With `after_rowid`, only versions stored after that row are
+        considered and rows come oldest first, so callers can page forward.
+        """
+        select = (
+            "SELECT v.project_id, v.version_id, v.rowid, v.description, "
+            "COALESCE((SELECT m.content FROM messages m JOIN sessions s ON s.id = m.session_id "
+            "          WHERE s.project_id = v.project_id AND m.role = 'user' ORDER BY m.id LIMIT 1), '') "
+            "AS prompt FROM versions v "
+            # A project's first version has no earlier row (uses the project index)
+            "WHERE NOT EXISTS (SELECT 1 FROM versions p WHERE p.project_id = v.project_id AND p.rowid < v.rowid) "
+        )
+        if after_rowid is None:
+            rows = self._connect().execute(select + "ORDER BY v.rowid DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = self._connect().execute(
+                select + "AND v.rowid > ? ORDER BY v.rowid LIMIT ?", (after_rowid, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # Batched writes
+
+    def apply_changes(self, changes):
+        """Write a batch of changes in one transaction and return the payload bytes written.
+
+        Each change is one of:
+            ("message", session_id, role, content, version_id, guide)
+            ("version", project_id, version, session_id)
+            ("current_index", session_id, index)
+        """
+        now = time.time()
+        written = 0
+        with self._connect() as conn:
+            for change in changes:
+                kind = change[0]
+                if kind == "message":
+                    _, session_id, role, content, version_id, guide = change
+                    self._insert_message(conn, session_id, role, content, version_id, guide, now)
+                    written += len(content.encode("utf-8"))
+                elif kind == "version":
+                    _, project_id, version, session_id = change
+                    self._insert_version(conn, project_id, version, session_id, now)
+                    written += sum(len(part.encode("utf-8")) for part in
+                                   (version.html, version.css, version.js, version.description))
+                elif kind == "current_index":
+                    _, session_id, index = change
+                    self._update_current_index(conn, session_id, index, now)
+                    written += 8
+                else:
+                    raise ValueError(f"Unknown change type: {kind}")
+        return written
+
+    # Token usage
+
+    def add_token_usage(self, tier, request_kind, predicted_tokens, actual_tokens, max_tokens, created_at=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO token_usage (tier, request_kind, predicted_tokens, actual_tokens, "
+                "max_tokens, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (tier, request_kind, predicted_tokens, actual_tokens, max_tokens,
+                 created_at or time.time())
+            )
+
+    def recent_token_usage(self, limit=500):
+        """Return (tier, request_kind, predicted, actual) rows, oldest first."""
+        rows = self._connect().execute(
+            "SELECT tier, request_kind, predicted_tokens, actual_tokens FROM "
+            "(SELECT * FROM token_usage ORDER BY id DESC LIMIT ?) ORDER BY id", (limit,)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def load_version_history(self, project_id, budget=None):
+        return VersionHistory(self, project_id, self.list_versions(project_id), budget)
+
+
+def message_from_row(row):
+    """Chat message dict; version_id/guide are only present when set."""
+    message = {"role": row["role"], "content": row["content"]}
+    if row["version_id"]:
+        message["version_id"] = row["version_id"]
+    if row["guide"]:
+        message["guide"] = True
+    return message
+
+
+class _PagedHistory(abc.ABC):
+    """Shared paging for the lazy histories below.
+
+    Loaded items are kept for later reruns. With a MemoryBudget, items may
+    be dropped from memory again and are re-read from the store on the next
+    access. `on_miss` is called (then the read retried) when an item isn't
+    in the store yet, which lets callers flush pending autosaves.
+    """
+
+    def __init__(self, store, budget=None, on_miss=None):
+        self._store = store
+        self._budget = budget
+        self.on_miss = on_miss
+        self._loaded = {}
+
+    @abc.abstractmethod
+    def _fetch(self, index):
+        """Read item `index` from the store, or return None if it isn't there."""
+
+    @abc.abstractmethod
+    def _size(self, item):
+        """Bytes an item counts against the memory budget."""
+
+    def _keep(self, index, item, paged_in=False):
+        self._loaded[index] = item
+        if self._budget is not None:
+            self._budget.touch(self, index, self._size(item), self._evict, paged_in)
+
+    def _evict(self, index):
+        self._loaded.pop(index, None)
+
+    def _get(self, index):
+        item = self._loaded.get(index)
+        if item is None:
+            item = self._fetch(index)
+            if item is None and self.on_miss is not None:
+                self.on_miss()
+                item = self._fetch(index)
+            if item is None:
+                raise LookupError(f"item {index} is not in memory or in the store")
+            self._keep(index, item, paged_in=True)
+        elif self._budget is not None:
+            self._budget.touch(self, index, self._size(item), self._evict)
+        return item
+
+    def _normalize(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self)))]
+        return self._get(self._normalize(index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def resident(self):
+        """Number of items currently held in memory."""
+        return len(self._loaded)
+
+
+class VersionHistory(_PagedHistory):
+    """List-like view of a project's versions that loads code on first access.
+
+    Only metadata is read up front; `history[i]` fetches that version's blobs
+    and keeps the WebsiteVersion for later reruns (within the memory budget).
+    """
+
+    def __init__(self, store, project_id, rows, budget=None, on_miss=None):
+        super().__init__(store, budget, on_miss)
+        self._project_id = project_id
+        self._rows = rows
+
+    def _fetch(self, index):
+        return self._store.get_version(self._project_id, self._rows[index]["id"])
+
+    def _size(self, version):
+        return version_size(version)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, version):
+        """Track a version the caller persists (directly or through autosave)."""
+        self._rows.append({
+            "id": version.id,
+            "description": version.description,
+            "timestamp": version.timestamp,
+        })
+        self._keep(len(self._rows) - 1, version)
+
+    def metadata(self):
+        """Return version metadata without loading any code."""
+        return list(self._rows)
+
+
+class MessageHistory(_PagedHistory):
+    """List-like view of a session's chat messages, paged by position."""
+
+    def __init__(self, store, session_id, count, budget=None, on_miss=None):
+        super().__init__(store, budget, on_miss)
+        self._session_id = session_id
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def _fetch(self, index):
+        return self._store.get_message_at(self._session_id, index)
+
+    def _size(self, message):
+        return message_size(message)
+
+    def append(self, message):
+        """Track a message the caller persists (directly or through autosave)."""
+        self._count += 1
+        self._keep(self._count - 1, message)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the process-wide ProjectStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = get_setting("GHATA_DB_PATH", DEFAULT_DB_PATH)
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                _store = ProjectStore(path)
+    return _store
@@ -0,0 +1,198 @@
+#section_editor.py
+"""Regenerate one section of a site instead of the whole page.
+
+The current version's HTML is split into landmark sections (site_sections);
+each section is mapped to the CSS rules and JS statements that reference
+its ids and classes. When a request clearly targets one section, only that
+slice plus a short outline of the rest is sent to the model, and the
+answer is spliced back into a new WebsiteVersion.
+"""
+import re
+from site_sections import split_html_sections, split_css_rules, split_js_blocks
+from version_index import tokenize
+from website_version import WebsiteVersion
+
+# Words users say for a section -> tokens found in section names/tags
+SECTION_ALIASES = {
+    "hero": ("hero", "banner", "jumbotron", "intro", "splash"),
+    "header": ("header", "top", "masthead"),
+    "nav": ("nav", "navigation", "navbar", "menu"),
+    "footer": ("footer", "bottom"),
+    "form": ("form", "contact", "signup", "newsletter", "subscribe"),
+}
+
+_HTML_CLASSES = re.compile(r"""\bclass\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_HTML_IDS = re.compile(r"""\bid\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_CSS_NAMES = re.compile(r"([.#])(-?[_a-zA-Z][_a-zA-Z0-9-]*)")
+_HEADING = re.compile(r"<h[1-3][^>]*>([\s\S]*?)</h[1-3]>", re.IGNORECASE)
+_TAGS = re.compile(r"<[^>]+>")
+
+SECTION_SYSTEM_PROMPT = """You are an elite web developer AI editing ONE section of an existing website.
+
+You receive the section's HTML, the CSS rules and JavaScript that belong to it, and an outline of the rest of the page for context.
+
+Rules:
+1. Return ONLY the updated section, never the whole page.
+2. Answer with exactly three code blocks in this order:
+   ```html
+   <!-- the complete replacement for this section's element -->
+   ```
+   ```css
+   /* the complete replacement for the CSS rules you were given, plus any new rules */
+   ```
+   ```javascript
+   // the complete replacement for the JavaScript you were given, plus any new code
+   ```
+3. Keep the section's root element, id and classes unless the user asks to change them, so the rest of the page keeps working.
+4. If the CSS or JavaScript does not need to change, repeat it unchanged. Leave a block empty only if the section had none and needs none.
+5. Keep the existing design language (colors, fonts, spacing) consistent with the outline.
+6. Follow content safety rules: refuse inappropriate, harmful or illegal content.
+"""
+
+class SectionMap:
+    """Sections of a version and, for each, the CSS rules and JS blocks it owns."""
+
+    def __init__(self, version):
+        self.version = version
+        self.sections = split_html_sections(version.html)
+        self.css_rules = split_css_rules(version.css)
+        self.js_blocks = split_js_blocks(version.js)
+        self._names = [self._names_in(section.text) for section in self.sections]
+
+    @staticmethod
+    def _names_in(html):
+        classes = {c for match in _HTML_CLASSES.findall(html) for c in match.split()}
+        ids = set(_HTML_IDS.findall(html))
+        return classes, ids
+
+    def _own_names(self, index):
+        """Classes and ids that appear in section `index` and in no other section."""
+        classes, ids = self._names[index]
+        other_classes, other_ids = set(), set()
+        for i, (c, d) in enumerate(self._names):
+            if i != index:
+                other_classes |= c
+                other_ids |= d
+        return classes - other_classes, ids - other_ids
+
+    def css_for(self, index):
+        """CSS rules owned by section `index`.
+
+        A rule is owned when every class/id it names occurs in the section and
+        at least one of them occurs nowhere else; shared rules (e.g. `.card`
+        used by several sections) are left alone.
+        """
+        classes, ids = self._names[index]
+        own_classes, own_ids = self._own_names(index)
+        rules = []
+        for rule in self.css_rules:
+            if rule.name.startswith("@"):
+                continue
+            names = _CSS_NAMES.findall(rule.name)
+            if not names:
+                continue
+            inside = all((name in classes) if kind == "." else (name in ids) for kind, name in names)
+            owned = any((name in own_classes) if kind == "." else (name in own_ids) for kind, name in names)
+            if inside and owned:
+                rules.append(rule)
+        return rules
+
+    def js_for(self, index):
+        """JS blocks that reference an id or class used only by section `index`."""
+        own_classes, own_ids = self._own_names(index)
+        own = sorted(own_ids) + sorted(own_classes)
+        if not own:
+            return []
+        pattern = re.compile(r"""(["'`][.#]?)(%s)\b""" % "|".join(re.escape(name) for name in own))
+        return [block for block in self.js_blocks if pattern.search(block.text)]
+
+    def outline(self, skip=None):
+        """One line per section: name and first heading, for context."""
+        lines = []
+        for i, section in enumerate(self.sections):
+            if section.name.startswith("fragment@"):
+                continue
+            heading = _HEADING.search(section.text)
+            title = _TAGS.sub("", heading.group(1)).strip() if heading else ""
+            marker = "  <-- being edited" if i == skip else ""
+            lines.append(f"- {section.name}{': ' + title[:60] if title else ''}{marker}")
+        return "\n".join(lines)
+
+    def find_target(self, request):
+        """Return the index of the section the request is about, or None if unclear."""
+        words = set(tokenize(request))
+        if not words or not self.sections:
+            return None
+        expanded = set(words)
+        for canonical, aliases in SECTION_ALIASES.items():
+            if words & set(aliases):
+                expanded.add(canonical)
+                expanded.update(aliases)
+
+        scores = []
+        for i, section in enumerate(self.sections):
+            if section.name.startswith("fragment@"):
+                scores.append(0)
+                continue
+            label = set(tokenize(f"{section.tag} {section.id} {' '.join(section.classes)}"))
+            score = 3 * len(words & label) + len(expanded & label)
+            scores.append(score)
+
+        best = max(range(len(scores)), key=scores.__getitem__)
+        ranked = sorted(scores, reverse=True)
+        # Require a clear winner so ambiguous requests fall back to a full regeneration
+        if ranked[0] < 3 or (len(ranked) > 1 and ranked[1] * 2 > ranked[0]):
+            return None
+        return best
+
+    def build_prompt(self, index, request):
+        """Return the user prompt for regenerating section `index`."""
+        section = self.sections[index]
+        css = "\n\n".join(rule.text.strip() for rule in self.css_for(index))
+        js = "\n\n".join(block.text.strip() for block in self.js_for(index))
+        return f"""Page outline:
+{self.outline(skip=index)}
+
+Section to edit ({section.name}):
+```html
+{section.text.strip()}
+```
+
+CSS for this section:
+```css
+{css}
+```
+
+JavaScript for this section:
+```javascript
+{js}
+```
+
+Requested change: {request}"""
+
+    def splice(self, index, html, css, js, description):
+        """Return a new WebsiteVersion with section `index` and its CSS/JS replaced.
+
+        Pass None for `css` or `js` to keep that part of the section unchanged.
+        """
+        section = self.sections[index]
+        new_html = self.version.html[:section.start] + html + self.version.html[section.end:]
+        new_css = self.version.css if css is None else _replace_pieces(self.version.css, self.css_for(index), css)
+        new_js = self.version.js if js is None else _replace_pieces(self.version.js, self.js_for(index), js)
+        return WebsiteVersion(html=new_html, css=new_css, js=new_js, description=description)
+
+def _replace_pieces(source, pieces, replacement):
+    """Remove `pieces` from `source` and put `replacement` where the first one was."""
+    if not pieces:
+        if not replacement.strip():
+            return source
+        return source.rstrip() + "\n\n" + replacement.strip() + "\n"
+    out = []
+    position = 0
+    for i, piece in enumerate(sorted(pieces, key=lambda p: p.start)):
+        out.append(source[position:piece.start])
+        if i == 0:
+            out.append("\n" + replacement.strip() + "\n" if replacement.strip() else "")
+        position = piece.end
+    out.append(source[position:])
+    return "".join(out)
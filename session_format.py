@@ -0,0 +1,188 @@
+#session_format.py
+"""Compact binary format for saved sessions.
+
+Layout (all integers little-endian):
+
+    header   MAGIC | format u16 | codec u8 | reserved u8 | index offset u64 | index length u64
+    records  u32 length | payload      (one per message body and html/css/js blob)
+    index    compressed compact JSON: metadata plus [offset, length] refs to records
+
+The index sits at the end so the file can be written in one pass; the
+header points at it. Readers mmap the file, decode only the index to list
+versions, and decompress a blob only when that version is loaded.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from website_version import WebsiteVersion
+
+MAGIC = b"GHSF"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHBBQQ")
+RECORD_LENGTH = struct.Struct("<I")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def available_codecs():
+    """Return the codec names usable in this environment."""
+    names = ["none", "zlib"]
+    if _zstd() is not None:
+        names.append("zstd")
+    return names
+
+def _compress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, 6)
+    if codec == CODEC_ZSTD:
+        return _zstd().ZstdCompressor(level=3).compress(data)
+    return data
+
+def _decompress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        zstandard = _zstd()
+        if zstandard is None:
+            raise ValueError("Session file is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return bytes(data)
+
+def detect_format(path):
+    """Return "binary", "json" or None for a saved session file."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(len(MAGIC))
+    except OSError:
+        return None
+    if head == MAGIC:
+        return "binary"
+    if head.lstrip()[:1] == b"{":
+        return "json"
+    return None
+
+def write_session(path, messages, versions, current_version_index=-1, codec="zlib"):
+    """Write a session to `path` atomically and return the number of bytes written."""
+    codec_id = CODEC_NAMES[codec]
+    if codec_id == CODEC_ZSTD and _zstd() is None:
+        codec_id = CODEC_ZLIB
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, codec_id, 0, 0, 0))
+        offset = HEADER.size
+
+        def write_record(text):
+            nonlocal offset
+            payload = _compress(codec_id, text.encode("utf-8"))
+            f.write(RECORD_LENGTH.pack(len(payload)))
+            f.write(payload)
+            ref = [offset + RECORD_LENGTH.size, len(payload)]
+            offset += RECORD_LENGTH.size + len(payload)
+            return ref
+
+        index = {
+            "saved_at": time.time(),
+            "current_version_index": current_version_index,
+            "messages": [
+                dict(m, content=write_record(m["content"]))
+                for m in messages
+            ],
+            "versions": [
+                {
+                    "id": v.id,
+                    "description": v.description,
+                    "timestamp": v.timestamp,
+                    "created_at": v.created_at,
+                    "html": write_record(v.html),
+                    "css": write_record(v.css),
+                    "js": write_record(v.js),
+                }
+                for v in versions
+            ],
+        }
+        index_bytes = _compress(codec_id, json.dumps(index, separators=(",", ":")).encode("utf-8"))
+        f.write(index_bytes)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, codec_id, 0, offset, len(index_bytes)))
+        total = offset + len(index_bytes)
+    os.replace(tmp_path, path)
+    return total
+
+class SessionFile:
+    """Memory-mapped reader for binary session files."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        magic, fmt, codec, _, index_offset, index_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a binary session file")
+        if fmt > FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} uses unsupported session format {fmt}")
+        self._codec = codec
+        raw_index = self._map[index_offset:index_offset + index_length]
+        self._index = json.loads(_decompress(codec, raw_index))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _read(self, ref):
+        offset, length = ref
+        return _decompress(self._codec, self._map[offset:offset + length]).decode("utf-8")
+
+    @property
+    def saved_at(self):
+        return self._index.get("saved_at")
+
+    @property
+    def current_version_index(self):
+        return self._index.get("current_version_index", -1)
+
+    def versions_meta(self):
+        """Return version metadata without touching any code blobs."""
+        return [
+            {key: v[key] for key in ("id", "description", "timestamp", "created_at")}
+            for v in self._index["versions"]
+        ]
+
+    def load_version(self, index):
+        v = self._index["versions"][index]
+        return WebsiteVersion(
+            html=self._read(v["html"]), css=self._read(v["css"]), js=self._read(v["js"]),
+            description=v["description"], timestamp=v["timestamp"],
+            id=v["id"], created_at=v["created_at"]
+        )
+
+    def load_versions(self):
+        return [self.load_version(i) for i in range(len(self._index["versions"]))]
+
+    def load_messages(self):
+        return [dict(m, content=self._read(m["content"])) for m in self._index["messages"]]
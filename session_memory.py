@@ -0,0 +1,78 @@
+#session_memory.py
+"""Per-session memory budget for the version and message histories.
+
+Every browser session holds its versions and chat messages in
+st.session_state. With a MemoryBudget attached, the histories report the
+size of each payload they keep in memory; once the session is over its
+budget the least recently used payloads are dropped from memory. They
+are already persisted in the project store, so the histories page them
+back in on the next access. The session's VersionIndex accounts its
+section text against the same budget.
+"""
+import threading
+from collections import OrderedDict
+from config import get_setting
+
+DEFAULT_SESSION_BUDGET_MB = 32
+
+def default_budget_bytes():
+    return int(float(get_setting("GHATA_SESSION_MEMORY_MB", DEFAULT_SESSION_BUDGET_MB)) * 1024 * 1024)
+
+class MemoryBudget:
+    """LRU accounting of resident payloads, shared by one session's histories."""
+
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = default_budget_bytes() if limit_bytes is None else limit_bytes
+        self.used_bytes = 0
+        self.spills = 0
+        self.page_ins = 0
+        self._entries = OrderedDict()   # (owner id, key) -> (size, evict callback)
+        self._lock = threading.Lock()
+
+    def touch(self, owner, key, size, evict, paged_in=False):
+        """Record that `owner` holds payload `key` of `size` bytes in memory.
+
+        `evict(key)` is called to drop it when the budget needs room. The
+        payload being touched is never the one evicted.
+        """
+        entry_key = (id(owner), key)
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(entry_key, None)
+            if old is not None:
+                self.used_bytes -= old[0]
+            self._entries[entry_key] = (size, evict)
+            self.used_bytes += size
+            if paged_in:
+                self.page_ins += 1
+            while self.used_bytes > self.limit_bytes and len(self._entries) > 1:
+                (_, victim), (victim_size, victim_evict) = self._entries.popitem(last=False)
+                self.used_bytes -= victim_size
+                self.spills += 1
+                evicted.append((victim_evict, victim))
+        # Callbacks run outside the lock; they only drop references
+        for victim_evict, victim in evicted:
+            victim_evict(victim)
+
+    def release(self, owner):
+        """Forget everything held by `owner` (e.g. when a history is replaced)."""
+        owner_id = id(owner)
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == owner_id]:
+                self.used_bytes -= self._entries.pop(entry_key)[0]
+
+    def report(self):
+        with self._lock:
+            return {
+                "used_bytes": self.used_bytes,
+                "limit_bytes": self.limit_bytes,
+                "resident": len(self._entries),
+                "spills": self.spills,
+                "page_ins": self.page_ins,
+            }
+
+def version_size(version):
+    return len(version.html) + len(version.css) + len(version.js) + len(version.description)
+
+def message_size(message):
+    return len(message["content"]) + len(message["role"])
@@ -0,0 +1,178 @@
+#site_sections.py
+"""Split generated HTML/CSS/JS into addressable pieces.
+
+HTML is split into top-level landmark elements (header, nav, section,
+form, footer, ...), CSS into top-level rules and at-rule blocks, and JS
+into top-level statements. Every piece keeps its [start, end) offsets in
+the original text so it can be quoted or replaced in place.
+"""
+import re
+
+LANDMARK_TAGS = ("header", "nav", "main", "section", "article", "aside", "form", "footer")
+# Wrappers whose children are more useful units than the wrapper itself
+CONTAINER_TAGS = ("main",)
+
+_LANDMARK = re.compile(r"<(/?)(%s)\b([^>]*)>" % "|".join(LANDMARK_TAGS), re.IGNORECASE)
+_ID_ATTR = re.compile(r"""\bid\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_CLASS_ATTR = re.compile(r"""\bclass\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+class Section:
+    """A slice of source text: `kind` is html/css/js, `name` a readable label."""
+
+    __slots__ = ("kind", "name", "start", "end", "text", "tag", "id", "classes")
+
+    def __init__(self, kind, name, start, end, text, tag="", id="", classes=()):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end
+        self.text = text
+        self.tag = tag
+        self.id = id
+        self.classes = tuple(classes)
+
+    def __repr__(self):
+        return f"Section({self.kind!r}, {self.name!r}, {self.start}:{self.end})"
+
+def _section_name(tag, element_id, classes):
+    if element_id:
+        return f"{tag}#{element_id}"
+    if classes:
+        return f"{tag}.{classes[0]}"
+    return tag
+
+def split_html_sections(html, min_gap=40):
+    """Return the top-level landmark elements of `html` (plus sizeable gaps between them)."""
+    sections = []
+    stack = []
+    top_start = None
+    top_attrs = None
+    for match in _LANDMARK.finditer(html):
+        closing, tag, attrs = match.group(1), match.group(2).lower(), match.group(3)
+        if not closing:
+            if not stack:
+                top_start, top_attrs = match.start(), attrs
+            stack.append(tag)
+            continue
+        if tag not in stack:
+            continue  # stray closing tag
+        while stack and stack.pop() != tag:
+            pass
+        if not stack and top_start is not None:
+            element_id = (_ID_ATTR.search(top_attrs) or [None, ""])[1]
+            classes = ((_CLASS_ATTR.search(top_attrs) or [None, ""])[1]).split()
+            sections.append(Section("html", _section_name(tag, element_id, classes), top_start,
+                                    match.end(), html[top_start:match.end()], tag, element_id, classes))
+            top_start = None
+
+    # Descend into wrappers such as <main> so its children become the sections
+    expanded = []
+    for section in sections:
+        if section.tag in CONTAINER_TAGS:
+            inner_start = section.text.find(">") + 1
+            inner_end = section.text.lower().rfind(f"</{section.tag}")
+            children = split_html_sections(section.text[inner_start:inner_end], min_gap)
+            if len(children) > 1:
+                offset = section.start + inner_start
+                for child in children:
+                    child.start += offset
+                    child.end += offset
+                    if child.name.startswith("fragment@"):
+                        child.name = f"fragment@{child.start}"
+                expanded.extend(children)
+                continue
+        expanded.append(section)
+
+    # Keep meaningful markup that sits outside any landmark
+    result = []
+    position = 0
+    for section in expanded + [None]:
+        gap_end = section.start if section else len(html)
+        gap = html[position:gap_end]
+        if len(gap.strip()) >= min_gap:
+            result.append(Section("html", f"fragment@{position}", position, gap_end, gap))
+        if section:
+            result.append(section)
+            position = section.end
+    return result
+
+def _scan_top_level(code, line_comments):
+    """Yield end offsets of top-level statements/blocks, skipping strings and comments."""
+    depth = 0
+    i = 0
+    length = len(code)
+    while i < length:
+        ch = code[i]
+        if ch in "\"'`":
+            j = i + 1
+            while j < length and code[j] != ch:
+                j += 2 if code[j] == "\\" else 1
+            i = j + 1
+            continue
+        if ch == "/" and i + 1 < length:
+            nxt = code[i + 1]
+            if nxt == "*":
+                end = code.find("*/", i + 2)
+                i = length if end == -1 else end + 2
+                continue
+            if nxt == "/" and line_comments and (i == 0 or code[i - 1] in " \t\n;{}(),"):
+                end = code.find("\n", i)
+                i = length if end == -1 else end
+                continue
+        if ch in "{([":
+            depth += 1
+        elif ch in "})]":
+            depth = max(0, depth - 1)
+            if depth == 0 and ch == "}":
+                # Keep a trailing semicolon (`const x = {...};`) with its block
+                j = i + 1
+                while j < length and code[j] in " \t":
+                    j += 1
+                if j < length and code[j] == ";":
+                    i = j
+                yield i + 1
+        elif ch == ";" and depth == 0:
+            yield i + 1
+        i += 1
+
+def _pieces(code, kind, line_comments, name_for):
+    pieces = []
+    start = 0
+    for end in _scan_top_level(code, line_comments):
+        text = code[start:end]
+        if text.strip():
+            pieces.append(Section(kind, name_for(text), start, end, text))
+        start = end
+    if code[start:].strip():
+        pieces.append(Section(kind, name_for(code[start:]), start, len(code), code[start:]))
+    return pieces
+
+_CSS_COMMENT = re.compile(r"/\*[\s\S]*?\*/")
+
+def css_selector(rule_text):
+    """Return the selector/prelude of a CSS rule with comments stripped."""
+    return _WS.sub(" ", _CSS_COMMENT.sub("", rule_text.split("{", 1)[0])).strip()
+
+_WS = re.compile(r"\s+")
+
+def split_css_rules(css):
+    """Return top-level CSS rules; @media and similar blocks stay whole."""
+    return _pieces(css, "css", False, css_selector)
+
+_JS_NAME = re.compile(
+    r"(?:function\s+([\w$]+)|(?:const|let|var)\s+([\w$]+)|([\w$.]+)\s*\.\s*addEventListener|class\s+([\w$]+))"
+)
+
+def _js_name(text):
+    match = _JS_NAME.search(text)
+    if not match:
+        return _WS.sub(" ", text.strip())[:40]
+    return next(group for group in match.groups() if group)
+
+def split_js_blocks(js):
+    """Return top-level JS statements (function declarations, listeners, ...)."""
+    return _pieces(js, "js", True, _js_name)
+
+def split_version(version):
+    """Return every section of a version's html, css and js."""
+    return split_html_sections(version.html) + split_css_rules(version.css) + split_js_blocks(version.js)
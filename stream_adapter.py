@@ -0,0 +1,165 @@
+#stream_adapter.py
+"""Coalesce streamed deltas into batches and pace the consumers of a stream.
+
+Chat completions arrive as thousands of deltas of a few characters each.
+coalesce() joins them into batches bounded by time and size, so per-batch
+work (extraction, UI updates, metrics) runs tens of times per second
+instead of per token. StreamFanout delivers batches to several consumers,
+each at its own pace: a consumer whose callback is slow gets a longer
+interval and receives the accumulated text in fewer, larger calls, so it
+can't stall the stream (backpressure by coalescing rather than blocking).
+"""
+import threading
+import time
+
+CHARS_PER_TOKEN = 3.5
+DEFAULT_BATCH_INTERVAL = 0.05   # seconds
+DEFAULT_BATCH_CHARS = 2048
+SLOW_CONSUMER_FACTOR = 4        # interval grows to this many times the callback's cost
+
+class StreamStats:
+    """Throughput of one stream: chunk/batch counts, tokens/sec and CPU per token."""
+
+    __slots__ = ("chunks", "batches", "chars", "started", "first_chunk", "finished",
+                 "_cpu_started", "cpu_seconds", "finish_reason")
+
+    def __init__(self):
+        self.chunks = 0
+        self.batches = 0
+        self.chars = 0
+        self.started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        self.first_chunk = None
+        self.finished = None
+        self.cpu_seconds = 0.0
+        self.finish_reason = None  # set by the producer, e.g. "stop" or "length"
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        self.cpu_seconds = time.thread_time() - self._cpu_started
+
+    @property
+    def tokens(self):
+        return int(self.chars / CHARS_PER_TOKEN)
+
+    @property
+    def time_to_first_chunk(self):
+        return None if self.first_chunk is None else self.first_chunk - self.started
+
+    @property
+    def tokens_per_second(self):
+        if self.first_chunk is None:
+            return 0.0
+        elapsed = (self.finished or time.perf_counter()) - self.first_chunk
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def cpu_per_token(self):
+        return self.cpu_seconds / self.tokens if self.tokens else 0.0
+
+    def summary(self):
+        return (f"{self.tokens} tokens at {self.tokens_per_second:.0f} tok/s "
+                f"({self.chunks} chunks in {self.batches} batches)")
+
+def coalesce(deltas, stats=None, max_interval=DEFAULT_BATCH_INTERVAL, max_chars=DEFAULT_BATCH_CHARS,
+             clock=time.perf_counter):
+    """Yield joined batches of `deltas`.
+
+    A batch is emitted once `max_interval` seconds have passed since the
+    previous one or it holds `max_chars` characters; whatever is left is
+    emitted when the stream ends.
+    """
+    parts = []
+    size = 0
+    last = clock()
+    for delta in deltas:
+        if not delta:
+            continue
+        if stats is not None:
+            if stats.first_chunk is None:
+                stats.first_chunk = clock()
+            stats.chunks += 1
+        parts.append(delta)
+        size += len(delta)
+        now = clock()
+        if size < max_chars and now - last < max_interval:
+            continue
+        batch = "".join(parts)
+        parts.clear()
+        size = 0
+        last = now
+        if stats is not None:
+            stats.batches += 1
+            stats.chars += len(batch)
+        yield batch
+    if parts:
+        batch = "".join(parts)
+        if stats is not None:
+            stats.batches += 1
+            stats.chars += len(batch)
+        yield batch
+    if stats is not None:
+        stats.finish()
+
+class _Consumer:
+    __slots__ = ("callback", "min_interval", "interval", "pending", "last_call", "calls")
+
+    def __init__(self, callback, min_interval):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.interval = min_interval
+        self.pending = []
+        self.last_call = None
+        self.calls = 0
+
+class StreamFanout:
+    """Deliver stream batches to consumers without letting slow ones stall the stream."""
+
+    def __init__(self, clock=time.perf_counter):
+        self._consumers = []
+        self._clock = clock
+
+    def add(self, callback, min_interval=0.0):
+        """Register `callback(text)`; it is called at most once per `min_interval` seconds."""
+        self._consumers.append(_Consumer(callback, min_interval))
+        return self
+
+    def __bool__(self):
+        return bool(self._consumers)
+
+    def feed(self, text):
+        now = self._clock()
+        for consumer in self._consumers:
+            consumer.pending.append(text)
+            if consumer.last_call is None or now - consumer.last_call >= consumer.interval:
+                self._deliver(consumer)
+
+    def close(self):
+        """Flush everything still pending to every consumer."""
+        for consumer in self._consumers:
+            if consumer.pending:
+                self._deliver(consumer)
+
+    def _deliver(self, consumer):
+        text = "".join(consumer.pending)
+        consumer.pending.clear()
+        start = self._clock()
+        consumer.callback(text)
+        end = self._clock()
+        consumer.calls += 1
+        consumer.last_call = end
+        # Backpressure: a callback that takes long is called proportionally less often
+        consumer.interval = max(consumer.min_interval, (end - start) * SLOW_CONSUMER_FACTOR)
+
+    def calls(self):
+        """Number of deliveries made to each consumer, in registration order."""
+        return [consumer.calls for consumer in self._consumers]
+
+_local = threading.local()
+
+def set_last_stats(stats):
+    _local.stats = stats
+
+def last_stream_stats():
+    """StreamStats of the most recent stream collected on this thread, or None."""
+    return getattr(_local, "stats", None)
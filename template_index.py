@@ -0,0 +1,165 @@
+#template_index.py
+"""Reuse sites from earlier projects as starting points for new requests.
+
+Every project's first version is indexed under a normalized fingerprint
+of the request that produced it and a structural signature of its HTML
+(the landmark sections and their names). A new-site request that is
+close enough to an indexed one starts from that site instantly; the user
+then refines it with ordinary edit requests instead of waiting for a
+from-scratch generation.
+"""
+import threading
+from site_sections import split_html_sections
+from version_index import tokenize
+
+MATCH_THRESHOLD = 0.6
+PROMPT_WEIGHT = 0.75
+STRUCTURE_WEIGHT = 0.25
+# Words that say nothing about which site is wanted
+_GENERIC = frozenset(
+    "create build generate design website site web page modern simple nice beautiful "
+    "responsive want need like would could me my our some".split()
+)
+
+def prompt_fingerprint(prompt):
+    """Normalized token set of a request (order, case and filler words ignored)."""
+    return frozenset(token for token in tokenize(prompt.split("\n")[0]) if token not in _GENERIC)
+
+def structural_signature(html):
+    """Landmark sequence of a page, e.g. ("header", "nav", "section#menu", "footer")."""
+    return tuple(section.name for section in split_html_sections(html)
+                 if not section.name.startswith("fragment"))
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class TemplateMatch:
+    __slots__ = ("project_id", "version_id", "prompt", "score")
+
+    def __init__(self, project_id, version_id, prompt, score):
+        self.project_id = project_id
+        self.version_id = version_id
+        self.prompt = prompt
+        self.score = score
+
+class _Entry:
+    __slots__ = ("project_id", "version_id", "prompt", "fingerprint", "signature", "structure_tokens")
+
+class TemplateIndex:
+    """Index of reusable first versions across all projects in a store."""
+
+    def __init__(self, store):
+        self._store = store
+        self._lock = threading.Lock()
+        self._entries = {}       # project_id -> _Entry
+        self._signatures = set()
+        self._seen = set()       # project_ids already considered, indexed or not
+        self._last_rowid = None  # newest version row covered by refresh()
+        self._lookups = 0
+        self._reuses = 0
+        self._generation_seconds = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def refresh(self, limit=500):
+        """Index first versions not seen yet; returns how many were added.
+
+        Only versions stored since the previous refresh are read, and
+        projects that can't be indexed are remembered so they aren't
+        loaded again.
+        """
+        added = 0
+        rows = self._store.first_versions(limit, after_rowid=self._last_rowid)
+        if rows:
+            newest = max(row["rowid"] for row in rows)
+            with self._lock:
+                self._last_rowid = max(newest, self._last_rowid or 0)
+        for row in rows:
+            with self._lock:
+                if row["project_id"] in self._seen:
+                    continue
+                self._seen.add(row["project_id"])
+            prompt = row["prompt"] or row["description"]
+            fingerprint = prompt_fingerprint(prompt)
+            if not fingerprint:
+                continue
+            version = self._store.get_version(row["project_id"], row["version_id"])
+            if version is None or not version.html:
+                continue
+            signature = structural_signature(version.html)
+            # Same request for the same structure: one entry is enough
+            if (fingerprint, signature) in self._signatures:
+                continue
+            entry = _Entry()
+            entry.project_id, entry.version_id, entry.prompt = row["project_id"], row["version_id"], prompt
+            entry.fingerprint, entry.signature = fingerprint, signature
+            entry.structure_tokens = frozenset(tokenize(" ".join(signature)))
+            with self._lock:
+                self._entries[entry.project_id] = entry
+                self._signatures.add((fingerprint, signature))
+            added += 1
+        return added
+
+    def match(self, prompt, exclude_project=None, threshold=MATCH_THRESHOLD):
+        """Return the best TemplateMatch for a new-site request, or None."""
+        fingerprint = prompt_fingerprint(prompt)
+        with self._lock:
+            self._lookups += 1
+            entries = list(self._entries.values())
+        if not fingerprint:
+            return None
+        best = None
+        for entry in entries:
+            if entry.project_id == exclude_project:
+                continue
+            score = PROMPT_WEIGHT * _jaccard(fingerprint, entry.fingerprint)
+            # Requested parts ("gallery", "contact", "menu") that the site already has
+            score += STRUCTURE_WEIGHT * len(fingerprint & entry.structure_tokens) / len(fingerprint)
+            if entry.fingerprint == fingerprint:
+                score = max(score, 1.0)
+            if score >= threshold and (best is None or score > best.score):
+                best = TemplateMatch(entry.project_id, entry.version_id, entry.prompt, round(score, 2))
+        return best
+
+    def load(self, match):
+        """Load the WebsiteVersion behind a match."""
+        return self._store.get_version(match.project_id, match.version_id)
+
+    def record_generation(self, seconds):
+        """Record the duration of a from-scratch generation (the cost a reuse saves)."""
+        with self._lock:
+            self._generation_seconds.append(seconds)
+            del self._generation_seconds[:-50]
+
+    def record_reuse(self):
+        with self._lock:
+            self._reuses += 1
+
+    def metrics(self):
+        with self._lock:
+            timings = sorted(self._generation_seconds)
+            typical = timings[len(timings) // 2] if timings else 0.0
+            return {
+                "templates": len(self._entries),
+                "lookups": self._lookups,
+                "reuses": self._reuses,
+                "reuse_rate": self._reuses / self._lookups if self._lookups else 0.0,
+                "seconds_saved": self._reuses * typical,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_template_index():
+    """Return the process-wide TemplateIndex over the project store."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from project_store import get_store
+                _index = TemplateIndex(get_store())
+    return _index
@@ -0,0 +1,170 @@
+#token_planner.py
+"""Predict output size per request and pick max_tokens / model tier to fit it.
+
+The prediction starts from the current version's size and the kind of
+request, then is corrected by the ratio of actual to predicted output
+seen in recorded generations (per tier and request kind).
+"""
+import re
+import threading
+import time
+from llm_handler import MODEL_CONFIGS
+
+CHARS_PER_TOKEN = 3.5        # rough average for HTML/CSS/JS plus prose
+PROSE_TOKENS = 600           # explanation text around the code blocks
+NEW_SITE_TOKENS = 7000       # typical first generation
+MIN_MAX_TOKENS = 1024
+HEADROOM = 1.3
+LEARNING_WINDOW = 50         # recent generations used for the correction ratio
+CONTINUATION_ROUNDS = 1      # truncated output is finished by output_validator.repair_response
+
+# Output budget each tier can serve (its configured max_tokens)
+TIER_LIMITS = {tier: config["max_tokens"] for tier, config in MODEL_CONFIGS.items()}
+# Preferred order when the requested tier can't fit the output
+TIER_ORDER = ("Best", "Better", "Good")
+
+REQUEST_GROWTH = {
+    "new": 1.0,
+    "section": 1.0,
+    "remove": 0.85,
+    "style": 1.05,
+    "edit": 1.1,
+    "add": 1.3,
+}
+_KIND_PATTERNS = (
+    ("remove", re.compile(r"\b(remove|delete|drop|get rid of|hide)\b", re.IGNORECASE)),
+    ("add", re.compile(r"\b(add|include|insert|create|new|more)\b", re.IGNORECASE)),
+    ("style", re.compile(r"\b(colou?r|font|darker|lighter|style|theme|background|spacing|bigger|smaller)\b",
+                         re.IGNORECASE)),
+)
+
+def tier_capacity(tier):
+    """Largest output a tier can produce, counting continuation rounds."""
+    return TIER_LIMITS[tier] * (1 + CONTINUATION_ROUNDS)
+
+def estimate_tokens(text_length):
+    return int(text_length / CHARS_PER_TOKEN)
+
+def classify_request(request, has_current_version, section_edit=False):
+    if not has_current_version:
+        return "new"
+    if section_edit:
+        return "section"
+    for kind, pattern in _KIND_PATTERNS:
+        if pattern.search(request):
+            return kind
+    return "edit"
+
+class TokenPlan:
+    """`predicted_tokens` is `base_tokens` scaled by the learned `correction` for `tier`."""
+
+    __slots__ = ("requested_tier", "tier", "request_kind", "predicted_tokens", "max_tokens", "reason",
+                 "base_tokens", "correction")
+
+    def __init__(self, requested_tier, tier, request_kind, predicted_tokens, max_tokens, reason="",
+                 base_tokens=None, correction=1.0):
+        self.requested_tier = requested_tier
+        self.tier = tier
+        self.request_kind = request_kind
+        self.predicted_tokens = predicted_tokens
+        self.max_tokens = max_tokens
+        self.reason = reason
+        self.base_tokens = predicted_tokens if base_tokens is None else base_tokens
+        self.correction = correction
+
+    @property
+    def rerouted(self):
+        return self.tier != self.requested_tier
+
+class TokenPlanner:
+    """Plans max_tokens per generation and learns from recorded usage."""
+
+    def __init__(self, store=None):
+        self._store = store
+        self._lock = threading.Lock()
+        self._ratios = {}  # (tier, kind) -> [actual/predicted ratios]
+        if store is not None:
+            for tier, kind, predicted, actual in store.recent_token_usage(LEARNING_WINDOW * 10):
+                self._remember(tier, kind, predicted, actual)
+
+    def _remember(self, tier, kind, predicted, actual):
+        if predicted <= 0:
+            return
+        with self._lock:
+            ratios = self._ratios.setdefault((tier, kind), [])
+            ratios.append(actual / predicted)
+            del ratios[:-LEARNING_WINDOW]
+
+    def correction(self, tier, kind):
+        """Median actual/predicted ratio for this tier and request kind (1.0 if unknown)."""
+        with self._lock:
+            ratios = self._ratios.get((tier, kind)) or []
+            if len(ratios) < 3:
+                # Too little data for this tier; use what all tiers have shown
+                ratios = self._ratios.get(("*", kind)) or []
+            ratios = sorted(ratios)
+        if len(ratios) < 3:
+            return 1.0
+        return ratios[len(ratios) // 2]
+
+    def plan(self, model_choice, request, current_code_chars=0, section_chars=None):
+        """Return a TokenPlan for a request.
+
+        `current_code_chars` is the size of the current version's html+css+js
+        (0 for a new site); `section_chars` the size of the section being
+        regenerated in section mode.
+        """
+        requested = model_choice.split(" ")[0]
+        kind = classify_request(request, current_code_chars > 0, section_chars is not None)
+        if kind == "new":
+            base = NEW_SITE_TOKENS
+        elif kind == "section":
+            base = estimate_tokens(section_chars) * REQUEST_GROWTH["add"]
+        else:
+            base = estimate_tokens(current_code_chars) * REQUEST_GROWTH[kind]
+        base_tokens = int(base + PROSE_TOKENS)
+        correction = self.correction(requested, kind)
+        predicted = int(base_tokens * correction)
+
+        tier, reason = requested, ""
+        if predicted > tier_capacity(requested):
+            fitting = [t for t in TIER_ORDER if tier_capacity(t) >= predicted]
+            if fitting:
+                tier = fitting[0]
+            elif tier_capacity(requested) < max(map(tier_capacity, TIER_ORDER)):
+                tier = max(TIER_ORDER, key=tier_capacity)
+            if tier != requested:
+                reason = (f"~{predicted} output tokens expected, more than {requested} "
+                          f"can return ({TIER_LIMITS[requested]} per request)")
+                # Ratios are learned per producing tier, so predict with the new tier's
+                correction = self.correction(tier, kind)
+                predicted = int(base_tokens * correction)
+        wanted = max(MIN_MAX_TOKENS, int(predicted * HEADROOM))
+        max_tokens = min(wanted, TIER_LIMITS[tier])
+        return TokenPlan(requested, tier, kind, predicted, max_tokens, reason, base_tokens, correction)
+
+    def record(self, plan, response_chars):
+        """Record the actual output size of a planned generation under the tier that produced it."""
+        actual = estimate_tokens(response_chars)
+        self._remember(plan.tier, plan.request_kind, plan.base_tokens, actual)
+        self._remember("*", plan.request_kind, plan.base_tokens, actual)
+        if self._store is not None:
+            try:
+                self._store.add_token_usage(plan.tier, plan.request_kind, plan.base_tokens, actual,
+                                            plan.max_tokens, time.time())
+            except Exception as e:
+                print(f"Error recording token usage: {str(e)}")
+
+
+_planner = None
+_planner_lock = threading.Lock()
+
+def get_planner():
+    """Return the process-wide TokenPlanner backed by the project store."""
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                from project_store import get_store
+                _planner = TokenPlanner(get_store())
+    return _planner
@@ -380,13 +380,14 @@ def format_chat_message(message, role):
     </div>
     """
 
-def create_version_card(version, index, is_active=False):
-    """Create a styled version card element"""
+def create_version_card(meta, index, is_active=False):
+    """Create a styled version card element from version metadata (id, description, timestamp)"""
     active_class = "active" if is_active else ""
+    description = meta["description"]
     return f"""
     <div class="version-card {active_class}">
-        <strong>V{index+1}: {version.description[:20]}{'...' if len(version.description) > 20 else ''}</strong>
-        <div style="font-size: 0.8em; color: #666;">{version.timestamp}</div>
-        <div style="font-size: 0.8em; color: #888;">ID: {version.id}</div>
+        <strong>V{index+1}: {description[:20]}{'...' if len(description) > 20 else ''}</strong>
+        <div style="font-size: 0.8em; color: #666;">{meta["timestamp"]}</div>
+        <div style="font-size: 0.8em; color: #888;">ID: {meta["id"]}</div>
     </div>
     """
\ No newline at end of file
@@ -0,0 +1,101 @@
+#variant_generator.py
+"""Generate several candidate designs concurrently and rank them.
+
+Each variant is a full generation with its own temperature (and tier when
+asked), run on a worker thread against the shared OpenAI client, so N
+variants take about as long as the slowest one rather than N in a row.
+Candidates are ranked with cheap local checks; nothing is sent back to
+the model for scoring.
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from code_extractor import extract_code_from_response
+from llm_handler import generate_response_text
+from output_validator import validate_response
+
+MAX_VARIANTS = 4
+# Temperatures for successive variants; None keeps the tier's default
+VARIANT_TEMPERATURES = (None, 0.9, 0.4, 1.0)
+LANDMARKS = ("header", "nav", "main", "section", "footer")
+_LANDMARK = re.compile(r"<(%s)\b" % "|".join(LANDMARKS), re.IGNORECASE)
+
+class Candidate:
+    """One generated variant and its local score."""
+
+    __slots__ = ("index", "tier", "temperature", "response", "html", "css", "js",
+                 "score", "issues", "elapsed", "error")
+
+    def __init__(self, index, tier, temperature):
+        self.index = index
+        self.tier = tier
+        self.temperature = temperature
+        self.response = ""
+        self.html = self.css = self.js = ""
+        self.score = 0.0
+        self.issues = []
+        self.elapsed = 0.0
+        self.error = None
+
+    @property
+    def label(self):
+        temperature = "default" if self.temperature is None else f"{self.temperature:.1f}"
+        return f"{self.tier}, temperature {temperature}"
+
+def variant_settings(model_choice, count, tiers=None):
+    """Return [(tier, temperature)] for `count` variants.
+
+    With `tiers` the variants rotate through those tiers as well as through
+    VARIANT_TEMPERATURES.
+    """
+    tier = model_choice.split(" ")[0]
+    tiers = list(tiers) if tiers else [tier]
+    return [
+        (tiers[i % len(tiers)], VARIANT_TEMPERATURES[i % len(VARIANT_TEMPERATURES)])
+        for i in range(count)
+    ]
+
+def score_response(response):
+    """Score a response by validity, completeness and size; returns (score, issues)."""
+    result = validate_response(response)
+    html, css, js = extract_code_from_response(response)
+    score = 40.0 - 10 * len(result.issues)
+    score += 10 * sum(1 for block in (html, css, js) if block)
+    score += 2 * len({name.lower() for name in _LANDMARK.findall(html)})
+    if "@media" in css:
+        score += 5
+    # Bigger sites are usually more complete, with diminishing returns
+    score += min(len(html) + len(css) + len(js), 30000) / 2000
+    return round(score, 1), result.issues
+
+def generate_variants(prompt, conversation_history=None, custom_system_prompt=None, model_choice="Better",
+                      count=3, tiers=None, max_tokens=None):
+    """Run `count` generations concurrently; return Candidates sorted best first.
+
+    Failed generations are kept (with `error` set and a score of 0) so the
+    caller can report them.
+    """
+    count = max(1, min(count, MAX_VARIANTS))
+    candidates = [
+        Candidate(i, tier, temperature)
+        for i, (tier, temperature) in enumerate(variant_settings(model_choice, count, tiers))
+    ]
+
+    def run(candidate):
+        start = time.perf_counter()
+        try:
+            candidate.response = generate_response_text(
+                prompt, conversation_history, custom_system_prompt, candidate.tier,
+                max_tokens=max_tokens, temperature=candidate.temperature
+            ) or ""
+            candidate.html, candidate.css, candidate.js = extract_code_from_response(candidate.response)
+            candidate.score, candidate.issues = score_response(candidate.response)
+        except Exception as e:
+            candidate.error = str(e)
+        candidate.elapsed = time.perf_counter() - start
+        return candidate
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        list(executor.map(run, candidates))
+    return sorted(candidates, key=lambda c: (c.error is None, c.score), reverse=True)
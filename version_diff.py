@@ -0,0 +1,134 @@
+#version_diff.py
+"""Line-level diffs between website versions, memoized per version pair.
+
+Versions are immutable, so a diff keyed by the two content hashes and the
+file kind never goes stale. Common leading and trailing lines are trimmed
+before difflib runs, which keeps typical edits of large files (a change
+in one section) fast.
+"""
+import difflib
+import threading
+from collections import OrderedDict
+
+DIFF_CACHE_SIZE = 64
+CONTEXT_LINES = 3
+KINDS = ("html", "css", "js")
+
+class FileDiff:
+    """Diff of one file kind: opcodes over the line lists plus counts."""
+
+    __slots__ = ("kind", "old_lines", "new_lines", "opcodes", "added", "removed")
+
+    def __init__(self, kind, old_lines, new_lines, opcodes):
+        self.kind = kind
+        self.old_lines = old_lines
+        self.new_lines = new_lines
+        self.opcodes = opcodes
+        self.added = sum(j2 - j1 for tag, _, _, j1, j2 in opcodes if tag in ("insert", "replace"))
+        self.removed = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag in ("delete", "replace"))
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+    def unified(self, context=CONTEXT_LINES, max_lines=None):
+        """Unified-diff text; returns (text, truncated)."""
+        lines = []
+        for group in _grouped(self.opcodes, context):
+            i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+            lines.append(f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@")
+            for tag, a1, a2, b1, b2 in group:
+                if tag == "equal":
+                    lines.extend(" " + line for line in self.old_lines[a1:a2])
+                    continue
+                lines.extend("-" + line for line in self.old_lines[a1:a2])
+                lines.extend("+" + line for line in self.new_lines[b1:b2])
+            if max_lines is not None and len(lines) >= max_lines:
+                return "\n".join(lines[:max_lines]), True
+        return "\n".join(lines), False
+
+def _grouped(opcodes, context):
+    # difflib.SequenceMatcher.get_grouped_opcodes, but over precomputed opcodes
+    if not opcodes:
+        return []
+    codes = list(opcodes)
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > context * 2:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return [g for g in groups if any(code[0] != "equal" for code in g)]
+
+def diff_lines(old_text, new_text, kind=""):
+    """Compute a FileDiff between two texts."""
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+    # Trim the common prefix and suffix so difflib only sees the changed middle
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix
+           and old_lines[len(old_lines) - 1 - suffix] == new_lines[len(new_lines) - 1 - suffix]):
+        suffix += 1
+
+    opcodes = []
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+    if old_middle or new_middle:
+        matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(("equal", len(old_lines) - suffix, len(old_lines),
+                        len(new_lines) - suffix, len(new_lines)))
+    return FileDiff(kind, old_lines, new_lines, opcodes)
+
+class DiffCache:
+    """LRU of FileDiffs keyed by (old hash, new hash, kind)."""
+
+    def __init__(self, size=DIFF_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def diff(self, old_version, new_version, kind):
+        """Diff one file kind of two versions, computing it only on first request."""
+        key = (old_version.content_hash, new_version.content_hash, kind)
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        result = diff_lines(getattr(old_version, kind), getattr(new_version, kind), kind)
+        with self._lock:
+            self._items[key] = result
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return result
+
+_cache = DiffCache()
+
+def diff_versions(old_version, new_version, kind):
+    """Process-wide memoized diff of one file kind ("html", "css" or "js")."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown file kind: {kind}")
+    return _cache.diff(old_version, new_version, kind)
@@ -0,0 +1,173 @@
+#version_index.py
+"""Lexical retrieval over the sections of every website version.
+
+Sections come from site_sections. Each one is turned into a sparse
+hashed term-frequency vector (identifiers are split on camelCase, dashes
+and underscores), and queries are ranked by TF-IDF cosine similarity.
+Versions are indexed once by id, so adding a version only costs its own
+sections. With a MemoryBudget, section text is accounted per version and
+may be dropped from memory; the vectors stay, and the text of matching
+sections is re-read through `load_version` when a search returns them.
+"""
+import math
+import re
+import zlib
+from collections import Counter
+from site_sections import split_version
+
+HASH_DIMENSIONS = 1 << 16
+
+_WORD = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+")
+_STOPWORDS = frozenset(
+    "the and for with this that from into you your are was were will can please make add "
+    "div span class style px var let const function return true false null".split()
+)
+
+def tokenize(text):
+    """Split text and code identifiers into lowercase word tokens."""
+    return [w for w in (m.lower() for m in _WORD.findall(text)) if len(w) > 1 and w not in _STOPWORDS]
+
+def hashed_vector(tokens):
+    """Return a sparse {bucket: count} vector using the hashing trick."""
+    return Counter(zlib.crc32(token.encode("utf-8")) % HASH_DIMENSIONS for token in tokens)
+
+class IndexedSection:
+    """One indexed section; `section` is None while its text is paged out."""
+
+    __slots__ = ("version_id", "version_number", "position", "size", "section", "vector")
+
+    def __init__(self, version_id, version_number, position, section, vector):
+        self.version_id = version_id
+        self.version_number = version_number
+        self.position = position  # index in split_version() of that version
+        self.size = len(section.text)
+        self.section = section
+        self.vector = vector
+
+class VersionIndex:
+    """Incremental TF-IDF index over version sections.
+
+    `budget` is the session's MemoryBudget (or None to keep all text);
+    `load_version(version_number)` returns a version by its 1-based number
+    and is needed to page dropped section text back in.
+    """
+
+    def __init__(self, budget=None, load_version=None):
+        self._entries = []
+        self._by_version = {}  # version id -> [IndexedSection]
+        self._indexed = set()
+        self._doc_freq = Counter()
+        self._budget = budget
+        self.load_version = load_version
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_version(self, version, version_number):
+        """Index a version's sections; already indexed versions are skipped."""
+        if version.id in self._indexed:
+            return
+        self._indexed.add(version.id)
+        entries = self._by_version[version.id] = []
+        for position, section in enumerate(split_version(version)):
+            # Section names (ids, classes, selectors) are strong signals, so count them twice
+            vector = hashed_vector(tokenize(section.text) + tokenize(section.name) * 2)
+            if not vector:
+                continue
+            entries.append(IndexedSection(version.id, version_number, position, section, vector))
+            self._doc_freq.update(vector.keys())
+        self._entries.extend(entries)
+        self._keep(version.id)
+
+    def sync(self, versions):
+        """Index any versions in the list that aren't indexed yet.
+
+        A list with `metadata()` (VersionHistory) is checked by id, so
+        versions already indexed aren't loaded.
+        """
+        if hasattr(versions, "metadata"):
+            for number, meta in enumerate(versions.metadata(), start=1):
+                if meta["id"] not in self._indexed:
+                    self.add_version(versions[number - 1], number)
+            return
+        for number, version in enumerate(versions, start=1):
+            if version.id not in self._indexed:
+                self.add_version(version, number)
+
+    def _keep(self, version_id, paged_in=False):
+        if self._budget is not None:
+            size = sum(entry.size for entry in self._by_version[version_id])
+            self._budget.touch(self, version_id, size, self._drop_text, paged_in)
+
+    def _drop_text(self, version_id):
+        for entry in self._by_version.get(version_id, ()):
+            entry.section = None
+
+    def _load_text(self, entry):
+        sections = split_version(self.load_version(entry.version_number))
+        for other in self._by_version[entry.version_id]:
+            other.section = sections[other.position]
+        self._keep(entry.version_id, paged_in=True)
+
+    def _idf(self, bucket):
+        return math.log((1 + len(self._entries)) / (1 + self._doc_freq.get(bucket, 0))) + 1
+
+    def search(self, query, limit=8, version_ids=None, max_chars=6000):
+        """Return the best matching sections as IndexedSection, within a character budget.
+
+        `version_ids` restricts results to those versions. Sections are
+        returned in score order until `limit` or `max_chars` is reached.
+        """
+        query_vector = hashed_vector(tokenize(query))
+        if not query_vector:
+            return []
+        weighted_query = {b: c * self._idf(b) for b, c in query_vector.items()}
+        query_norm = math.sqrt(sum(w * w for w in weighted_query.values()))
+
+        scored = []
+        for entry in self._entries:
+            if version_ids is not None and entry.version_id not in version_ids:
+                continue
+            dot = 0.0
+            for bucket, weight in weighted_query.items():
+                count = entry.vector.get(bucket)
+                if count:
+                    dot += weight * count * self._idf(bucket)
+            if dot <= 0:
+                continue
+            norm = math.sqrt(sum((c * self._idf(b)) ** 2 for b, c in entry.vector.items()))
+            scored.append((dot / (query_norm * norm), entry))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        results = []
+        used = 0
+        for _, entry in scored:
+            if used + entry.size > max_chars:
+                continue
+            results.append(entry)
+            used += entry.size
+            if len(results) >= limit:
+                break
+        # Copies hold on to their text even if a later page-in evicts the original's
+        found = []
+        for entry in results:
+            if entry.section is None:
+                self._load_text(entry)
+            elif self._budget is not None:
+                self._keep(entry.version_id)
+            found.append(IndexedSection(entry.version_id, entry.version_number, entry.position,
+                                        entry.section, entry.vector))
+        return found
+
+_FENCE_LANGUAGE = {"html": "html", "css": "css", "js": "javascript"}
+
+def format_retrieved_sections(entries):
+    """Render retrieved sections as fenced snippets for the prompt."""
+    parts = []
+    for entry in entries:
+        section = entry.section
+        parts.append(
+            f"From version {entry.version_number} ({entry.version_id}), {section.kind.upper()} "
+            f"`{section.name}`:\n```{_FENCE_LANGUAGE[section.kind]}\n{section.text.strip()}\n```"
+        )
+    return "\n\n".join(parts)
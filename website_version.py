@@ -1,16 +1,102 @@
 #website_version.py
-import uuid
+import os
+import sys
+import time
+import hashlib
 import datetime
 
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def new_version_id():
+    """Return a short random hex id (8 chars, same shape as the old uuid4 prefix)."""
+    return os.urandom(4).hex()
+
+def _parse_timestamp(value):
+    """Convert a stored timestamp (epoch number or formatted string) to epoch seconds."""
+    if value is None or value == "":
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        if len(value) == 19 and value[4] == "-" and value[10] == " ":
+            # Fast path for TIMESTAMP_FORMAT; strptime is ~10x slower
+            return datetime.datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19])
+            ).timestamp()
+        return datetime.datetime.strptime(value, TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return time.time()
+
 class WebsiteVersion:
-    def __init__(self, html="", css="", js="", description="", timestamp=None):
-        self.html = html
-        self.css = css
-        self.js = js
-        self.description = description
-        self.timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.id = str(uuid.uuid4())[:8]  # Generate a short unique ID
-        
+    """Immutable snapshot of a generated website.
+
+    `created_at` is stored as epoch seconds and only formatted into the
+    display `timestamp` on first access. The id is persisted by `to_dict`
+    and restored by `from_dict`, so it stays stable across save/load.
+    """
+
+    __slots__ = ("html", "css", "js", "description", "created_at", "id",
+                 "_timestamp", "_content_hash")
+
+    def __init__(self, html="", css="", js="", description="", timestamp=None, id=None, created_at=None):
+        setattr_ = object.__setattr__
+        setattr_(self, "html", html)
+        setattr_(self, "css", css)
+        setattr_(self, "js", js)
+        setattr_(self, "description", sys.intern(description))
+        if created_at is None:
+            created_at = _parse_timestamp(timestamp)
+        setattr_(self, "created_at", created_at)
+        setattr_(self, "id", id or new_version_id())
+        setattr_(self, "_timestamp", timestamp if isinstance(timestamp, str) and timestamp else None)
+        setattr_(self, "_content_hash", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("WebsiteVersion is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("WebsiteVersion is immutable")
+
+    @property
+    def timestamp(self):
+        """Creation time formatted for display, computed once."""
+        if self._timestamp is None:
+            formatted = time.strftime(TIMESTAMP_FORMAT, time.localtime(self.created_at))
+            object.__setattr__(self, "_timestamp", formatted)
+        return self._timestamp
+
+    @property
+    def content_hash(self):
+        """Short digest of the html/css/js, computed once."""
+        if self._content_hash is None:
+            digest = hashlib.blake2b(digest_size=8)
+            for part in (self.html, self.css, self.js):
+                encoded = part.encode("utf-8")
+                digest.update(len(encoded).to_bytes(8, "little"))
+                digest.update(encoded)
+            object.__setattr__(self, "_content_hash", digest.hexdigest())
+        return self._content_hash
+
+    def __eq__(self, other):
+        if not isinstance(other, WebsiteVersion):
+            return NotImplemented
+        return self.id == other.id and self.content_hash == other.content_hash
+
+    def __hash__(self):
+        return hash((self.id, self.content_hash))
+
+    def __repr__(self):
+        return f"WebsiteVersion(id={self.id!r}, description={self.description!r})"
+
+    def __reduce__(self):
+        return (WebsiteVersion, (self.html, self.css, self.js, self.description,
+                                 None, self.id, self.created_at))
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -18,15 +104,19 @@ class WebsiteVersion:
             "css": self.css,
             "js": self.js,
             "description": self.description,
-            "timestamp": self.timestamp
+            "timestamp": self.timestamp,
+            "created_at": self.created_at
         }
-    
+
     @classmethod
     def from_dict(cls, data):
+        created_at = data.get("created_at")
         return cls(
             html=data.get("html", ""),
             css=data.get("css", ""),
             js=data.get("js", ""),
             description=data.get("description", "No description provided."),
-            timestamp=data.get("timestamp") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            timestamp=None if created_at is not None else data.get("timestamp"),
+            id=data.get("id"),
+            created_at=created_at
         )